@@ -0,0 +1,188 @@
+"""
+Vectorized batch similarity scoring
+Scores whole blocks of target products at once with NumPy
+
+Usage (similar products for every product, in bounded-memory chunks):
+    batch = BatchSimilarity(all_products)
+    for product, similar in batch.similar_products(k=10):
+        ...
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from similarity_index import ATTRIBUTE_WEIGHT, SIMILARITY_ATTRIBUTES, TAG_WEIGHT, product_features
+
+# Default memory budget for one block of the (targets x catalog) score matrix
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def _concat_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenate arange(start, end) for each pair without a Python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total, dtype=np.int64)
+
+
+class BatchSimilarity:
+    """
+    Encoded catalog for scoring many targets against all products
+
+    Attributes are integer code arrays (-1 where missing) and tags are a
+    sparse count matrix stored both ways: per product (CSR) and per tag
+    (CSC). Scores match find_similar_products exactly for dict products:
+    1 per matching attribute and 0.5 per matching (tag, tag) pair, with
+    ties kept in catalog order. Products sharing the target's id are
+    excluded. product_model.Product tags are a set, so a repeated tag
+    counts once, as in ProductSimilarityIndex.
+    """
+
+    def __init__(self, products: Sequence[Dict]):
+        self.products = list(products)
+        n = len(self.products)
+
+        id_codes: Dict = {}
+        vocab: Dict[str, Dict[str, int]] = {attr: {} for attr in SIMILARITY_ATTRIBUTES}
+        tag_vocab: Dict[str, int] = {}
+        self.attribute_codes = np.full((len(SIMILARITY_ATTRIBUTES), n), -1, dtype=np.int32)
+        self.id_codes = np.empty(n, dtype=np.int64)
+
+        row_tags: List[int] = []
+        row_counts: List[int] = []
+        indptr = np.zeros(n + 1, dtype=np.int64)
+
+        for i, product in enumerate(self.products):
+            self.id_codes[i] = id_codes.setdefault(product['id'], len(id_codes))
+            attributes, tags = product_features(product)
+            for attr, value in attributes:
+                codes = vocab[attr]
+                row = SIMILARITY_ATTRIBUTES.index(attr)
+                self.attribute_codes[row, i] = codes.setdefault(value, len(codes))
+            for tag, count in tags.items():
+                row_tags.append(tag_vocab.setdefault(tag, len(tag_vocab)))
+                row_counts.append(count)
+            indptr[i + 1] = len(row_tags)
+
+        # Product -> tags (CSR)
+        self.tag_indptr = indptr
+        self.tag_ids = np.asarray(row_tags, dtype=np.int64)
+        self.tag_counts = np.asarray(row_counts, dtype=np.float64)
+
+        # Tag -> products (CSC), products in catalog order within each tag
+        owners = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+        order = np.argsort(self.tag_ids, kind='stable')
+        self.posting_products = owners[order]
+        self.posting_counts = self.tag_counts[order]
+        self.posting_indptr = np.zeros(len(tag_vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.tag_ids, minlength=len(tag_vocab)), out=self.posting_indptr[1:])
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def score_block(self, targets: np.ndarray) -> np.ndarray:
+        """
+        Score a block of catalog products against the whole catalog
+
+        Args:
+            targets: Catalog indices of the target products
+
+        Returns:
+            Float array of shape (len(targets), len(catalog)); 0 where a
+            product shares nothing with the target or is the target itself
+        """
+        targets = np.asarray(targets, dtype=np.int64)
+        n = len(self.products)
+        scores = np.zeros((len(targets), n), dtype=np.float64)
+
+        for codes in self.attribute_codes:
+            target_codes = codes[targets]
+            matches = (target_codes[:, None] == codes[None, :]) & (target_codes[:, None] >= 0)
+            scores += ATTRIBUTE_WEIGHT * matches
+
+        # Each (target tag, product with that tag) pair adds 0.5 * both counts
+        entries = _concat_ranges(self.tag_indptr[targets], self.tag_indptr[targets + 1])
+        if len(entries):
+            entry_rows = np.repeat(np.arange(len(targets)), np.diff(self.tag_indptr)[targets])
+            tags = self.tag_ids[entries]
+            starts, ends = self.posting_indptr[tags], self.posting_indptr[tags + 1]
+            postings = _concat_ranges(starts, ends)
+            lengths = ends - starts
+            rows = np.repeat(entry_rows, lengths)
+            weights = TAG_WEIGHT * np.repeat(self.tag_counts[entries], lengths) * self.posting_counts[postings]
+            flat = rows * n + self.posting_products[postings]
+            scores += np.bincount(flat, weights=weights, minlength=len(targets) * n).reshape(scores.shape)
+
+        scores[self.id_codes[targets][:, None] == self.id_codes[None, :]] = 0
+        return scores
+
+    def top_k_block(self, targets: np.ndarray, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k neighbours for a block of targets
+
+        Args:
+            targets: Catalog indices of the target products
+            k: Neighbours per target
+
+        Returns:
+            (indices, scores), both of shape (len(targets), k), best first
+            and ties in catalog order; padded with -1 / 0 where fewer than
+            k products score above zero
+        """
+        scores = self.score_block(targets)
+        n = scores.shape[1]
+        k_eff = min(k, n)
+        indices = np.full((len(scores), k), -1, dtype=np.int64)
+        top_scores = np.zeros((len(scores), k), dtype=np.float64)
+        if k_eff == 0:
+            return indices, top_scores
+
+        # Scores are multiples of 0.5, so (2 * score, reversed position)
+        # packs into one exact integer key that also breaks ties
+        keys = (scores * 2).astype(np.int64) * n + (n - 1 - np.arange(n))
+        part = np.argpartition(-keys, k_eff - 1, axis=1)[:, :k_eff]
+        order = np.argsort(-np.take_along_axis(keys, part, axis=1), axis=1)
+        best = np.take_along_axis(part, order, axis=1)
+        best_scores = np.take_along_axis(scores, best, axis=1)
+
+        found = best_scores > 0
+        indices[:, :k_eff] = np.where(found, best, -1)
+        top_scores[:, :k_eff] = np.where(found, best_scores, 0)
+        return indices, top_scores
+
+    def iter_top_k(self, targets: Optional[Iterable[int]] = None, k: int = 10,
+                   chunk_size: Optional[int] = None) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Top-k neighbours for many targets, one block at a time
+
+        Args:
+            targets: Catalog indices to score (default: every product)
+            k: Neighbours per target
+            chunk_size: Targets per block (default: sized to MAX_BLOCK_BYTES)
+
+        Yields:
+            (target indices, neighbour indices, neighbour scores) per block
+        """
+        n = len(self.products)
+        targets = np.arange(n) if targets is None else np.fromiter(targets, dtype=np.int64)
+        if chunk_size is None:
+            # Score matrix plus the temporaries used to compare and rank it
+            chunk_size = max(1, MAX_BLOCK_BYTES // (max(n, 1) * 8 * 4))
+        for start in range(0, len(targets), chunk_size):
+            block = targets[start:start + chunk_size]
+            indices, scores = self.top_k_block(block, k)
+            yield block, indices, scores
+
+    def similar_products(self, k: int = 10, chunk_size: Optional[int] = None) -> Iterator[Tuple[Dict, List[Dict]]]:
+        """
+        Similar products for every product in the catalog
+
+        Yields:
+            (product, up to k similar products) in catalog order, the
+            same lists find_similar_products returns
+        """
+        for block, indices, _ in self.iter_top_k(k=k, chunk_size=chunk_size):
+            for target, row in zip(block, indices):
+                yield self.products[target], [self.products[j] for j in row if j >= 0]
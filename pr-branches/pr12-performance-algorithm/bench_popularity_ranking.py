@@ -0,0 +1,90 @@
+"""
+Popularity ranking benchmark
+Mixed popularity updates and top-k/page queries: re-sorting vs PopularityRanking
+
+Usage:
+    python bench_popularity_ranking.py [--products 100000] [--operations 5000] [--update-ratio 0.9]
+"""
+import argparse
+import random
+import time
+
+from popularity_ranking import PopularityRanking
+from product_sorting import sort_products_by_popularity_optimized
+
+
+def generate_products(count, seed=0):
+    """Synthetic products with skewed popularity scores"""
+    rng = random.Random(seed)
+    return [{'id': i, 'popularity': int(rng.paretovariate(1.2) * 10)} for i in range(count)]
+
+
+def generate_operations(products, count, update_ratio, page_size, seed=1):
+    """Random ('update', id, popularity) and ('page', offset) operations"""
+    rng = random.Random(seed)
+    operations = []
+    for _ in range(count):
+        if rng.random() < update_ratio:
+            operations.append(('update', rng.randrange(len(products)), rng.randrange(10000)))
+        else:
+            # Mostly first pages, occasionally deep ones
+            page = 0 if rng.random() < 0.8 else rng.randrange(len(products) // page_size)
+            operations.append(('page', page * page_size))
+    return operations
+
+
+def run_resort(products, operations, page_size):
+    """Baseline: update the list in place, sort on every query"""
+    products = list(products)
+    results = []
+    for op in operations:
+        if op[0] == 'update':
+            _, i, popularity = op
+            products[i] = {**products[i], 'popularity': popularity}
+        else:
+            ranked = sort_products_by_popularity_optimized(products)
+            results.append([p['id'] for p in ranked[op[1]:op[1] + page_size]])
+    return results
+
+
+def run_ranking(products, operations, page_size):
+    """PopularityRanking: O(log n) updates, no sort per query"""
+    ranking = PopularityRanking(products)
+    results = []
+    for op in operations:
+        if op[0] == 'update':
+            ranking.update_popularity(op[1], op[2])
+        else:
+            results.append([p['id'] for p in ranking.page(op[1], page_size)])
+    return results
+
+
+def main():
+    """Run both strategies on the same workload and check they agree"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--update-ratio', type=float, default=0.9)
+    parser.add_argument('--page-size', type=int, default=20)
+    args = parser.parse_args()
+
+    products = generate_products(args.products)
+    operations = generate_operations(products, args.operations, args.update_ratio, args.page_size)
+    queries = sum(1 for op in operations if op[0] == 'page')
+
+    timings = {}
+    outputs = {}
+    for name, runner in (('re-sort', run_resort), ('ranking', run_ranking)):
+        start = time.perf_counter()
+        outputs[name] = runner(products, operations, args.page_size)
+        timings[name] = time.perf_counter() - start
+
+    assert outputs['re-sort'] == outputs['ranking'], "rankings disagree"
+    print(f"{args.products} products, {args.operations} operations "
+          f"({args.operations - queries} updates, {queries} page queries)")
+    for name, elapsed in timings.items():
+        print(f"{name:>8}: {elapsed:8.2f}s  ({elapsed / args.operations * 1e6:8.1f} us/op)")
+
+
+if __name__ == '__main__':
+    main()
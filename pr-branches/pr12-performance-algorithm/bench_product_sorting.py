@@ -0,0 +1,331 @@
+"""
+Benchmark and complexity-regression check for the product_sorting algorithms
+
+Times each optimised path on synthetic catalogs and order sets, fits the
+empirical growth exponent (slope of log time over log n) and compares
+both the exponent and the timings against a stored baseline. Timings are
+stored relative to a fixed reference workload, so the baseline carries
+across machines. The naive functions are timed at small sizes only, for
+comparison. Before timing, naive and optimised outputs are checked for
+agreement on small inputs.
+
+Usage:
+    python bench_product_sorting.py [--sizes 1000,10000,100000,1000000] [--check]
+    python bench_product_sorting.py --update-baseline
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from customer_bitmap import CustomerBitmapIndex
+from popularity_ranking import PopularityRanking
+from product_model import find_similar, load_products
+from product_model import remove_duplicates as remove_duplicates_model
+from product_model import sort_by_popularity
+from product_sorting import (find_common_customers, find_similar_products, find_similar_products_optimized,
+                             remove_duplicates, remove_duplicates_optimized, sort_products_by_popularity,
+                             sort_products_by_popularity_optimized)
+from similarity_index import ProductSimilarityIndex
+from streaming_dedup import stream_unique
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'bench_product_sorting_baseline.json')
+
+# Highest acceptable fitted exponents. Cache misses push hash-heavy linear
+# code to ~1.3 between 1k and 100k; a quadratic regression fits near 2.
+LINEAR = 1.4
+N_LOG_N = 1.45
+SUBLINEAR = 0.5
+
+# A fitted exponent may exceed the baseline's by this much before failing
+EXPONENT_SLACK = 0.25
+
+# Fewest timed runs per size; a single run at small n is mostly timer and cache noise
+MIN_REPEAT = 3
+
+
+class Case(NamedTuple):
+    """One timed function: setup(n) builds inputs, run(inputs) is timed"""
+    name: str
+    setup: Callable
+    run: Callable
+    max_exponent: Optional[float]  # None: informational only (naive paths)
+    naive: bool = False
+
+
+def generate_catalog(count: int, seed: int = 0) -> List[Dict]:
+    """Synthetic products with ~10% (name, brand) duplicates"""
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        base = rng.randrange(max(1, int(count * 0.9)))
+        products.append({
+            'id': i,
+            'name': f'Product {base}',
+            'brand': f'Brand{base % 1000}',
+            'popularity': rng.randrange(100000),
+            'category': f'Category{rng.randrange(200)}',
+            'color': rng.choice(['Red', 'Blue', 'Green', 'Black', 'White', 'Grey']),
+            'size': rng.choice(['XS', 'S', 'M', 'L', 'XL']),
+            'material': f'Material{rng.randrange(40)}',
+            'tags': [f'Tag{rng.randrange(2000)}' for _ in range(rng.randint(1, 4))],
+        })
+    return products
+
+
+def generate_orders(count: int, seed: int = 0) -> List[Dict]:
+    """Synthetic orders over count // 5 customers and count // 10 products"""
+    rng = random.Random(seed)
+    customers = max(1, count // 5)
+    products = max(3, count // 10)
+    return [
+        {
+            'customer_id': rng.randrange(customers),
+            'items': [{'product_id': rng.randrange(products)} for _ in range(rng.randint(1, 5))],
+        }
+        for _ in range(count)
+    ]
+
+
+def _ranking_updates(ranking: PopularityRanking) -> None:
+    """1000 popularity updates and 100 first-page queries"""
+    rng = random.Random(len(ranking))
+    for i in range(1000):
+        ranking.update_popularity(rng.randrange(len(ranking)), rng.randrange(100000))
+        if i % 10 == 0:
+            ranking.top(20)
+
+
+def _bitmap_queries(orders: List[Dict]) -> None:
+    """Ingest all orders, then run one query of each kind"""
+    index = CustomerBitmapIndex(orders)
+    index.customers_with_all([0, 1, 2])
+    index.customers_with_any([0, 1, 2])
+    index.customers_with_at_least([0, 1, 2], 2)
+
+
+CASES = [
+    Case('sort_products_by_popularity_optimized', generate_catalog,
+         sort_products_by_popularity_optimized, N_LOG_N),
+    Case('PopularityRanking updates+top', lambda n: PopularityRanking(generate_catalog(n)),
+         _ranking_updates, SUBLINEAR),
+    Case('remove_duplicates_optimized', generate_catalog, remove_duplicates_optimized, LINEAR),
+    Case('stream_unique', generate_catalog, lambda products: list(stream_unique(products)), LINEAR),
+    Case('ProductSimilarityIndex build', generate_catalog, ProductSimilarityIndex, LINEAR),
+    Case('find_similar_products_optimized', generate_catalog,
+         lambda products: find_similar_products_optimized(products[0], products), LINEAR),
+    Case('product_model.find_similar', lambda n: load_products(generate_catalog(n)),
+         lambda products: find_similar(products[0], products), LINEAR),
+    Case('CustomerBitmapIndex', generate_orders, _bitmap_queries, LINEAR),
+    Case('sort_products_by_popularity', generate_catalog, sort_products_by_popularity, None, True),
+    Case('remove_duplicates', generate_catalog, remove_duplicates, None, True),
+    Case('find_similar_products', generate_catalog,
+         lambda products: find_similar_products(products[0], products), None, True),
+    Case('find_common_customers', generate_orders,
+         lambda orders: find_common_customers([0, 1, 2], orders), None, True),
+]
+
+
+def check_agreement(size: int = 400) -> List[str]:
+    """
+    Compare naive and optimised outputs on small inputs
+
+    Returns:
+        Descriptions of any disagreements
+    """
+    failures = []
+    catalog = generate_catalog(size, seed=1)
+    products = load_products(catalog)
+    orders = generate_orders(size * 5, seed=1)
+
+    def ids(items):
+        return [item['id'] for item in items]
+
+    expected = ids(sort_products_by_popularity(catalog))
+    for name, got in (
+            ('sort_products_by_popularity_optimized', ids(sort_products_by_popularity_optimized(catalog))),
+            ('PopularityRanking', ids(PopularityRanking(catalog))),
+            ('product_model.sort_by_popularity', ids(sort_by_popularity(products)))):
+        if got != expected:
+            failures.append(f"{name} order differs from sort_products_by_popularity")
+
+    expected = ids(remove_duplicates(catalog))
+    for name, got in (
+            ('remove_duplicates_optimized', ids(remove_duplicates_optimized(catalog))),
+            ('stream_unique', ids(stream_unique(catalog))),
+            ('stream_unique (spilling)', sorted(ids(stream_unique(catalog, memory_budget=2000)))),
+            ('product_model.remove_duplicates', ids(remove_duplicates_model(products)))):
+        if got != (sorted(expected) if 'spilling' in name else expected):
+            failures.append(f"{name} differs from remove_duplicates")
+
+    index = CustomerBitmapIndex(orders)
+    for product_ids in ([0], [0, 1], [1, 2, 3]):
+        if set(find_common_customers(product_ids, orders)) != set(index.customers_with_all(product_ids)):
+            failures.append(f"CustomerBitmapIndex differs from find_common_customers for {product_ids}")
+
+    similarity = ProductSimilarityIndex(catalog)
+    for target in catalog[:25]:
+        expected = ids(find_similar_products(target, catalog))
+        if ids(find_similar_products_optimized(target, catalog)) != expected:
+            failures.append(f"find_similar_products_optimized differs from find_similar_products "
+                            f"for {target['id']}")
+            break
+    for target in catalog[:25]:
+        if ids(similarity.query(target)) != ids(find_similar_products(target, catalog)):
+            failures.append(f"ProductSimilarityIndex differs from find_similar_products for {target['id']}")
+            break
+    try:
+        from batch_similarity import BatchSimilarity
+    except ImportError:
+        print("# numpy not installed; skipping BatchSimilarity agreement", file=sys.stderr)
+    else:
+        for target, similar in BatchSimilarity(catalog[:150]).similar_products():
+            if ids(similar) != ids(find_similar_products(target, catalog[:150])):
+                failures.append(f"BatchSimilarity differs from find_similar_products for {target['id']}")
+                break
+    return failures
+
+
+def best_time(fn: Callable, inputs, repeat: int) -> float:
+    """Fastest of repeat runs, in seconds (cyclic GC paused, as timeit does)"""
+    best = math.inf
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(inputs)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def reference_seconds(repeat: int = 5) -> float:
+    """Time of a fixed workload, used to normalise timings across machines"""
+    values = [random.Random(0).random() for _ in range(200000)]
+    return best_time(sorted, values, repeat)
+
+
+def fit_exponent(sizes: List[int], seconds: List[float]) -> Optional[float]:
+    """Least-squares slope of log(seconds) against log(size)"""
+    points = [(math.log(n), math.log(t)) for n, t in zip(sizes, seconds) if t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var else None
+
+
+def run_case(case: Case, sizes: List[int], repeat: int) -> Dict:
+    """Time one case at every size"""
+    seconds = []
+    for n in sizes:
+        inputs = case.setup(n)
+        seconds.append(best_time(case.run, inputs, repeat))
+    return {'sizes': sizes, 'seconds': seconds, 'exponent': fit_exponent(sizes, seconds)}
+
+
+def compare(case: Case, result: Dict, reference: float, baseline: Optional[Dict],
+            tolerance: float) -> List[str]:
+    """
+    Check a case's result against its expected exponent and the baseline
+
+    Returns:
+        Descriptions of any regressions
+    """
+    failures = []
+    exponent = result['exponent']
+    if case.max_exponent is None or exponent is None:
+        return failures
+    if exponent > case.max_exponent:
+        failures.append(f"{case.name}: growth exponent {exponent:.2f} > {case.max_exponent}")
+
+    stored = (baseline or {}).get('cases', {}).get(case.name)
+    if stored:
+        if stored.get('exponent') is not None and exponent > stored['exponent'] + EXPONENT_SLACK:
+            failures.append(f"{case.name}: growth exponent {exponent:.2f} > baseline "
+                            f"{stored['exponent']:.2f} + {EXPONENT_SLACK}")
+        for n, t in zip(result['sizes'], result['seconds']):
+            base = stored['relative'].get(str(n))
+            if base is not None and t / reference > base * tolerance:
+                failures.append(f"{case.name}: {t / reference:.3f} reference units at n={n} "
+                                f"> {tolerance} x baseline {base:.3f}")
+    return failures
+
+
+def main():
+    """Run agreement checks and timings; optionally gate on or update the baseline"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--naive-sizes', default='250,500,1000,2000')
+    parser.add_argument('--repeat', type=int, default=MIN_REPEAT,
+                        help=f'timed runs per size (at least {MIN_REPEAT})')
+    parser.add_argument('--only', default=None, help='comma-separated case names')
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='allowed slowdown factor against the baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--check', action='store_true', help='exit 1 on any failure')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    naive_sizes = [int(s) for s in args.naive_sizes.split(',')]
+    only = set(args.only.split(',')) if args.only else None
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = check_agreement()
+    print("agreement:", "ok" if not failures else f"{len(failures)} failure(s)")
+
+    reference = reference_seconds()
+    print(f"reference workload: {reference * 1000:.1f} ms\n")
+    print(f"{'case':<40} {'n':>9} {'seconds':>10} {'relative':>10}")
+
+    results = {}
+    for case in CASES:
+        if only and case.name not in only:
+            continue
+        result = run_case(case, naive_sizes if case.naive else sizes, max(args.repeat, MIN_REPEAT))
+        results[case.name] = result
+        for n, t in zip(result['sizes'], result['seconds']):
+            print(f"{case.name:<40} {n:>9} {t:>10.4f} {t / reference:>10.3f}")
+        exponent = result['exponent']
+        limit = 'naive' if case.naive else f"<= {case.max_exponent}"
+        print(f"{'':<40} exponent {exponent:.2f} ({limit})\n" if exponent is not None else '')
+        failures.extend(compare(case, result, reference, baseline, args.tolerance))
+
+    if args.update_baseline:
+        data = {
+            'reference_seconds': reference,
+            'cases': {
+                name: {
+                    'exponent': result['exponent'],
+                    'relative': {str(n): t / reference for n, t in zip(result['sizes'], result['seconds'])},
+                }
+                for name, result in results.items()
+            },
+        }
+        with open(args.baseline, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"baseline written to {args.baseline}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if args.check and failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+MinHash/LSH recall and speed benchmark
+Compares approximate top-10 against the exact similarity ranking
+
+The exact side is ProductSimilarityIndex, which returns the same lists
+as find_similar_products without its full scan. Recall@k counts an
+approximate result as correct when its exact score reaches the k-th
+best exact score, so ties are not penalised.
+
+Usage:
+    python bench_similarity_lsh.py [--products 50000] [--queries 200] [--configs 8x4,16x4,32x3]
+"""
+import argparse
+import random
+import time
+
+from similarity_index import ProductSimilarityIndex, features_score, product_features
+from similarity_lsh import MinHashLSHIndex
+
+
+def generate_catalog(count, seed=0):
+    """Synthetic catalog where products cluster around shared families"""
+    rng = random.Random(seed)
+    families = max(1, count // 50)
+    catalog = []
+    for i in range(count):
+        family = rng.randrange(families)
+        family_rng = random.Random(family)
+        tag_pool = [f'tag{family_rng.randrange(5000)}' for _ in range(8)]
+        product = {
+            'id': i,
+            'category': f'category{family % 200}',
+            'brand': f'brand{family_rng.randrange(2000)}',
+            'color': rng.choice(['red', 'blue', 'green', 'black', 'white']),
+            'size': rng.choice(['S', 'M', 'L', 'XL']),
+            'material': f'material{family_rng.randrange(30)}',
+            'tags': rng.sample(tag_pool, rng.randint(2, 5)) + [f'tag{rng.randrange(5000)}'],
+        }
+        catalog.append(product)
+    return catalog
+
+
+def recall_at_k(target, exact, approx, k):
+    """Share of approximate results scoring at least the k-th exact score"""
+    if not exact:
+        return 1.0
+    target_features = product_features(target)
+    cutoff = features_score(target_features, product_features(exact[-1]))
+    hits = sum(1 for p in approx if features_score(target_features, product_features(p)) >= cutoff)
+    return min(hits, len(exact)) / len(exact)
+
+
+def main():
+    """Build both indexes and report recall and latency per LSH configuration"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--configs', default='8x4,16x4,32x3',
+                        help='comma-separated BANDSxROWS settings')
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.products)
+    targets = random.Random(1).sample(catalog, min(args.queries, len(catalog)))
+
+    start = time.perf_counter()
+    exact_index = ProductSimilarityIndex(catalog)
+    print(f"exact index built in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    exact = [exact_index.query(t, args.k) for t in targets]
+    exact_ms = (time.perf_counter() - start) / len(targets) * 1000
+
+    print(f"{'config':>8} {'build (s)':>10} {'query (ms)':>11} {'candidates':>11} {'recall@k':>9}")
+    print(f"{'exact':>8} {'':>10} {exact_ms:>11.2f} {'':>11} {1.0:>9.3f}")
+    for config in args.configs.split(','):
+        bands, rows = (int(x) for x in config.split('x'))
+        start = time.perf_counter()
+        lsh = MinHashLSHIndex(catalog, bands=bands, rows=rows)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = [lsh.query(t, args.k) for t in targets]
+        query_ms = (time.perf_counter() - start) / len(targets) * 1000
+
+        candidates = sum(len(lsh.candidates(t)) for t in targets) / len(targets)
+        recall = sum(recall_at_k(t, e, a, args.k)
+                     for t, e, a in zip(targets, exact, approx)) / len(targets)
+        print(f"{config:>8} {build:>10.1f} {query_ms:>11.2f} {candidates:>11.0f} {recall:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+Shared pytest fixtures for the product algorithm tests
+"""
+import random
+
+import pytest
+
+COLORS = ['red', 'Red', 'blue', 'BLUE', 'green']
+SIZES = ['S', 'M', 'L']
+
+
+def random_product(rng, product_id, tag_pool=30):
+    """Product with mixed-case attributes, some missing, and repeated tags"""
+    product = {
+        'id': product_id,
+        'name': f'Product {rng.randrange(50)}',
+        'popularity': rng.randrange(20),
+        'category': rng.choice(['shoes', 'Shoes', 'hats', 'bags']),
+        'brand': rng.choice(['Acme', 'acme', 'Globex', 'Initech']),
+        'color': rng.choice(COLORS),
+        'tags': [f'Tag{rng.randrange(tag_pool)}' for _ in range(rng.randrange(5))],
+    }
+    if rng.random() < 0.7:
+        product['size'] = rng.choice(SIZES)
+    if rng.random() < 0.5:
+        product['material'] = rng.choice(['cotton', 'Leather', 'wool'])
+    if rng.random() < 0.2:
+        product['tags'].append(product['tags'][0].upper() if product['tags'] else 'tag1')
+    return product
+
+
+@pytest.fixture
+def make_catalog():
+    """Factory for reproducible random catalogs"""
+    def make(count, seed=0):
+        rng = random.Random(seed)
+        return [random_product(rng, i) for i in range(count)]
+    return make
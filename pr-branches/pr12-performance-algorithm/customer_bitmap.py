@@ -0,0 +1,176 @@
+"""
+Bitmap index of customers per product
+Python int bitsets over customer ordinals, fed incrementally from orders
+
+Usage:
+    index = CustomerBitmapIndex(orders)
+    index.add_order(new_order)
+    customers = index.customers_with_all(product_ids)  # also _any / _at_least(k)
+"""
+from typing import Any, Dict, Iterable, List
+
+# Pending ordinals a product may collect before they are folded into its
+# bitset without waiting for a query; the limit grows with the customer
+# count so the pending list stays about as large as the bitset it feeds
+PENDING_FOLD_MIN = 64
+PENDING_FOLD_RATIO = 64
+
+
+class CustomerBitmapIndex:
+    """
+    Product -> set of customers who bought it, as an int bitset
+
+    Each customer gets an ordinal the first time one of their orders is
+    ingested; bit i of a product's bitset is set when customer i bought
+    it. Multi-product queries are then a handful of big-int AND/OR
+    operations instead of rescanning orders.
+
+    Python ints are immutable, so OR-ing one bit into a large bitset
+    copies it. Ingestion therefore only appends ordinals to a pending
+    list per product; they are folded into the bitset in one pass the
+    next time that product is queried, or as soon as the list reaches
+    max(PENDING_FOLD_MIN, customers / PENDING_FOLD_RATIO) entries, so
+    products that are never queried do not grow without bound. Each
+    fold copies the bitset once for a list that long, which keeps
+    ingestion amortised O(1) per item. compact() folds everything.
+
+    Results list customers in the order they were first seen.
+    """
+
+    def __init__(self, orders: Iterable[Dict] = ()):
+        self._ordinals: Dict[Any, int] = {}
+        self._customers: List[Any] = []
+        self._bitsets: Dict[Any, int] = {}
+        self._pending: Dict[Any, List[int]] = {}
+        self.add_orders(orders)
+
+    def __len__(self) -> int:
+        """Number of distinct customers seen"""
+        return len(self._customers)
+
+    def add_order(self, order: Dict) -> None:
+        """
+        Ingest one order
+
+        Args:
+            order: Order dictionary with 'customer_id' and 'items'
+        """
+        customer_id = order['customer_id']
+        ordinal = self._ordinals.get(customer_id)
+        if ordinal is None:
+            ordinal = self._ordinals[customer_id] = len(self._customers)
+            self._customers.append(customer_id)
+
+        pending = self._pending
+        fold_at = max(PENDING_FOLD_MIN, len(self._customers) // PENDING_FOLD_RATIO)
+        for item in order['items']:
+            product_id = item['product_id']
+            ordinals = pending.get(product_id)
+            if ordinals is None:
+                ordinals = pending[product_id] = []
+            ordinals.append(ordinal)
+            if len(ordinals) >= fold_at:
+                self._fold(product_id, pending.pop(product_id))
+
+    def add_orders(self, orders: Iterable[Dict]) -> None:
+        """Ingest a batch or stream of orders"""
+        for order in orders:
+            self.add_order(order)
+
+    def compact(self) -> None:
+        """Fold every pending ordinal into its bitset (e.g. after a bulk load)"""
+        pending, self._pending = self._pending, {}
+        for product_id, ordinals in pending.items():
+            self._fold(product_id, ordinals)
+
+    def buyers(self, product_id: Any) -> int:
+        """Bitset of customers who bought a product (0 if none)"""
+        ordinals = self._pending.pop(product_id, None)
+        if ordinals is None:
+            return self._bitsets.get(product_id, 0)
+        return self._fold(product_id, ordinals)
+
+    def _fold(self, product_id: Any, ordinals: List[int]) -> int:
+        """Set the bits of ordinals in a product's bitset; return the new bitset"""
+        size = (len(self._customers) + 7) // 8
+        buffer = bytearray(self._bitsets.get(product_id, 0).to_bytes(size, 'little'))
+        for ordinal in ordinals:
+            buffer[ordinal >> 3] |= 1 << (ordinal & 7)
+        bitset = self._bitsets[product_id] = int.from_bytes(buffer, 'little')
+        return bitset
+
+    def customers_with_all(self, product_ids: Iterable[Any]) -> List[Any]:
+        """
+        Customers who bought every one of the products
+
+        Same customers as find_common_customers(); with no product ids
+        that is every customer seen.
+
+        Args:
+            product_ids: Products that must all have been bought
+
+        Returns:
+            Customer ids
+        """
+        bitsets = sorted((self.buyers(p) for p in set(product_ids)), key=int.bit_count)
+        result = (1 << len(self._customers)) - 1
+        # Smallest posting first so the running intersection shrinks fastest
+        for bitset in bitsets:
+            result &= bitset
+            if not result:
+                break
+        return self._decode(result)
+
+    def customers_with_any(self, product_ids: Iterable[Any]) -> List[Any]:
+        """
+        Customers who bought at least one of the products
+
+        Args:
+            product_ids: Candidate products
+
+        Returns:
+            Customer ids
+        """
+        result = 0
+        for product_id in set(product_ids):
+            result |= self.buyers(product_id)
+        return self._decode(result)
+
+    def customers_with_at_least(self, product_ids: Iterable[Any], k: int) -> List[Any]:
+        """
+        Customers who bought at least k of the products
+
+        Keeps one bitset per threshold j (customers with >= j matches so
+        far), so the cost is O(len(product_ids) * k) big-int operations.
+
+        Args:
+            product_ids: Candidate products
+            k: Minimum number of them a customer must have bought
+
+        Returns:
+            Customer ids
+        """
+        product_ids = set(product_ids)
+        if k <= 0:
+            return list(self._customers)
+        if k > len(product_ids):
+            return []
+
+        at_least = [(1 << len(self._customers)) - 1] + [0] * k
+        for product_id in product_ids:
+            bitset = self.buyers(product_id)
+            for j in range(k, 0, -1):
+                at_least[j] |= at_least[j - 1] & bitset
+        return self._decode(at_least[k])
+
+    def _decode(self, bitset: int) -> List[Any]:
+        """Customer ids for the set bits, in ordinal order"""
+        customers = self._customers
+        result = []
+        # Least significant bit first; str.find skips zero runs in C
+        bits = bin(bitset)[:1:-1]
+        position = bits.find('1')
+        while position != -1:
+            result.append(customers[position])
+            position = bits.find('1', position + 1)
+        return result
@@ -0,0 +1,237 @@
+"""
+Incrementally maintained popularity ranking
+Blocked sorted list with a Fenwick tree over block sizes
+
+Usage:
+    ranking = PopularityRanking(products)
+    ranking.update_popularity(product_id, new_score)  # O(log n)
+    first_page = ranking.top(20)                        # same order as sorted(..., reverse=True)
+"""
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# Target block length; blocks split at twice this size
+BLOCK_SIZE = 512
+
+# Sort key: (-popularity, catalog ordinal)
+Key = Tuple[Any, int]
+
+
+class PopularityRanking:
+    """
+    Products ordered by popularity, kept sorted under point updates
+
+    Order matches sort_products_by_popularity() and
+    sort_products_by_popularity_optimized() applied to the products in
+    the order they were added: highest popularity first, ties in catalog
+    order. An updated product keeps its catalog position.
+
+    Keys live in sorted blocks of about BLOCK_SIZE entries. Locating a
+    block is a bisect over block maxima and positional lookups go through
+    a Fenwick tree of block lengths, so updates, rank() and page() cost
+    O(log n) plus a shift inside one block instead of a full sort.
+    """
+
+    def __init__(self, products: Iterable[Dict] = ()):
+        self._products: Dict[Any, Dict] = {}
+        self._keys: Dict[Any, Key] = {}
+        self._by_ordinal: Dict[int, Any] = {}
+        self._next_ordinal = 0
+        self._blocks: List[List[Key]] = []
+        self._maxes: List[Key] = []
+        self._tree: List[int] = []
+
+        keys = []
+        for product in products:
+            product_id = product['id']
+            if product_id in self._products:
+                raise ValueError(f"Product {product_id!r} is already ranked")
+            key = self._register(product)
+            keys.append(key)
+        keys.sort()
+        self._blocks = [keys[i:i + BLOCK_SIZE] for i in range(0, len(keys), BLOCK_SIZE)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._rebuild_tree()
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __contains__(self, product_id: Any) -> bool:
+        return product_id in self._products
+
+    def __iter__(self) -> Iterator[Dict]:
+        for block in self._blocks:
+            for _, ordinal in block:
+                yield self._products[self._by_ordinal[ordinal]]
+
+    def add(self, product: Dict) -> None:
+        """
+        Rank a new product, placed after existing products on ties
+
+        Raises:
+            ValueError: If a product with the same id is already ranked
+        """
+        if product['id'] in self._products:
+            raise ValueError(f"Product {product['id']!r} is already ranked")
+        self._insert(self._register(product))
+
+    def update(self, product: Dict) -> None:
+        """
+        Replace a ranked product, e.g. after its popularity changed
+
+        Raises:
+            KeyError: If the product is not ranked
+        """
+        product_id = product['id']
+        old_key = self._keys[product_id]
+        new_key = (-product['popularity'], old_key[1])
+        self._products[product_id] = product
+        if new_key != old_key:
+            self._delete(old_key)
+            self._keys[product_id] = new_key
+            self._insert(new_key)
+
+    def update_popularity(self, product_id: Any, popularity) -> None:
+        """
+        Change one product's popularity
+
+        The stored product is replaced by a copy with the new score; the
+        caller's dictionary is not modified.
+
+        Raises:
+            KeyError: If the product is not ranked
+        """
+        self.update({**self._products[product_id], 'popularity': popularity})
+
+    def remove(self, product_id: Any) -> None:
+        """
+        Drop a product from the ranking
+
+        Raises:
+            KeyError: If the product is not ranked
+        """
+        key = self._keys.pop(product_id)
+        self._delete(key)
+        del self._products[product_id]
+        del self._by_ordinal[key[1]]
+
+    def rank(self, product_id: Any) -> int:
+        """
+        Zero-based position of a product in the ranking
+
+        Raises:
+            KeyError: If the product is not ranked
+        """
+        key = self._keys[product_id]
+        i = bisect_left(self._maxes, key)
+        return self._prefix(i) + bisect_left(self._blocks[i], key)
+
+    def page(self, offset: int, limit: int) -> List[Dict]:
+        """
+        Products at positions offset .. offset + limit - 1
+
+        Args:
+            offset: Zero-based start position
+            limit: Maximum number of products
+
+        Returns:
+            Products in ranking order
+        """
+        if offset < 0 or limit <= 0 or offset >= len(self._products):
+            return []
+        i, j = self._locate(offset)
+        result = []
+        while i < len(self._blocks) and len(result) < limit:
+            for _, ordinal in self._blocks[i][j:j + limit - len(result)]:
+                result.append(self._products[self._by_ordinal[ordinal]])
+            i, j = i + 1, 0
+        return result
+
+    def top(self, k: int) -> List[Dict]:
+        """The k most popular products"""
+        return self.page(0, k)
+
+    def _register(self, product: Dict) -> Key:
+        """Assign the next catalog ordinal and record the product's key"""
+        product_id = product['id']
+        key = (-product['popularity'], self._next_ordinal)
+        self._next_ordinal += 1
+        self._products[product_id] = product
+        self._keys[product_id] = key
+        self._by_ordinal[key[1]] = product_id
+        return key
+
+    def _insert(self, key: Key) -> None:
+        """Insert a key into its block, splitting the block if it grew too big"""
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            return
+
+        i = bisect_left(self._maxes, key)
+        if i == len(self._blocks):
+            i -= 1
+            self._blocks[i].append(key)
+            self._maxes[i] = key
+        else:
+            insort(self._blocks[i], key)
+
+        block = self._blocks[i]
+        if len(block) > 2 * BLOCK_SIZE:
+            self._blocks[i:i + 1] = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+            self._maxes[i:i + 1] = [block[BLOCK_SIZE - 1], block[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(i, 1)
+
+    def _delete(self, key: Key) -> None:
+        """Remove a key, dropping its block if it becomes empty"""
+        i = bisect_left(self._maxes, key)
+        block = self._blocks[i]
+        del block[bisect_left(block, key)]
+        if block:
+            self._maxes[i] = block[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+            self._rebuild_tree()
+
+    def _rebuild_tree(self) -> None:
+        """Build the Fenwick tree of block lengths in O(blocks)"""
+        tree = [len(block) for block in self._blocks]
+        for i in range(len(tree)):
+            parent = i | (i + 1)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, delta: int) -> None:
+        """Add delta to the length of block i"""
+        tree = self._tree
+        while i < len(tree):
+            tree[i] += delta
+            i |= i + 1
+
+    def _prefix(self, i: int) -> int:
+        """Total length of blocks before block i"""
+        total = 0
+        tree = self._tree
+        while i > 0:
+            total += tree[i - 1]
+            i &= i - 1
+        return total
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """Map a ranking position to (block index, index within block)"""
+        tree = self._tree
+        i = 0
+        step = 1 << max(len(tree).bit_length() - 1, 0)
+        while step:
+            candidate = i + step
+            if candidate <= len(tree) and tree[candidate - 1] <= position:
+                i = candidate
+                position -= tree[candidate - 1]
+            step >>= 1
+        return i, position
@@ -0,0 +1,212 @@
+"""
+Compact product record
+__slots__ objects with attributes and tags normalised and interned once at load time
+
+Usage:
+    products = load_products(product_dicts)  # or an NDJSON path
+    similar = find_similar(products[0], products)
+"""
+import heapq
+import sys
+from collections import Counter
+from operator import attrgetter, eq
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from similarity_index import ATTRIBUTE_WEIGHT, SIMILARITY_ATTRIBUTES, TAG_WEIGHT
+from streaming_dedup import Source, iter_records
+
+# Dict keys stored in their own slots; anything else goes to `extra`
+_CORE_FIELDS = ('id', 'name', 'brand', 'popularity', 'category', 'color', 'size', 'material', 'tags')
+_SCALAR_FIELDS = frozenset(_CORE_FIELDS) - {'tags'}
+
+# Slot holding the normalised value of each similarity attribute
+_ATTRIBUTE_SLOTS = {attr: ('brand_key' if attr == 'brand' else attr) for attr in SIMILARITY_ATTRIBUTES}
+
+
+def normalize(value: Optional[str]) -> Optional[str]:
+    """Lower-case and intern an attribute value or tag (None stays None)"""
+    return None if value is None else sys.intern(value.lower())
+
+
+class Product:
+    """
+    One catalog product
+
+    Similarity attributes and tags are lower-cased and interned when the
+    product is built, so equal values share one string object and
+    comparisons never re-normalise. Tags are a frozenset. `name` and
+    `brand` keep their original spelling because remove_duplicates()
+    compares them exactly; `brand_key` is the normalised brand.
+
+    Products also answer the read-only dict protocol (product['tags'],
+    'color' in product, product.get(...)) in the original dict shape, so
+    every function written for dict products accepts them unchanged.
+    """
+
+    __slots__ = ('id', 'name', 'brand', 'popularity', 'category', 'brand_key',
+                 'color', 'size', 'material', 'tags', 'extra')
+
+    def __init__(self, id: Any, name: Optional[str] = None, brand: Optional[str] = None,
+                 popularity=None, category: Optional[str] = None, color: Optional[str] = None,
+                 size: Optional[str] = None, material: Optional[str] = None,
+                 tags: Iterable[str] = (), extra: Optional[Dict] = None):
+        self.id = id
+        self.name = name
+        self.brand = None if brand is None else sys.intern(brand)
+        self.popularity = popularity
+        self.category = normalize(category)
+        self.brand_key = normalize(brand)
+        self.color = normalize(color)
+        self.size = normalize(size)
+        self.material = normalize(material)
+        self.tags = frozenset(normalize(tag) for tag in tags)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Product':
+        """
+        Build a Product from the dict shape used in product_sorting
+
+        Keys other than the core fields are kept in `extra`.
+        """
+        extra = {key: value for key, value in data.items() if key not in _CORE_FIELDS}
+        return cls(
+            data['id'], data.get('name'), data.get('brand'), data.get('popularity'),
+            data.get('category'), data.get('color'), data.get('size'),
+            data.get('material'), data.get('tags', ()), extra
+        )
+
+    def to_dict(self) -> Dict:
+        """Convert back to a dict (attributes and tags come back normalised)"""
+        return dict(self.items())
+
+    def items(self) -> Iterator:
+        """(key, value) pairs of the fields that are present"""
+        for key in _CORE_FIELDS:
+            if key == 'tags':
+                yield key, sorted(self.tags)
+            elif key in self:
+                yield key, self[key]
+        if self.extra:
+            yield from self.extra.items()
+
+    def __getitem__(self, key: str):
+        if key == 'tags':
+            return self.tags
+        if key in _SCALAR_FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key: str, default=None):
+        """dict.get equivalent"""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def similarity_features(self):
+        """Features in the form returned by similarity_index.product_features()"""
+        attributes = [
+            (attr, getattr(self, slot))
+            for attr, slot in _ATTRIBUTE_SLOTS.items()
+            if getattr(self, slot) is not None
+        ]
+        return attributes, Counter(self.tags)
+
+    def __repr__(self) -> str:
+        return f"Product(id={self.id!r}, name={self.name!r}, brand={self.brand!r})"
+
+
+def load_products(source: Source) -> List[Product]:
+    """
+    Load products from dicts, an NDJSON file path or an open NDJSON file
+
+    Args:
+        source: Anything streaming_dedup.iter_records accepts
+
+    Returns:
+        List of Product objects
+    """
+    return [item if isinstance(item, Product) else Product.from_dict(item)
+            for item in iter_records(source)]
+
+
+def sort_by_popularity(products: Iterable[Product]) -> List[Product]:
+    """
+    Most popular first, ties in input order
+
+    Same order as sort_products_by_popularity_optimized(), reading the
+    slot instead of a dict key.
+    """
+    return sorted(products, key=attrgetter('popularity'), reverse=True)
+
+
+# Normalised similarity attributes of a product as one tuple
+_attribute_values = attrgetter(*_ATTRIBUTE_SLOTS.values())
+
+# Stands in for a missing target attribute; equal to nothing
+_MISSING = object()
+
+
+def similarity_score(target: Product, product: Product) -> float:
+    """
+    Similarity of two products
+
+    1 per matching attribute and 0.5 per shared tag. Tags are sets, so a
+    tag listed twice counts once (find_similar_products counts every pair).
+    """
+    target_values = [_MISSING if v is None else v for v in _attribute_values(target)]
+    matches = sum(map(eq, target_values, _attribute_values(product)))
+    return ATTRIBUTE_WEIGHT * matches + TAG_WEIGHT * len(target.tags & product.tags)
+
+
+def find_similar(target: Product, products: Iterable[Product], k: int = 10) -> List[Product]:
+    """
+    Top-k similar products by a single scan over pre-normalised fields
+
+    Args:
+        target: Product to find similarities for
+        products: Candidate products
+        k: Number of results
+
+    Returns:
+        Up to k products with score > 0, best first, ties in input order
+    """
+    products = products if isinstance(products, list) else list(products)
+    target_values = [_MISSING if v is None else v for v in _attribute_values(target)]
+    target_tags = target.tags
+    target_id = target.id
+
+    scored = []
+    for position, product in enumerate(products):
+        if product.id == target_id:
+            continue
+        score = ATTRIBUTE_WEIGHT * sum(map(eq, target_values, _attribute_values(product)))
+        if target_tags:
+            score += TAG_WEIGHT * len(target_tags.intersection(product.tags))
+        if score > 0:
+            scored.append((score, -position))
+    return [products[-position] for _, position in heapq.nlargest(k, scored)]
+
+
+def remove_duplicates(products: Iterable[Product]) -> List[Product]:
+    """First product for each exact (name, brand), as remove_duplicates_optimized()"""
+    seen = set()
+    unique = []
+    for product in products:
+        key = (product.name, product.brand)
+        if key not in seen:
+            seen.add(key)
+            unique.append(product)
+    return unique
@@ -2,6 +2,7 @@
 Product sorting and filtering algorithms
 PERFORMANCE ISSUE: O(n²) complexity
 """
+from collections import Counter
 from typing import List, Dict, Any
 
 
@@ -173,9 +174,16 @@ def sort_products_by_popularity_optimized(products: List[Dict]) -> List[Dict]:
 def find_similar_products_optimized(target_product: Dict, all_products: List[Dict]) -> List[Dict]:
     """
     More efficient similarity search - O(n)
+
+    Same scores and order as find_similar_products(): 1 per matching
+    attribute, 0.5 per matching (tag, tag) pair, ties in catalog order.
     """
-    # Pre-compute target attributes as set for O(1) lookups
-    target_tags = set(tag.lower() for tag in target_product.get('tags', []))
+    attributes = ['category', 'brand', 'color', 'size', 'material']
+    # Pre-compute target attributes and tag counts once
+    target_values = {
+        attr: target_product[attr].lower() for attr in attributes if attr in target_product
+    }
+    target_tags = Counter(tag.lower() for tag in target_product.get('tags', []))
     
     similar = []
     for product in all_products:
@@ -185,21 +193,20 @@ def find_similar_products_optimized(target_product: Dict, all_products: List[Dic
         score = 0
         
         # Simple attribute comparison
-        for attr in ['category', 'brand', 'color']:
-            if (attr in product and attr in target_product and 
-                product[attr].lower() == target_product[attr].lower()):
+        for attr, value in target_values.items():
+            if attr in product and product[attr].lower() == value:
                 score += 1
         
-        # Efficient tag comparison using set intersection
-        product_tags = set(tag.lower() for tag in product.get('tags', []))
-        common_tags = len(target_tags & product_tags)
-        score += common_tags * 0.5
+        # Each tag counted once per matching tag of the target, as in the nested loop
+        if target_tags:
+            for tag in product.get('tags', []):
+                score += 0.5 * target_tags.get(tag.lower(), 0)
         
         if score > 0:
             similar.append((score, product))
     
-    # Efficient sorting
-    similar.sort(reverse=True)
+    # Sort on the score only: dicts do not compare, and a stable sort keeps ties in catalog order
+    similar.sort(key=lambda item: item[0], reverse=True)
     return [product for _, product in similar[:10]]
 
 
@@ -0,0 +1,226 @@
+"""
+Inverted index for similar-product search
+Posting lists per (attribute, value) and per tag, with heap-based top-k
+
+Usage:
+    index = ProductSimilarityIndex(all_products)
+    similar = index.query(target_product, k=10)  # same results as find_similar_products for dicts
+    index.update(changed_product)                 # incremental add/update/remove
+"""
+import heapq
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+# Same attributes and weights as find_similar_products
+SIMILARITY_ATTRIBUTES = ('category', 'brand', 'color', 'size', 'material')
+ATTRIBUTE_WEIGHT = 1
+TAG_WEIGHT = 0.5
+
+
+def product_features(product: Dict) -> Tuple[List[Tuple[str, str]], Counter]:
+    """
+    Extract the normalised features used for similarity scoring
+
+    Args:
+        product: Product dictionary
+
+    Returns:
+        ([(attribute, lower-cased value), ...], Counter of lower-cased tags)
+    """
+    # product_model.Product carries these pre-normalised (tag counts are
+    # all 1: its tags are a set)
+    precomputed = getattr(product, 'similarity_features', None)
+    if precomputed is not None:
+        return precomputed()
+
+    attributes = [
+        (attr, product[attr].lower())
+        for attr in SIMILARITY_ATTRIBUTES
+        if attr in product
+    ]
+    tags = Counter(tag.lower() for tag in product.get('tags', ()))
+    return attributes, tags
+
+
+def features_score(target_features: Tuple[Iterable[Tuple[str, str]], Counter],
+                   features: Tuple[Iterable[Tuple[str, str]], Counter]) -> float:
+    """
+    Score two products from their product_features()
+
+    Args:
+        target_features: Features of the target product
+        features: Features of the candidate product
+
+    Returns:
+        The score find_similar_products would give the candidate
+    """
+    target_attributes, target_tags = target_features
+    attributes, tags = features
+    matches = len(set(target_attributes).intersection(attributes))
+    tag_pairs = sum(count * tags[tag] for tag, count in target_tags.items() if tag in tags)
+    return ATTRIBUTE_WEIGHT * matches + TAG_WEIGHT * tag_pairs
+
+
+class ProductSimilarityIndex:
+    """
+    Similar-product index
+
+    For dict products, scores match find_similar_products exactly: 1 per
+    matching attribute (case-insensitive) and 0.5 per matching (tag, tag)
+    pair, so a tag listed twice counts twice. Ties keep catalog order,
+    as the stable sort in find_similar_products does.
+
+    product_model.Product keeps its tags as a set, so for Product inputs
+    a repeated tag counts once and scores follow
+    product_model.similarity_score instead; the two agree whenever no
+    product lists a tag twice.
+
+    A query only touches the posting lists of the target's own features,
+    so its cost depends on posting-list sizes, not on catalog size.
+    """
+
+    def __init__(self, products: Iterable[Dict] = ()):
+        self._products: Dict[Any, Dict] = {}
+        self._ordinals: Dict[Any, int] = {}
+        self._features: Dict[Any, Tuple[List[Tuple[str, str]], Counter]] = {}
+        self._attribute_postings: Dict[Tuple[str, str], Set[Any]] = {}
+        self._tag_postings: Dict[str, Dict[Any, int]] = {}
+        self._next_ordinal = 0
+        for product in products:
+            self.add(product)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __contains__(self, product_id: Any) -> bool:
+        return product_id in self._products
+
+    def add(self, product: Dict) -> None:
+        """
+        Index a new product at the end of the catalog
+
+        Args:
+            product: Product dictionary with a unique 'id'
+
+        Raises:
+            ValueError: If a product with the same id is already indexed
+        """
+        product_id = product['id']
+        if product_id in self._products:
+            raise ValueError(f"Product {product_id!r} is already indexed")
+        self._ordinals[product_id] = self._next_ordinal
+        self._next_ordinal += 1
+        self._insert(product)
+
+    def update(self, product: Dict) -> None:
+        """
+        Re-index a product whose attributes or tags changed
+
+        The product keeps its catalog position for tie-breaking.
+
+        Args:
+            product: New version of an indexed product
+
+        Raises:
+            KeyError: If the product is not indexed
+        """
+        product_id = product['id']
+        if product_id not in self._products:
+            raise KeyError(product_id)
+        self._delete_postings(product_id)
+        self._insert(product)
+
+    def remove(self, product_id: Any) -> None:
+        """
+        Drop a product from the index
+
+        Args:
+            product_id: Id of the product to remove
+
+        Raises:
+            KeyError: If the product is not indexed
+        """
+        if product_id not in self._products:
+            raise KeyError(product_id)
+        self._delete_postings(product_id)
+        del self._products[product_id]
+        del self._ordinals[product_id]
+
+    def scores(self, target_product: Dict) -> Dict[Any, float]:
+        """
+        Score every product sharing at least one feature with the target
+
+        Args:
+            target_product: Product to compare against (need not be indexed)
+
+        Returns:
+            Mapping of product id to similarity score (> 0)
+        """
+        attributes, tags = product_features(target_product)
+        scores: Dict[Any, float] = {}
+
+        for key in attributes:
+            for product_id in self._attribute_postings.get(key, ()):
+                scores[product_id] = scores.get(product_id, 0) + ATTRIBUTE_WEIGHT
+
+        for tag, target_count in tags.items():
+            for product_id, count in self._tag_postings.get(tag, {}).items():
+                scores[product_id] = scores.get(product_id, 0) + TAG_WEIGHT * count * target_count
+
+        scores.pop(target_product['id'], None)
+        return scores
+
+    def query(self, target_product: Dict, k: int = 10) -> List[Dict]:
+        """
+        Find the products most similar to a target
+
+        Args:
+            target_product: Product to find similarities for
+            k: Number of results
+
+        Returns:
+            Up to k products, best score first, ties in catalog order
+        """
+        return [self._products[product_id] for product_id, _ in self.query_scores(target_product, k)]
+
+    def query_scores(self, target_product: Dict, k: int = 10) -> List[Tuple[Any, float]]:
+        """
+        Like query(), but return (product id, score) pairs
+
+        Args:
+            target_product: Product to find similarities for
+            k: Number of results
+
+        Returns:
+            Up to k (product id, score) pairs in query() order
+        """
+        ordinals = self._ordinals
+        return heapq.nlargest(
+            k, self.scores(target_product).items(),
+            key=lambda item: (item[1], -ordinals[item[0]])
+        )
+
+    def _insert(self, product: Dict) -> None:
+        """Store a product and add it to its posting lists"""
+        product_id = product['id']
+        attributes, tags = product_features(product)
+        self._products[product_id] = product
+        self._features[product_id] = (attributes, tags)
+        for key in attributes:
+            self._attribute_postings.setdefault(key, set()).add(product_id)
+        for tag, count in tags.items():
+            self._tag_postings.setdefault(tag, {})[product_id] = count
+
+    def _delete_postings(self, product_id: Any) -> None:
+        """Remove a product from its posting lists, dropping empty lists"""
+        attributes, tags = self._features.pop(product_id)
+        for key in attributes:
+            postings = self._attribute_postings[key]
+            postings.discard(product_id)
+            if not postings:
+                del self._attribute_postings[key]
+        for tag in tags:
+            postings = self._tag_postings[tag]
+            del postings[product_id]
+            if not postings:
+                del self._tag_postings[tag]
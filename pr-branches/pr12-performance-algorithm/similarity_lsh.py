@@ -0,0 +1,207 @@
+"""
+Approximate similar-product search with MinHash and LSH banding
+Only bucket collisions are re-ranked with the exact similarity score
+
+Usage (see bench_similarity_lsh.py for recall/speed per setting):
+    lsh = MinHashLSHIndex(all_products, bands=32, rows=3)
+    similar = lsh.query(target_product, k=10)
+"""
+import hashlib
+import heapq
+import random
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from similarity_index import features_score, product_features
+
+# Mersenne prime modulus for the universal hash family
+_PRIME = (1 << 61) - 1
+
+DEFAULT_BANDS = 16
+DEFAULT_ROWS = 4
+
+
+def feature_tokens(features) -> Set[str]:
+    """
+    Turn product_features() output into the set MinHash is computed over
+
+    Args:
+        features: (attributes, tag counts) as returned by product_features
+
+    Returns:
+        Set of "attr=value" and "tag=value" tokens
+    """
+    attributes, tags = features
+    tokens = {f"{attr}={value}" for attr, value in attributes}
+    tokens.update(f"tag={tag}" for tag in tags)
+    return tokens
+
+
+def _token_hash(token: str) -> int:
+    """Stable 61-bit hash of a token (independent of PYTHONHASHSEED)"""
+    digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % _PRIME
+
+
+class MinHashLSHIndex:
+    """
+    Approximate similar-product index
+
+    Each product's normalised attribute and tag tokens are summarised by
+    bands * rows MinHash values. Products whose signatures agree on all
+    rows of at least one band land in the same bucket. A query scores
+    only those collisions, exactly as ProductSimilarityIndex would, and
+    returns the best k.
+
+    More bands (or fewer rows per band) raise recall and the number of
+    candidates scored; fewer bands or more rows make queries cheaper.
+    Two products with token Jaccard similarity s collide with
+    probability 1 - (1 - s**rows) ** bands.
+    """
+
+    def __init__(self, products: Iterable[Dict] = (), bands: int = DEFAULT_BANDS,
+                 rows: int = DEFAULT_ROWS, seed: int = 1):
+        if bands < 1 or rows < 1:
+            raise ValueError("bands and rows must be positive")
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(seed)
+        self._hash_params = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(bands * rows)
+        ]
+        self._products: Dict[Any, Dict] = {}
+        self._ordinals: Dict[Any, int] = {}
+        self._features: Dict[Any, Tuple] = {}
+        self._band_keys: Dict[Any, List[Tuple[int, ...]]] = {}
+        self._buckets: List[Dict[Tuple[int, ...], Set[Any]]] = [{} for _ in range(bands)]
+        self._next_ordinal = 0
+        for product in products:
+            self.add(product)
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __contains__(self, product_id: Any) -> bool:
+        return product_id in self._products
+
+    def signature(self, features) -> List[int]:
+        """
+        MinHash signature of a product's features
+
+        Args:
+            features: (attributes, tag counts) as returned by product_features
+
+        Returns:
+            bands * rows minimum hash values; all _PRIME for an empty product
+        """
+        hashes = [_token_hash(token) for token in feature_tokens(features)]
+        if not hashes:
+            return [_PRIME] * len(self._hash_params)
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._hash_params]
+
+    def _bands_of(self, signature: List[int]) -> List[Tuple[int, ...]]:
+        """Split a signature into one bucket key per band"""
+        rows = self.rows
+        return [tuple(signature[i * rows:(i + 1) * rows]) for i in range(self.bands)]
+
+    def add(self, product: Dict) -> None:
+        """
+        Index a new product at the end of the catalog
+
+        Raises:
+            ValueError: If a product with the same id is already indexed
+        """
+        product_id = product['id']
+        if product_id in self._products:
+            raise ValueError(f"Product {product_id!r} is already indexed")
+        self._ordinals[product_id] = self._next_ordinal
+        self._next_ordinal += 1
+        self._insert(product)
+
+    def update(self, product: Dict) -> None:
+        """
+        Re-index a changed product, keeping its catalog position
+
+        Raises:
+            KeyError: If the product is not indexed
+        """
+        product_id = product['id']
+        if product_id not in self._products:
+            raise KeyError(product_id)
+        self._delete_buckets(product_id)
+        self._insert(product)
+
+    def remove(self, product_id: Any) -> None:
+        """
+        Drop a product from the index
+
+        Raises:
+            KeyError: If the product is not indexed
+        """
+        if product_id not in self._products:
+            raise KeyError(product_id)
+        self._delete_buckets(product_id)
+        del self._products[product_id]
+        del self._ordinals[product_id]
+        del self._features[product_id]
+
+    def candidates(self, target_product: Dict) -> Set[Any]:
+        """
+        Ids of products colliding with the target in at least one band
+
+        Args:
+            target_product: Product to find similarities for
+
+        Returns:
+            Candidate product ids, excluding the target's own id
+        """
+        product_id = target_product['id']
+        if product_id in self._products and self._products[product_id] is target_product:
+            band_keys = self._band_keys[product_id]
+        else:
+            band_keys = self._bands_of(self.signature(product_features(target_product)))
+
+        found: Set[Any] = set()
+        for buckets, key in zip(self._buckets, band_keys):
+            found.update(buckets.get(key, ()))
+        found.discard(product_id)
+        return found
+
+    def query(self, target_product: Dict, k: int = 10) -> List[Dict]:
+        """
+        Approximate top-k similar products
+
+        Args:
+            target_product: Product to find similarities for
+            k: Number of results
+
+        Returns:
+            Up to k products, best exact score first, ties in catalog order
+        """
+        target_features = product_features(target_product)
+        ordinals = self._ordinals
+        scored = []
+        for product_id in self.candidates(target_product):
+            score = features_score(target_features, self._features[product_id])
+            if score > 0:
+                scored.append((score, -ordinals[product_id], product_id))
+        return [self._products[product_id] for _, _, product_id in heapq.nlargest(k, scored)]
+
+    def _insert(self, product: Dict) -> None:
+        """Store a product and add it to one bucket per band"""
+        product_id = product['id']
+        features = product_features(product)
+        band_keys = self._bands_of(self.signature(features))
+        self._products[product_id] = product
+        self._features[product_id] = features
+        self._band_keys[product_id] = band_keys
+        for buckets, key in zip(self._buckets, band_keys):
+            buckets.setdefault(key, set()).add(product_id)
+
+    def _delete_buckets(self, product_id: Any) -> None:
+        """Remove a product from its buckets, dropping empty buckets"""
+        for buckets, key in zip(self._buckets, self._band_keys.pop(product_id)):
+            bucket = buckets[key]
+            bucket.discard(product_id)
+            if not bucket:
+                del buckets[key]
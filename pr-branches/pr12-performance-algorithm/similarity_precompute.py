@@ -0,0 +1,256 @@
+"""
+Precomputed similar products
+Parallel top-k computation written to a fixed-width file, read back through mmap
+
+File layout (native byte order, recorded in the header):
+    header  "SIMTOPK1" | byte order (1 byte) | 3 pad | k (uint32) | count (uint64)
+    record  k neighbour ordinals (uint32, EMPTY when unused) | k scores (float32)
+Record i belongs to the product at catalog position i, so a lookup is
+one offset computation.
+
+Usage:
+    python similarity_precompute.py catalog.ndjson similar.bin [--k 10] [--workers 4]
+
+Usage from Python:
+    precompute_similar(all_products, 'similar.bin', workers=8)
+    with SimilarityLookup('similar.bin') as lookup:
+        neighbours = lookup.neighbours(ordinal)  # [(neighbour ordinal, score), ...]
+"""
+import argparse
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from similarity_index import ProductSimilarityIndex
+from streaming_dedup import iter_records
+
+MAGIC = b'SIMTOPK1'
+HEADER = struct.Struct('=8sc3xIQ')
+
+# Neighbour slot with no product
+EMPTY = 0xFFFFFFFF
+
+DEFAULT_K = 10
+SHARD_SIZE = 1000
+
+# Per-worker state, set up once by _init_worker (or inherited from the
+# parent when the pool forks)
+_index: Optional[ProductSimilarityIndex] = None
+_products: Sequence[Dict] = ()
+_ordinals: Dict = {}
+_k = DEFAULT_K
+
+
+def _init_worker(products: Sequence[Dict], k: int) -> None:
+    """Build the similarity index once per worker process"""
+    global _index, _products, _ordinals, _k
+    _products = products
+    _ordinals = {product['id']: i for i, product in enumerate(products)}
+    _index = ProductSimilarityIndex(products)
+    _k = k
+
+
+def _clear_worker_state() -> None:
+    """Drop the index built in the parent for forked workers"""
+    global _index, _products, _ordinals, _k
+    _index, _products, _ordinals, _k = None, (), {}, DEFAULT_K
+
+
+def _encode_record(neighbours: List[Tuple[int, float]], k: int) -> bytes:
+    """Pack (ordinal, score) pairs into one fixed-width record"""
+    ordinals = array('I', [ordinal for ordinal, _ in neighbours])
+    scores = array('f', [score for _, score in neighbours])
+    ordinals.extend([EMPTY] * (k - len(neighbours)))
+    scores.extend([0.0] * (k - len(neighbours)))
+    return ordinals.tobytes() + scores.tobytes()
+
+
+def _compute_shard(shard: Tuple[int, int]) -> Tuple[int, bytes]:
+    """Top-k records for catalog positions start..end-1"""
+    start, end = shard
+    records = []
+    for ordinal in range(start, end):
+        top = _index.query_scores(_products[ordinal], _k)
+        records.append(_encode_record([(_ordinals[pid], score) for pid, score in top], _k))
+    return start, b''.join(records)
+
+
+def record_size(k: int) -> int:
+    """Bytes per product record"""
+    return k * (array('I').itemsize + array('f').itemsize)
+
+
+def precompute_similar(products: Sequence[Dict], path: str, k: int = DEFAULT_K,
+                       workers: Optional[int] = None, shard_size: int = SHARD_SIZE) -> int:
+    """
+    Compute every product's top-k similar products and write them to path
+
+    Scores are those of find_similar_products (computed through
+    ProductSimilarityIndex); shards of catalog positions are spread over
+    a multiprocessing pool and each result is written straight to its
+    fixed offset. The file is written under a temporary name, renamed
+    when complete and removed if any worker fails.
+
+    Where the pool forks (the Linux default), the index is built once
+    here and inherited by every worker; elsewhere each worker builds its
+    own from a pickled copy of the catalog in the pool initializer.
+
+    Args:
+        products: Catalog; a product's position is its ordinal in the file
+        path: Output file
+        k: Neighbours per product
+        workers: Worker processes (default: CPU count)
+        shard_size: Products per task
+
+    Returns:
+        Number of products written
+
+    Raises:
+        ValueError: If product ids are not unique
+    """
+    products = list(products)
+    if len({product['id'] for product in products}) != len(products):
+        raise ValueError("Product ids must be unique")
+
+    size = record_size(k)
+    shards = [(start, min(start + shard_size, len(products)))
+              for start in range(0, len(products), shard_size)]
+    tmp_path = f"{path}.tmp"
+
+    context = multiprocessing.get_context()
+    if context.get_start_method() == 'fork':
+        _init_worker(products, k)
+        pool_options = {}
+    else:
+        pool_options = {'initializer': _init_worker, 'initargs': (products, k)}
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, sys.byteorder[0].encode(), k, len(products)))
+            f.truncate(HEADER.size + size * len(products))
+            with context.Pool(workers or os.cpu_count() or 1, **pool_options) as pool:
+                for start, data in pool.imap_unordered(_compute_shard, shards):
+                    f.seek(HEADER.size + start * size)
+                    f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        _clear_worker_state()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(products)
+
+
+class SimilarityLookup:
+    """
+    Read-only view of a file written by precompute_similar
+
+    The file is mmap'ed, so every worker process serving lookups shares
+    the same page-cached copy. neighbours_view() returns memoryviews
+    straight into the mapping without copying.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a similarity file")
+        magic, byteorder, self.k, self.count = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a similarity file")
+        if byteorder != sys.byteorder[0].encode():
+            self.close()
+            raise ValueError(f"{path} was written on a host with different byte order")
+        self._record_size = record_size(self.k)
+        actual, expected = len(self._map), HEADER.size + self.count * self._record_size
+        if actual != expected:
+            self.close()
+            raise ValueError(f"{path} is {actual} bytes, expected {expected} "
+                             f"for {self.count} records of k={self.k}")
+        self._view = memoryview(self._map)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> 'SimilarityLookup':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def neighbours_view(self, ordinal: int) -> Tuple[memoryview, memoryview]:
+        """
+        Zero-copy neighbour ordinals and scores of one product
+
+        Args:
+            ordinal: Catalog position of the product
+
+        Returns:
+            (uint32 ordinals, float32 scores), each of length k; unused
+            slots hold EMPTY / 0.0. Release them (or drop them) before
+            close().
+
+        Raises:
+            IndexError: If ordinal is out of range
+        """
+        if not 0 <= ordinal < self.count:
+            raise IndexError(ordinal)
+        start = HEADER.size + ordinal * self._record_size
+        middle = start + self.k * array('I').itemsize
+        return (self._view[start:middle].cast('I'),
+                self._view[middle:start + self._record_size].cast('f'))
+
+    def neighbours(self, ordinal: int) -> List[Tuple[int, float]]:
+        """
+        Neighbour (ordinal, score) pairs of one product, best first
+
+        Raises:
+            IndexError: If ordinal is out of range
+        """
+        ordinals, scores = self.neighbours_view(ordinal)
+        with ordinals, scores:
+            return [(o, s) for o, s in zip(ordinals, scores) if o != EMPTY]
+
+    def close(self) -> None:
+        """
+        Release the mapping and the file
+
+        Raises:
+            BufferError: If views from neighbours_view() are still alive
+        """
+        view = getattr(self, '_view', None)
+        if view is not None:
+            view.release()
+            self._view = None
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+
+def main():
+    """Precompute similar products for an NDJSON catalog"""
+    parser = argparse.ArgumentParser(description='Precompute top-k similar products')
+    parser.add_argument('catalog', help='NDJSON catalog; line order defines ordinals')
+    parser.add_argument('output')
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    args = parser.parse_args()
+
+    count = precompute_similar(list(iter_records(args.catalog)), args.output,
+                               args.k, args.workers, args.shard_size)
+    print(f"# wrote {count} products to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
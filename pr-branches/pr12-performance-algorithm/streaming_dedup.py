@@ -0,0 +1,216 @@
+"""
+Streaming deduplication for product feeds larger than memory
+In-memory seen-set up to a budget, then hash-partitioned spill files
+
+Usage (newline-delimited JSON in, unique records out):
+    python streaming_dedup.py feed.ndjson [--memory-mb 512] [--spill-dir /tmp] > unique.ndjson
+
+Usage from Python (first occurrence of each (name, brand)):
+    for product in stream_unique('feed.ndjson', memory_budget=512 * 1024 * 1024):
+        ...
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, Tuple, Union
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+DEFAULT_PARTITIONS = 64
+
+# Rough per-key cost of a set entry beyond the key objects themselves
+SET_ENTRY_OVERHEAD = 48
+
+# Partitions that still do not fit are re-split at most this many times
+MAX_DEPTH = 4
+
+Source = Union[str, os.PathLike, IO, Iterable[Dict]]
+
+logger = logging.getLogger(__name__)
+
+
+def dedup_key(product: Dict) -> Tuple[Any, Any]:
+    """The (name, brand) key used by remove_duplicates()"""
+    return product['name'], product['brand']
+
+
+def iter_records(source: Source) -> Iterator[Dict]:
+    """
+    Iterate over records from a path, an open NDJSON file or an iterable
+
+    Args:
+        source: File path, text/binary file object, or iterable of dicts
+
+    Yields:
+        Records in input order (blank lines are skipped)
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding='utf-8') as f:
+            yield from iter_records(f)
+    elif isinstance(source, io.IOBase) or hasattr(source, 'readline'):
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from source
+
+
+def _key_cost(key: Any) -> int:
+    """Approximate bytes a key (a tuple, or a single scalar) adds to the seen-set"""
+    parts = key if isinstance(key, tuple) else ()
+    return sys.getsizeof(key) + sum(sys.getsizeof(part) for part in parts) + SET_ENTRY_OVERHEAD
+
+
+class StreamingDeduplicator:
+    """
+    Deduplicate a stream of records on (name, brand), keeping first occurrences
+
+    While the seen-set fits in memory_budget, unique records are yielded
+    as they arrive. After that, records with unseen keys are written to
+    one of `partitions` spill files chosen by a hash of the key, so every
+    copy of a key lands in the same file in input order. Each file is
+    then deduplicated on its own; one that still does not fit is split
+    again with a different hash salt.
+
+    Output order: records yielded before the budget was reached come in
+    input order; spilled records follow partition by partition, in input
+    order within a partition. The record kept for each key is always its
+    first occurrence, as with remove_duplicates().
+
+    A partition still over budget after MAX_DEPTH re-splits is deduped
+    in memory regardless, with a warning logged; over_budget counts the
+    keys kept beyond the budget that way.
+
+    key may return a tuple or a single value (e.g. a str). Records must
+    be JSON-serialisable to be spilled.
+    """
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                 partitions: int = DEFAULT_PARTITIONS, spill_dir: str = None,
+                 key: Callable[[Dict], Any] = dedup_key):
+        if partitions < 2:
+            raise ValueError("partitions must be at least 2")
+        self.memory_budget = memory_budget
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.key = key
+        self.records_in = 0
+        self.duplicates = 0
+        self.spilled = 0
+        self.over_budget = 0
+
+    def dedupe(self, source: Source) -> Iterator[Dict]:
+        """
+        Yield unique records from a path, NDJSON file object or iterable
+
+        Spill files live in a temporary directory that is removed when
+        the generator finishes or is closed.
+        """
+        self.records_in = self.duplicates = self.spilled = self.over_budget = 0
+        with tempfile.TemporaryDirectory(prefix='dedup-', dir=self.spill_dir) as workdir:
+            yield from self._dedupe(self._count(iter_records(source)), workdir, depth=0)
+
+    def _count(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """Count input records as they pass through"""
+        for record in records:
+            self.records_in += 1
+            yield record
+
+    def _dedupe(self, records: Iterable[Dict], workdir: str, depth: int) -> Iterator[Dict]:
+        """Dedupe in memory until the budget is hit, then spill and recurse"""
+        seen = set()
+        used = 0
+        spill_files = None
+        key_fn = self.key
+
+        for record in records:
+            key = key_fn(record)
+            if key in seen:
+                self.duplicates += 1
+                continue
+
+            if spill_files is None:
+                cost = _key_cost(key)
+                fits = used + cost <= self.memory_budget
+                if fits or depth >= MAX_DEPTH:
+                    if not fits:
+                        if not self.over_budget:
+                            logger.warning("Partition still over the %d byte budget after %d re-splits; "
+                                           "deduplicating it in memory", self.memory_budget, MAX_DEPTH)
+                        self.over_budget += 1
+                    seen.add(key)
+                    used += cost
+                    yield record
+                    continue
+                spill_files = self._open_partitions(workdir, depth)
+
+            partition = self._partition(key, depth)
+            spill_files[partition][1].write(json.dumps(record) + '\n')
+            self.spilled += 1
+
+        if spill_files is None:
+            return
+
+        # Keys in `seen` were never spilled, so partitions start from scratch
+        del seen
+        for _, f in spill_files:
+            f.close()
+        for path, _ in spill_files:
+            subdir = f"{path}.d"
+            os.mkdir(subdir)
+            yield from self._dedupe(iter_records(path), subdir, depth + 1)
+            os.remove(path)
+
+    def _open_partitions(self, workdir: str, depth: int):
+        """Create one spill file per partition"""
+        files = []
+        for i in range(self.partitions):
+            path = os.path.join(workdir, f"part-{depth}-{i:04d}.ndjson")
+            files.append((path, open(path, 'w', encoding='utf-8')))
+        return files
+
+    def _partition(self, key: Any, depth: int) -> int:
+        """Stable partition for a key; depth salts the hash for re-splits"""
+        data = json.dumps([depth, key], default=str).encode()
+        digest = hashlib.blake2b(data, digest_size=8).digest()
+        return int.from_bytes(digest, 'big') % self.partitions
+
+
+def stream_unique(source: Source, **kwargs) -> Iterator[Dict]:
+    """
+    Convenience wrapper: StreamingDeduplicator(**kwargs).dedupe(source)
+
+    Args:
+        source: File path, NDJSON file object, or iterable of dicts
+        **kwargs: memory_budget, partitions, spill_dir, key
+
+    Yields:
+        First occurrence of each (name, brand)
+    """
+    return StreamingDeduplicator(**kwargs).dedupe(source)
+
+
+def main():
+    """Deduplicate an NDJSON feed to stdout"""
+    parser = argparse.ArgumentParser(description='Deduplicate an NDJSON product feed on (name, brand)')
+    parser.add_argument('source', help="NDJSON file, or '-' for stdin")
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024))
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS)
+    parser.add_argument('--spill-dir', default=None)
+    args = parser.parse_args()
+
+    deduplicator = StreamingDeduplicator(args.memory_mb * 1024 * 1024, args.partitions, args.spill_dir)
+    source = sys.stdin if args.source == '-' else args.source
+    out = sys.stdout
+    for record in deduplicator.dedupe(source):
+        out.write(json.dumps(record) + '\n')
+    print(f"# {deduplicator.records_in} records, {deduplicator.duplicates} duplicates, "
+          f"{deduplicator.spilled} spilled, {deduplicator.over_budget} kept over budget", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
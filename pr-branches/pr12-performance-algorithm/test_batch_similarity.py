@@ -0,0 +1,95 @@
+"""
+Tests for vectorized batch similarity scoring
+"""
+import numpy as np
+
+from batch_similarity import BatchSimilarity
+from product_sorting import find_similar_products
+from similarity_index import features_score, product_features
+
+
+def test_every_product_matches_find_similar_products(make_catalog):
+    """Test each product's list equals the naive implementation on a 400-product catalog"""
+    catalog = make_catalog(400, seed=5)
+    batch = BatchSimilarity(catalog)
+
+    results = list(batch.similar_products(chunk_size=37))
+
+    assert [product for product, _ in results] == catalog
+    for product, similar in results:
+        assert similar == find_similar_products(product, catalog)
+
+
+def test_score_block_matches_pairwise_scores(make_catalog):
+    """Test the score matrix equals features_score for every pair"""
+    catalog = make_catalog(60, seed=6)
+    batch = BatchSimilarity(catalog)
+    features = [product_features(p) for p in catalog]
+
+    scores = batch.score_block(np.arange(len(catalog)))
+
+    for i, target in enumerate(features):
+        for j, other in enumerate(features):
+            expected = 0 if i == j else features_score(target, other)
+            assert scores[i, j] == expected
+
+
+def test_chunk_size_does_not_change_results(make_catalog):
+    """Test blocks of any size give the same neighbours"""
+    catalog = make_catalog(120, seed=7)
+    batch = BatchSimilarity(catalog)
+
+    whole = list(batch.similar_products())
+    single = list(batch.similar_products(chunk_size=1))
+
+    assert whole == single
+
+
+def test_k_larger_than_catalog(make_catalog):
+    """Test k above the catalog size pads with -1 and returns every match"""
+    catalog = make_catalog(8, seed=8)
+    batch = BatchSimilarity(catalog)
+
+    indices, scores = batch.top_k_block(np.arange(len(catalog)), k=50)
+
+    assert indices.shape == (8, 50)
+    assert (indices[:, 7:] == -1).all()
+    assert (scores[:, 7:] == 0).all()
+    for product, similar in batch.similar_products(k=50):
+        assert similar == find_similar_products(product, catalog)
+
+
+def test_k_zero(make_catalog):
+    """Test k=0 returns no neighbours"""
+    catalog = make_catalog(20, seed=9)
+    batch = BatchSimilarity(catalog)
+
+    indices, scores = batch.top_k_block(np.arange(5), k=0)
+
+    assert indices.shape == (5, 0)
+    assert scores.shape == (5, 0)
+    assert all(similar == [] for _, similar in batch.similar_products(k=0))
+
+
+def test_empty_catalog():
+    """Test an empty catalog yields nothing"""
+    batch = BatchSimilarity([])
+
+    assert len(batch) == 0
+    assert list(batch.iter_top_k()) == []
+    assert list(batch.similar_products()) == []
+
+
+def test_shared_id_is_excluded():
+    """Test products with the target's id never appear as its neighbours"""
+    catalog = [
+        {'id': 1, 'color': 'red'},
+        {'id': 1, 'color': 'Red'},
+        {'id': 2, 'color': 'RED'},
+    ]
+    batch = BatchSimilarity(catalog)
+
+    results = [similar for _, similar in batch.similar_products()]
+
+    assert results == [find_similar_products(p, catalog) for p in catalog]
+    assert results[0] == [catalog[2]]
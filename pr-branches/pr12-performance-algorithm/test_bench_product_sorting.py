@@ -0,0 +1,28 @@
+"""
+Runs the benchmark's agreement check under pytest
+"""
+from bench_product_sorting import check_agreement, generate_catalog
+from product_sorting import find_similar_products, find_similar_products_optimized
+
+
+def test_naive_and_optimised_agree():
+    """Test every optimised path matches its naive counterpart on a small catalog"""
+    assert check_agreement(size=150) == []
+
+
+def test_find_similar_products_optimized_ties():
+    """Test score ties no longer raise and keep catalog order"""
+    catalog = [{'id': i, 'color': 'red', 'tags': ['a', 'A']} for i in range(15)]
+
+    result = find_similar_products_optimized(catalog[0], catalog)
+
+    assert result == find_similar_products(catalog[0], catalog)
+    assert [p['id'] for p in result] == list(range(1, 11))
+
+
+def test_find_similar_products_optimized_matches_naive():
+    """Test all five attributes and per-pair tag counting on a generated catalog"""
+    catalog = generate_catalog(200, seed=3)
+
+    for target in catalog:
+        assert find_similar_products_optimized(target, catalog) == find_similar_products(target, catalog)
@@ -0,0 +1,105 @@
+"""
+Tests for the customer bitmap index
+"""
+import random
+
+import pytest
+
+import customer_bitmap
+from customer_bitmap import PENDING_FOLD_MIN, CustomerBitmapIndex
+from product_sorting import find_common_customers
+
+
+def random_order(rng, customers=60, products=25):
+    """Order from a small customer and product pool, sometimes with repeated items"""
+    items = [{'product_id': rng.randrange(products)} for _ in range(rng.randrange(5))]
+    return {'customer_id': f'c{rng.randrange(customers)}', 'items': items}
+
+
+class BruteForce:
+    """Customer -> products bought, in first-seen customer order"""
+
+    def __init__(self):
+        self.bought = {}
+
+    def add_orders(self, orders):
+        """Record the products of each order"""
+        for order in orders:
+            products = self.bought.setdefault(order['customer_id'], set())
+            products.update(item['product_id'] for item in order['items'])
+
+    def with_at_least(self, product_ids, k):
+        """Customers who bought at least k of the distinct products"""
+        wanted = set(product_ids)
+        return [c for c, bought in self.bought.items() if len(bought & wanted) >= k]
+
+
+@pytest.mark.parametrize('fold_min', [PENDING_FOLD_MIN, 2])
+def test_queries_match_brute_force_between_batches(monkeypatch, fold_min):
+    """Test all/any/at-least-k answers while orders stream in batches, with and without early folds"""
+    monkeypatch.setattr(customer_bitmap, 'PENDING_FOLD_MIN', fold_min)
+    rng = random.Random(16)
+    index = CustomerBitmapIndex()
+    expected = BruteForce()
+    orders = []
+
+    for _ in range(40):
+        batch = [random_order(rng) for _ in range(rng.randrange(1, 15))]
+        orders.extend(batch)
+        index.add_orders(iter(batch))
+        expected.add_orders(batch)
+
+        for _ in range(5):
+            product_ids = rng.sample(range(27), rng.randrange(0, 5))
+            wanted = len(set(product_ids))
+            assert index.customers_with_all(product_ids) == expected.with_at_least(product_ids, wanted)
+            assert index.customers_with_any(product_ids) == expected.with_at_least(product_ids, 1)
+            k = rng.randrange(0, 6)
+            assert index.customers_with_at_least(product_ids, k) == expected.with_at_least(product_ids, k)
+
+    assert len(index) == len(expected.bought)
+    product_ids = [1, 2]
+    assert set(index.customers_with_all(product_ids)) == set(find_common_customers(product_ids, orders))
+
+
+def test_queried_product_keeps_later_purchases():
+    """Test ordinals pending after a product's bitset was built are folded in"""
+    index = CustomerBitmapIndex([{'customer_id': 'a', 'items': [{'product_id': 1}]}])
+    assert index.customers_with_any([1]) == ['a']
+
+    index.add_order({'customer_id': 'b', 'items': [{'product_id': 1}, {'product_id': 2}]})
+
+    assert index.customers_with_any([1]) == ['a', 'b']
+    assert index.customers_with_all([1, 2]) == ['b']
+
+
+def test_unqueried_products_do_not_pile_up():
+    """Test pending ordinals are folded at the threshold and by compact()"""
+    rng = random.Random(17)
+    orders = [random_order(rng, customers=500, products=3) for _ in range(5000)]
+    index = CustomerBitmapIndex(orders)
+    expected = BruteForce()
+    expected.add_orders(orders)
+
+    assert all(len(ordinals) < PENDING_FOLD_MIN for ordinals in index._pending.values())
+    index.compact()
+    assert index._pending == {}
+    for product_id in range(3):
+        assert index.customers_with_any([product_id]) == expected.with_at_least([product_id], 1)
+
+
+def test_edge_cases():
+    """Test empty index, empty queries and out-of-range k"""
+    assert CustomerBitmapIndex().customers_with_all([1]) == []
+
+    index = CustomerBitmapIndex([
+        {'customer_id': 'a', 'items': [{'product_id': 1}]},
+        {'customer_id': 'b', 'items': []},
+    ])
+
+    assert index.customers_with_all([]) == ['a', 'b']
+    assert index.customers_with_any([]) == []
+    assert index.customers_with_any([99]) == []
+    assert index.customers_with_at_least([1], 0) == ['a', 'b']
+    assert index.customers_with_at_least([1], 2) == []
+    assert index.customers_with_at_least([1, 1], 1) == ['a']
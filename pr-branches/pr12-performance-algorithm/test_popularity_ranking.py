@@ -0,0 +1,115 @@
+"""
+Tests for the incrementally maintained popularity ranking
+"""
+import random
+
+import pytest
+
+import popularity_ranking
+from popularity_ranking import PopularityRanking
+from product_sorting import sort_products_by_popularity, sort_products_by_popularity_optimized
+
+
+def make_product(rng, product_id):
+    """Product with a popularity drawn from a small range so ties are common"""
+    return {'id': product_id, 'name': f'Product {product_id}', 'popularity': rng.randrange(25)}
+
+
+def assert_matches(ranking, catalog, rng):
+    """Compare iteration, rank() and a random page() with sorted()"""
+    expected = sort_products_by_popularity_optimized(catalog)
+    assert list(ranking) == expected
+    assert len(ranking) == len(catalog)
+    if catalog:
+        product = rng.choice(catalog)
+        assert ranking.rank(product['id']) == expected.index(product)
+    offset, limit = rng.randrange(len(catalog) + 3), rng.randrange(1, 12)
+    assert ranking.page(offset, limit) == expected[offset:offset + limit]
+
+
+def test_random_operations_match_sorted(monkeypatch):
+    """Test 3000 random add/update/remove operations keep the sorted() order"""
+    monkeypatch.setattr(popularity_ranking, 'BLOCK_SIZE', 4)
+    rng = random.Random(13)
+    catalog = [make_product(rng, i) for i in range(40)]
+    ranking = PopularityRanking(catalog)
+    next_id = len(catalog)
+
+    for _ in range(3000):
+        action = rng.random()
+        if action < 0.35 or not catalog:
+            product = make_product(rng, next_id)
+            next_id += 1
+            catalog.append(product)
+            ranking.add(product)
+        elif action < 0.55:
+            position = rng.randrange(len(catalog))
+            product = {**catalog[position], 'popularity': rng.randrange(25)}
+            catalog[position] = product
+            ranking.update(product)
+        elif action < 0.75:
+            position = rng.randrange(len(catalog))
+            popularity = rng.randrange(25)
+            ranking.update_popularity(catalog[position]['id'], popularity)
+            catalog[position] = {**catalog[position], 'popularity': popularity}
+        else:
+            product = catalog.pop(rng.randrange(len(catalog)))
+            ranking.remove(product['id'])
+        assert_matches(ranking, catalog, rng)
+
+    assert len(ranking._blocks) > 1
+
+
+def test_matches_bubble_sort(monkeypatch):
+    """Test the initial order equals the reference bubble sort, ties included"""
+    monkeypatch.setattr(popularity_ranking, 'BLOCK_SIZE', 3)
+    rng = random.Random(14)
+    catalog = [make_product(rng, i) for i in range(60)]
+
+    assert list(PopularityRanking(catalog)) == sort_products_by_popularity(catalog)
+
+
+def test_emptied_ranking_can_be_refilled(monkeypatch):
+    """Test removing every product and adding again"""
+    monkeypatch.setattr(popularity_ranking, 'BLOCK_SIZE', 2)
+    rng = random.Random(15)
+    catalog = [make_product(rng, i) for i in range(10)]
+    ranking = PopularityRanking(catalog)
+
+    for product in catalog:
+        ranking.remove(product['id'])
+    assert list(ranking) == []
+    assert ranking.top(5) == []
+
+    ranking.add(catalog[0])
+    assert ranking.top(5) == [catalog[0]]
+
+
+def test_update_popularity_copies_product():
+    """Test update_popularity leaves the caller's dictionary unchanged"""
+    product = {'id': 1, 'popularity': 5}
+    ranking = PopularityRanking([product])
+
+    ranking.update_popularity(1, 9)
+
+    assert product['popularity'] == 5
+    assert ranking.top(1)[0]['popularity'] == 9
+
+
+def test_invalid_operations():
+    """Test duplicate ids, unknown ids and empty pages"""
+    ranking = PopularityRanking([{'id': 1, 'popularity': 5}])
+
+    with pytest.raises(ValueError):
+        ranking.add({'id': 1, 'popularity': 2})
+    with pytest.raises(ValueError):
+        PopularityRanking([{'id': 2, 'popularity': 1}, {'id': 2, 'popularity': 3}])
+    with pytest.raises(KeyError):
+        ranking.update({'id': 2, 'popularity': 1})
+    with pytest.raises(KeyError):
+        ranking.remove(2)
+    with pytest.raises(KeyError):
+        ranking.rank(2)
+    assert ranking.page(-1, 5) == []
+    assert ranking.page(0, 0) == []
+    assert ranking.page(1, 5) == []
@@ -0,0 +1,118 @@
+"""
+Tests for the compact Product record
+"""
+import json
+
+import pytest
+
+from product_model import (
+    Product, find_similar, load_products, remove_duplicates, similarity_score, sort_by_popularity,
+)
+from product_sorting import (
+    find_similar_products, remove_duplicates_optimized, sort_products_by_popularity_optimized,
+)
+
+
+def unique_tag_catalog(make_catalog, count, seed):
+    """Random catalog whose tags are distinct after lower-casing"""
+    catalog = make_catalog(count, seed)
+    for product in catalog:
+        product['tags'] = list({tag.lower(): tag for tag in product['tags']}.values())
+    return catalog
+
+
+def ids(products):
+    """Ids of dict or Product products, in order"""
+    return [product['id'] for product in products]
+
+
+def test_from_dict_to_dict_round_trip():
+    """Test conversion normalises attributes and tags and keeps extra keys"""
+    data = {
+        'id': 7, 'name': 'Trail Shoe', 'brand': 'Acme', 'popularity': 3,
+        'category': 'Shoes', 'color': 'RED', 'tags': ['Sale', 'sale', 'New'],
+        'sku': 'TS-1', 'stock': 0,
+    }
+
+    product = Product.from_dict(data)
+
+    assert product.to_dict() == {
+        'id': 7, 'name': 'Trail Shoe', 'brand': 'Acme', 'popularity': 3,
+        'category': 'shoes', 'color': 'red', 'tags': ['new', 'sale'],
+        'sku': 'TS-1', 'stock': 0,
+    }
+    again = Product.from_dict(product.to_dict())
+    assert again.to_dict() == product.to_dict()
+    assert again.brand_key == 'acme'
+
+
+def test_dict_protocol():
+    """Test __getitem__, in and get for present, None and extra fields"""
+    product = Product.from_dict({'id': 1, 'name': 'Hat', 'brand': 'Acme', 'size': None, 'sku': 'H-1'})
+
+    assert product['name'] == 'Hat'
+    assert product['sku'] == 'H-1'
+    assert product['tags'] == frozenset()
+    assert 'tags' in product
+    assert 'sku' in product
+    assert 'size' not in product
+    assert 'color' not in product
+    assert 'brand_key' not in product
+    assert product.get('size') is None
+    assert product.get('color', 'none') == 'none'
+    assert product.get('sku') == 'H-1'
+    with pytest.raises(KeyError):
+        product['size']
+    with pytest.raises(KeyError):
+        product['missing']
+
+
+def test_equal_values_are_interned():
+    """Test normalised values share one string object"""
+    first = Product(1, color='Red', tags=['Sale'])
+    second = Product(2, color=''.join(['r', 'E', 'd']), tags=['SALE'])
+
+    assert first.color is second.color
+    assert next(iter(first.tags)) is next(iter(second.tags))
+
+
+def test_find_similar_matches_dict_function(make_catalog):
+    """Test find_similar picks the same products as find_similar_products"""
+    catalog = unique_tag_catalog(make_catalog, 300, seed=18)
+    products = load_products(catalog)
+
+    for target, product in zip(catalog, products):
+        expected = ids(find_similar_products(target, catalog))
+        assert ids(find_similar(product, products)) == expected
+        assert ids(find_similar_products(product, products)) == expected
+
+
+def test_duplicate_tags_count_once():
+    """Test a tag listed twice scores once"""
+    target = Product(1, tags=['sale'])
+    other = Product(2, tags=['Sale', 'SALE'])
+
+    assert similarity_score(target, other) == 0.5
+    assert find_similar(target, [target, other]) == [other]
+
+
+def test_sort_and_remove_duplicates_match_dict_functions(make_catalog):
+    """Test sort_by_popularity and remove_duplicates agree with the dict versions"""
+    catalog = make_catalog(300, seed=19)
+    products = load_products(catalog)
+
+    assert ids(sort_by_popularity(products)) == ids(sort_products_by_popularity_optimized(catalog))
+    assert ids(remove_duplicates(products)) == ids(remove_duplicates_optimized(catalog))
+    assert ids(remove_duplicates_optimized(products)) == ids(remove_duplicates_optimized(catalog))
+
+
+def test_load_products_from_ndjson(make_catalog, tmp_path):
+    """Test loading from a path and passing Product objects through"""
+    catalog = make_catalog(20, seed=20)
+    path = tmp_path / 'products.ndjson'
+    path.write_text(''.join(json.dumps(p) + '\n' for p in catalog), encoding='utf-8')
+
+    products = load_products(str(path))
+
+    assert ids(products) == ids(catalog)
+    assert load_products(products) == products
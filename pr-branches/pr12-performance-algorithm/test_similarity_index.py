@@ -0,0 +1,113 @@
+"""
+Tests for the inverted similarity index
+"""
+import random
+
+import pytest
+from conftest import random_product
+from product_model import Product, similarity_score
+from product_sorting import find_similar_products
+from similarity_index import ProductSimilarityIndex, features_score, product_features
+
+
+def reference_scores(target, catalog):
+    """Scores find_similar_products assigns, by brute force over features_score"""
+    target_features = product_features(target)
+    scores = {}
+    for product in catalog:
+        if product['id'] != target['id']:
+            score = features_score(target_features, product_features(product))
+            if score > 0:
+                scores[product['id']] = score
+    return scores
+
+
+def test_query_matches_find_similar_products(make_catalog):
+    """Test every product's top 10 equals the naive implementation, ties included"""
+    catalog = make_catalog(300)
+    index = ProductSimilarityIndex(catalog)
+
+    for target in catalog:
+        assert index.query(target) == find_similar_products(target, catalog)
+
+
+def test_scores_match_brute_force(make_catalog):
+    """Test the posting-list scores equal pairwise scoring"""
+    catalog = make_catalog(200, seed=1)
+    index = ProductSimilarityIndex(catalog)
+
+    for target in catalog[:50]:
+        assert index.scores(target) == reference_scores(target, catalog)
+
+
+def test_incremental_changes_match_rebuilt_catalog(make_catalog):
+    """Test add/update/remove keep results identical to find_similar_products"""
+    rng = random.Random(2)
+    catalog = make_catalog(150, seed=2)
+    index = ProductSimilarityIndex(catalog)
+    next_id = len(catalog)
+
+    for step in range(300):
+        action = rng.random()
+        if action < 0.4:
+            product = random_product(rng, next_id)
+            next_id += 1
+            catalog.append(product)
+            index.add(product)
+        elif action < 0.7 and catalog:
+            position = rng.randrange(len(catalog))
+            product = random_product(rng, catalog[position]['id'])
+            catalog[position] = product
+            index.update(product)
+        elif catalog:
+            product = catalog.pop(rng.randrange(len(catalog)))
+            index.remove(product['id'])
+
+        if step % 10 == 0:
+            for target in rng.sample(catalog, 5):
+                assert index.query(target) == find_similar_products(target, catalog)
+    assert len(index) == len(catalog)
+
+
+def test_target_outside_index(make_catalog):
+    """Test a product that is not indexed can be used as a query"""
+    catalog = make_catalog(100, seed=3)
+    index = ProductSimilarityIndex(catalog[:-1])
+
+    assert index.query(catalog[-1]) == find_similar_products(catalog[-1], catalog[:-1])
+
+
+def test_query_scores_and_k(make_catalog):
+    """Test k limits results and query_scores reports the same order"""
+    catalog = make_catalog(100, seed=4)
+    index = ProductSimilarityIndex(catalog)
+    target = catalog[0]
+
+    pairs = index.query_scores(target, k=3)
+
+    assert [pid for pid, _ in pairs] == [p['id'] for p in index.query(target, k=3)]
+    assert len(pairs) == 3
+    assert index.query(target, k=0) == []
+
+
+def test_duplicate_add_and_unknown_update():
+    """Test add rejects a known id and update/remove reject an unknown one"""
+    index = ProductSimilarityIndex([{'id': 1, 'color': 'red'}])
+
+    with pytest.raises(ValueError):
+        index.add({'id': 1, 'color': 'blue'})
+    with pytest.raises(KeyError):
+        index.update({'id': 2, 'color': 'blue'})
+    with pytest.raises(KeyError):
+        index.remove(2)
+
+
+def test_product_inputs_count_repeated_tags_once():
+    """Test Product tags score as a set while dict tags score every pair"""
+    target = {'id': 1, 'tags': ['sale']}
+    other = {'id': 2, 'tags': ['Sale', 'SALE']}
+    products = [Product.from_dict(target), Product.from_dict(other)]
+
+    assert ProductSimilarityIndex([target, other]).scores(target) == {2: 1.0}
+    assert ProductSimilarityIndex(products).scores(products[0]) == {2: 0.5}
+    assert similarity_score(*products) == 0.5
@@ -0,0 +1,134 @@
+"""
+Tests for the MinHash LSH similar-product index
+"""
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from conftest import random_product
+from similarity_index import features_score, product_features
+from similarity_lsh import MinHashLSHIndex
+
+SIGNATURE_SCRIPT = """
+from similarity_index import product_features
+from similarity_lsh import MinHashLSHIndex
+product = {'id': 1, 'brand': 'Acme', 'color': 'Red', 'tags': ['sale', 'new']}
+print(MinHashLSHIndex(bands=4, rows=2).signature(product_features(product)))
+"""
+
+
+def exact_top_k(target, candidates, catalog, k=10):
+    """Candidates ranked by exact score, ties in catalog order"""
+    target_features = product_features(target)
+    ranked = []
+    for position, product in enumerate(catalog):
+        if product['id'] in candidates:
+            score = features_score(target_features, product_features(product))
+            if score > 0:
+                ranked.append((-score, position, product))
+    ranked.sort(key=lambda item: item[:2])
+    return [product for _, _, product in ranked[:k]]
+
+
+def test_query_reranks_candidates_exactly(make_catalog):
+    """Test results are the exact top k of the colliding products in catalog tie order"""
+    catalog = make_catalog(300, seed=10)
+    lsh = MinHashLSHIndex(catalog, bands=8, rows=2)
+
+    for target in catalog:
+        candidates = lsh.candidates(target)
+        result = lsh.query(target)
+
+        assert target['id'] not in candidates
+        assert {p['id'] for p in result} <= candidates
+        assert result == exact_top_k(target, candidates, catalog)
+
+
+def test_query_for_product_outside_index(make_catalog):
+    """Test an unindexed target is hashed on the fly"""
+    catalog = make_catalog(100, seed=11)
+    lsh = MinHashLSHIndex(catalog[:-1])
+    target = catalog[-1]
+
+    assert lsh.query(target) == exact_top_k(target, lsh.candidates(target), catalog[:-1])
+
+
+def test_signature_is_stable_across_processes():
+    """Test signatures do not depend on PYTHONHASHSEED"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    outputs = set()
+    for hash_seed in ('0', '1', '12345'):
+        result = subprocess.run(
+            [sys.executable, '-c', SIGNATURE_SCRIPT],
+            cwd=here, env={'PYTHONHASHSEED': hash_seed, 'PYTHONPATH': here},
+            capture_output=True, text=True, check=True,
+        )
+        outputs.add(result.stdout)
+
+    assert len(outputs) == 1
+
+
+def test_same_seed_same_signature():
+    """Test two indexes with one seed agree and a different seed does not"""
+    features = product_features({'id': 1, 'brand': 'Acme', 'tags': ['sale']})
+
+    first = MinHashLSHIndex(seed=3).signature(features)
+
+    assert MinHashLSHIndex(seed=3).signature(features) == first
+    assert MinHashLSHIndex(seed=4).signature(features) != first
+
+
+def test_case_only_differences_share_signature():
+    """Test attribute and tag case are folded before hashing"""
+    lsh = MinHashLSHIndex()
+    lower = {'id': 1, 'brand': 'acme', 'tags': ['sale']}
+    upper = {'id': 2, 'brand': 'ACME', 'tags': ['Sale', 'SALE']}
+
+    assert lsh.signature(product_features(lower)) == lsh.signature(product_features(upper))
+
+
+def test_incremental_changes_match_rebuilt_index(make_catalog):
+    """Test add/update/remove leave the same buckets and results as a fresh build"""
+    rng = random.Random(12)
+    catalog = make_catalog(120, seed=12)
+    lsh = MinHashLSHIndex(catalog, bands=8, rows=2)
+    next_id = len(catalog)
+
+    for _ in range(300):
+        action = rng.random()
+        if action < 0.4:
+            product = random_product(rng, next_id)
+            next_id += 1
+            catalog.append(product)
+            lsh.add(product)
+        elif action < 0.7:
+            position = rng.randrange(len(catalog))
+            product = random_product(rng, catalog[position]['id'])
+            catalog[position] = product
+            lsh.update(product)
+        else:
+            product = catalog.pop(rng.randrange(len(catalog)))
+            lsh.remove(product['id'])
+
+    rebuilt = MinHashLSHIndex(catalog, bands=8, rows=2)
+    assert lsh._buckets == rebuilt._buckets
+    assert all(bucket for buckets in lsh._buckets for bucket in buckets.values())
+    for target in catalog:
+        assert lsh.query(target) == rebuilt.query(target)
+
+
+def test_duplicate_add_and_unknown_ids():
+    """Test add rejects a known id and update/remove reject an unknown one"""
+    lsh = MinHashLSHIndex([{'id': 1, 'color': 'red'}])
+
+    with pytest.raises(ValueError):
+        lsh.add({'id': 1, 'color': 'blue'})
+    with pytest.raises(KeyError):
+        lsh.update({'id': 2})
+    with pytest.raises(KeyError):
+        lsh.remove(2)
+    with pytest.raises(ValueError):
+        MinHashLSHIndex(bands=0)
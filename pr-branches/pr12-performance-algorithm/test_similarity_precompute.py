@@ -0,0 +1,140 @@
+"""
+Tests for precomputed similar products
+"""
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+import similarity_precompute
+from product_sorting import find_similar_products
+from similarity_index import ProductSimilarityIndex, features_score, product_features
+from similarity_precompute import HEADER, MAGIC, SimilarityLookup, precompute_similar, record_size
+
+
+def failing_shard(shard):
+    """_compute_shard stand-in for a worker that crashes"""
+    raise RuntimeError("worker failed")
+
+
+@pytest.mark.parametrize('shard_size', [1, 7, 64, 1000])
+def test_records_match_find_similar_products(make_catalog, tmp_path, shard_size):
+    """Test every record of a 2-worker run equals find_similar_products"""
+    catalog = make_catalog(150, seed=21)
+    path = str(tmp_path / 'similar.bin')
+
+    assert precompute_similar(catalog, path, workers=2, shard_size=shard_size) == len(catalog)
+
+    with SimilarityLookup(path) as lookup:
+        assert len(lookup) == len(catalog)
+        assert lookup.k == 10
+        for ordinal, target in enumerate(catalog):
+            neighbours = lookup.neighbours(ordinal)
+            assert [catalog[o] for o, _ in neighbours] == find_similar_products(target, catalog)
+            target_features = product_features(target)
+            for o, score in neighbours:
+                assert score == features_score(target_features, product_features(catalog[o]))
+    assert not (tmp_path / 'similar.bin.tmp').exists()
+
+
+def test_views_pad_unused_slots(tmp_path):
+    """Test products with fewer than k neighbours are padded with EMPTY / 0.0"""
+    catalog = [{'id': 1, 'color': 'red'}, {'id': 2, 'color': 'Red'}, {'id': 3, 'color': 'blue'}]
+    path = str(tmp_path / 'similar.bin')
+    precompute_similar(catalog, path, k=4, workers=1)
+
+    with SimilarityLookup(path) as lookup:
+        ordinals, scores = lookup.neighbours_view(0)
+        assert list(ordinals) == [1, 0xFFFFFFFF, 0xFFFFFFFF, 0xFFFFFFFF]
+        assert list(scores) == [1.0, 0.0, 0.0, 0.0]
+        ordinals.release()
+        scores.release()
+        assert lookup.neighbours(2) == []
+
+
+def test_out_of_range_ordinal(make_catalog, tmp_path):
+    """Test ordinals outside the catalog raise IndexError"""
+    path = str(tmp_path / 'similar.bin')
+    precompute_similar(make_catalog(5), path, workers=1)
+
+    with SimilarityLookup(path) as lookup:
+        with pytest.raises(IndexError):
+            lookup.neighbours(5)
+        with pytest.raises(IndexError):
+            lookup.neighbours(-1)
+        with pytest.raises(IndexError):
+            lookup.neighbours_view(5)
+
+
+def test_rejects_foreign_magic(tmp_path):
+    """Test a file without the SIMTOPK1 header is refused"""
+    path = tmp_path / 'other.bin'
+    path.write_bytes(HEADER.pack(b'NOTMINE!', sys.byteorder[0].encode(), 10, 0))
+
+    with pytest.raises(ValueError, match='not a similarity file'):
+        SimilarityLookup(str(path))
+
+
+def test_rejects_other_byte_order(tmp_path):
+    """Test a file written with the other byte order is refused"""
+    other = b'b' if sys.byteorder == 'little' else b'l'
+    path = tmp_path / 'swapped.bin'
+    path.write_bytes(HEADER.pack(MAGIC, other, 2, 1) + bytes(record_size(2)))
+
+    with pytest.raises(ValueError, match='byte order'):
+        SimilarityLookup(str(path))
+
+
+def test_duplicate_ids_and_empty_catalog(tmp_path):
+    """Test duplicate ids are refused and an empty catalog writes an empty file"""
+    path = str(tmp_path / 'similar.bin')
+
+    with pytest.raises(ValueError):
+        precompute_similar([{'id': 1}, {'id': 1}], path, workers=1)
+
+    assert precompute_similar([], path, workers=1) == 0
+    with SimilarityLookup(path) as lookup:
+        assert len(lookup) == 0
+
+
+@pytest.mark.parametrize('extra', [-1, 1])
+def test_rejects_wrong_file_size(make_catalog, tmp_path, extra):
+    """Test a truncated or padded file is refused instead of read out of bounds"""
+    path = tmp_path / 'similar.bin'
+    precompute_similar(make_catalog(5), str(path), workers=1)
+    data = path.read_bytes()
+    path.write_bytes(data[:extra] if extra < 0 else data + bytes(extra))
+
+    with pytest.raises(ValueError, match='expected'):
+        SimilarityLookup(str(path))
+    path.write_bytes(data[:HEADER.size - 1])
+    with pytest.raises(ValueError, match='not a similarity file'):
+        SimilarityLookup(str(path))
+
+
+def test_worker_failure_removes_temp_file(make_catalog, tmp_path, monkeypatch):
+    """Test a crashing worker leaves neither the temp file nor an output file"""
+    monkeypatch.setattr(similarity_precompute, '_compute_shard', failing_shard)
+
+    with pytest.raises(RuntimeError, match='worker failed'):
+        precompute_similar(make_catalog(20), str(tmp_path / 'similar.bin'), workers=2, shard_size=5)
+    assert os.listdir(tmp_path) == []
+    assert similarity_precompute._index is None
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='needs a forking pool')
+def test_forked_workers_share_one_index(make_catalog, tmp_path, monkeypatch):
+    """Test the index is built once, in the parent, when the pool forks"""
+    builds = tmp_path / 'builds'
+
+    class CountingIndex(ProductSimilarityIndex):
+        def __init__(self, products=()):
+            with open(builds, 'a') as f:
+                f.write(f'{os.getpid()}\n')
+            super().__init__(products)
+
+    monkeypatch.setattr(similarity_precompute, 'ProductSimilarityIndex', CountingIndex)
+    precompute_similar(make_catalog(40), str(tmp_path / 'similar.bin'), workers=3, shard_size=5)
+
+    assert builds.read_text().split() == [str(os.getpid())]
@@ -0,0 +1,143 @@
+"""
+Tests for streaming deduplication with spill files
+"""
+import io
+import json
+import os
+import logging
+import random
+import sys
+
+import pytest
+
+import streaming_dedup
+from product_sorting import remove_duplicates
+from streaming_dedup import MAX_DEPTH, SET_ENTRY_OVERHEAD, StreamingDeduplicator, _key_cost, stream_unique
+
+
+@pytest.fixture
+def feed():
+    """1500 records over 300 (name, brand) keys, numbered by input position"""
+    rng = random.Random(17)
+    return [
+        {'seq': i, 'name': f'Product {rng.randrange(150)}', 'brand': rng.choice(['Acme', 'Globex'])}
+        for i in range(1500)
+    ]
+
+
+def write_ndjson(path, records):
+    """Write records one per line, with a blank line in the middle"""
+    lines = [json.dumps(record) for record in records]
+    lines.insert(len(lines) // 2, '')
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+@pytest.mark.parametrize('budget', [10 ** 12, 20000, 2000, 200, 0])
+def test_budget_sweep_keeps_first_occurrences(feed, budget, tmp_path, monkeypatch):
+    """Test every budget keeps exactly the records remove_duplicates keeps"""
+    depths = []
+    open_partitions = StreamingDeduplicator._open_partitions
+
+    def record_depth(self, workdir, depth):
+        depths.append(depth)
+        return open_partitions(self, workdir, depth)
+
+    monkeypatch.setattr(StreamingDeduplicator, '_open_partitions', record_depth)
+    deduplicator = StreamingDeduplicator(memory_budget=budget, partitions=2, spill_dir=str(tmp_path))
+
+    result = list(deduplicator.dedupe(feed))
+    expected = remove_duplicates(feed)
+
+    assert sorted(result, key=lambda r: r['seq']) == expected
+    assert deduplicator.records_in == len(feed)
+    assert deduplicator.duplicates == len(feed) - len(expected)
+    assert os.listdir(tmp_path) == []
+    if budget == 10 ** 12:
+        assert result == expected
+        assert depths == []
+    if budget == 0:
+        assert set(depths) == set(range(MAX_DEPTH))
+
+
+def test_spilled_records_keep_input_order_within_partition(feed, monkeypatch):
+    """Test a single partition stream preserves input order after spilling"""
+    monkeypatch.setattr(streaming_dedup, 'MAX_DEPTH', 1)
+    deduplicator = StreamingDeduplicator(memory_budget=0, partitions=2)
+    monkeypatch.setattr(deduplicator, '_partition', lambda key, depth: 0)
+
+    assert list(deduplicator.dedupe(feed)) == remove_duplicates(feed)
+
+
+def test_path_input(feed, tmp_path):
+    """Test reading NDJSON from a path"""
+    path = tmp_path / 'feed.ndjson'
+    write_ndjson(path, feed)
+
+    assert list(stream_unique(str(path))) == remove_duplicates(feed)
+    spilled = stream_unique(path, memory_budget=0, partitions=4)
+    assert sorted(spilled, key=lambda r: r['seq']) == remove_duplicates(feed)
+
+
+@pytest.mark.parametrize('mode', ['r', 'rb'])
+def test_file_object_input(feed, tmp_path, mode):
+    """Test reading NDJSON from text and binary file objects"""
+    path = tmp_path / 'feed.ndjson'
+    write_ndjson(path, feed)
+
+    with open(path, mode) as f:
+        result = list(stream_unique(f, memory_budget=3000, partitions=3))
+
+    assert sorted(result, key=lambda r: r['seq']) == remove_duplicates(feed)
+
+
+def test_in_memory_file_object(feed):
+    """Test a StringIO source"""
+    source = io.StringIO(''.join(json.dumps(record) + '\n' for record in feed))
+
+    assert list(stream_unique(source)) == remove_duplicates(feed)
+
+
+def test_early_close_removes_spill_files(feed, tmp_path):
+    """Test closing the generator mid-stream deletes its spill directory"""
+    deduplicator = StreamingDeduplicator(memory_budget=0, partitions=2, spill_dir=str(tmp_path))
+    records = deduplicator.dedupe(feed)
+
+    next(records)
+    assert deduplicator.spilled > 0
+    assert os.listdir(tmp_path) != []
+
+    records.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_custom_key_and_partition_check(feed):
+    """Test a custom key function and the minimum partition count"""
+    result = list(stream_unique(feed, key=lambda r: r['brand'], memory_budget=0, partitions=2))
+
+    assert sorted(r['brand'] for r in result) == ['Acme', 'Globex']
+    with pytest.raises(ValueError):
+        StreamingDeduplicator(partitions=1)
+
+
+def test_scalar_key_is_one_component():
+    """Test a str key is costed and partitioned whole, not character by character"""
+    deduplicator = StreamingDeduplicator(partitions=64)
+
+    assert _key_cost('Acme') == sys.getsizeof('Acme') + SET_ENTRY_OVERHEAD
+    assert _key_cost(('Acme',)) == sys.getsizeof(('Acme',)) + sys.getsizeof('Acme') + SET_ENTRY_OVERHEAD
+    assert deduplicator._partition('ab', 0) != deduplicator._partition(('a', 'b'), 0)
+
+
+def test_max_depth_overrun_is_logged_and_counted(feed, caplog):
+    """Test keys kept past the budget at MAX_DEPTH are counted with one warning"""
+    within = StreamingDeduplicator(memory_budget=10 ** 12)
+    list(within.dedupe(feed))
+    assert within.over_budget == 0
+
+    deduplicator = StreamingDeduplicator(memory_budget=0, partitions=2)
+    with caplog.at_level(logging.WARNING, logger='streaming_dedup'):
+        result = list(deduplicator.dedupe(feed))
+
+    assert deduplicator.over_budget == len(result) == len(remove_duplicates(feed))
+    assert len(caplog.records) == 1
+    assert 'over the 0 byte budget' in caplog.text
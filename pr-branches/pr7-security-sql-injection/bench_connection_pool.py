@@ -0,0 +1,113 @@
+"""
+Connection pool benchmark
+User lookups from several threads: connect per request vs ConnectionPool
+
+Runs against a temporary SQLite file. SQLite connects in microseconds,
+so --connect-delay-ms adds a sleep to every new connection to model the
+TCP/TLS/auth handshake of a networked server.
+
+Usage:
+    python bench_connection_pool.py [--users 10000] [--threads 8] [--lookups 500] [--connect-delay-ms 0]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from connection_pool import ConnectionPool, translate_placeholders
+from user_search import get_user_by_id_pooled
+
+LOOKUP_SQL = "SELECT * FROM users WHERE id = %s"
+
+
+def create_database(path, count):
+    """users table with count rows"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                     ((i, f"User {i}", f"user{i}@example.com") for i in range(1, count + 1)))
+    conn.commit()
+    conn.close()
+
+
+def make_connect(path, delay):
+    """Connection factory that sleeps delay seconds per connection"""
+    def connect():
+        if delay:
+            time.sleep(delay)
+        return sqlite3.connect(path, check_same_thread=False)
+    return connect
+
+
+def run_threads(threads, lookups, users, worker):
+    """Run worker(ids) on each thread; return elapsed seconds and all rows"""
+    rng = random.Random(0)
+    batches = [[rng.randint(1, users) for _ in range(lookups)] for _ in range(threads)]
+    results = [None] * threads
+
+    def target(i):
+        results[i] = worker(batches[i])
+
+    pool = [threading.Thread(target=target, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def main():
+    """Run both strategies on the same lookups and check they agree"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--lookups', type=int, default=500, help='lookups per thread')
+    parser.add_argument('--pool-size', type=int, default=None, help='max_size (default: --threads)')
+    parser.add_argument('--connect-delay-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'users.db')
+    create_database(path, args.users)
+    connect = make_connect(path, args.connect_delay_ms / 1000)
+    sql = translate_placeholders(LOOKUP_SQL, sqlite3.paramstyle)
+
+    def per_request(ids):
+        rows = []
+        for user_id in ids:
+            conn = connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(sql, (user_id,))
+                rows.append(cursor.fetchone())
+            finally:
+                conn.close()
+        return rows
+
+    pool = ConnectionPool(connect, min_size=0, max_size=args.pool_size or args.threads,
+                          paramstyle=sqlite3.paramstyle)
+
+    def pooled(ids):
+        return [get_user_by_id_pooled(pool, user_id) for user_id in ids]
+
+    timings = {}
+    outputs = {}
+    for name, worker in (('connect', per_request), ('pool', pooled)):
+        timings[name], outputs[name] = run_threads(args.threads, args.lookups, args.users, worker)
+
+    assert outputs['connect'] == outputs['pool'], "results disagree"
+    total = args.threads * args.lookups
+    print(f"{args.users} users, {args.threads} threads x {args.lookups} lookups, "
+          f"connect delay {args.connect_delay_ms} ms")
+    for name, elapsed in timings.items():
+        print(f"{name:>8}: {elapsed:8.2f}s  ({elapsed / total * 1e6:8.1f} us/lookup)")
+    print(f"    pool: {pool.stats()}")
+    pool.close()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Trigram index benchmark
+Memory per user and p50/p99 search latency of TrigramUserIndex
+
+Builds an index over synthetic users (first/last names drawn from a
+skewed distribution, emails carrying the user id), then times a mix of
+search terms, each as a full result and as a first page of --page rows,
+and single add/update/remove calls. Memory is the growth of peak RSS
+while the index is built, divided by the user count; it includes the
+name and email strings the index keeps for verification.
+
+Usage:
+    python bench_trigram_index.py [--users 1000000] [--queries 300] [--page 20] [--seed 0]
+"""
+import argparse
+import random
+import resource
+import statistics
+import string
+import time
+
+from trigram_index import TrigramUserIndex
+
+DOMAINS = ['example.com', 'mail.org', 'corp.net', 'xyz.io']
+
+
+def make_names(rng, count, length):
+    """count capitalised pseudo-names of about length letters"""
+    vowels, consonants = 'aeiou', ''.join(c for c in string.ascii_lowercase if c not in 'aeiou')
+    names = set()
+    while len(names) < count:
+        letters = [rng.choice(consonants if i % 2 == 0 else vowels)
+                   for i in range(rng.randrange(length - 2, length + 3))]
+        names.add(''.join(letters).title())
+    return sorted(names)
+
+
+def users(rng, count, first_names, last_names):
+    """(id, name, email) for ids 1..count; names follow a Zipf-like skew"""
+    first_weights = [1 / (rank + 1) for rank in range(len(first_names))]
+    last_weights = [1 / (rank + 1) for rank in range(len(last_names))]
+    firsts = rng.choices(first_names, first_weights, k=count)
+    lasts = rng.choices(last_names, last_weights, k=count)
+    for user_id, (first, last) in enumerate(zip(firsts, lasts), start=1):
+        yield user_id, f'{first} {last}', f'{first.lower()}.{last.lower()}{user_id}@{rng.choice(DOMAINS)}'
+
+
+def query_terms(rng, count, first_names, last_names):
+    """(label, name, email) search terms by kind"""
+    names = first_names[:50] + last_names[:200]
+    terms = []
+    for _ in range(count):
+        name = rng.choice(names).lower()
+        start = rng.randrange(max(1, len(name) - 3))
+        terms.append(('1 char', name[start], ''))
+        terms.append(('2 chars', name[start:start + 2], ''))
+        terms.append(('3 chars', name[start:start + 3], ''))
+        terms.append(('full name', rng.choice(names), ''))
+        terms.append(('wildcard', f'{name[start:start + 2]}%{name[-2:]}', ''))
+        terms.append(('name+email', name[start:start + 3], rng.choice(DOMAINS)[-4:]))
+        terms.append(('email id', '', f'{rng.randrange(1, 10 ** 6)}@'))
+    return terms
+
+
+def percentiles(samples):
+    """(p50, p99) of samples in milliseconds"""
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return cuts[49] * 1000, cuts[98] * 1000
+
+
+def timed(call, *args, **kwargs):
+    """Seconds one call takes, and its result"""
+    start = time.perf_counter()
+    result = call(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    """Build the index, then time searches and writes"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=300, help='terms per kind')
+    parser.add_argument('--page', type=int, default=20, help='limit for the paged timings')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    first_names = make_names(rng, 2000, 6)
+    last_names = make_names(rng, 20000, 7)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = TrigramUserIndex()
+    start = time.perf_counter()
+    for user_id, name, email in users(rng, args.users, first_names, last_names):
+        index.add(user_id, name, email)
+    build = time.perf_counter() - start
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) * 1024
+    posting_bytes = sum(posting.buffer_info()[1] * posting.itemsize
+                        for field_postings in index._postings.values()
+                        for posting in field_postings.values())
+    grams = sum(len(field_postings) for field_postings in index._postings.values())
+
+    print(f"{args.users} users indexed in {build:.1f}s, {grams} distinct grams")
+    print(f"peak RSS growth {rss_growth / 2 ** 20:.0f} MiB ({rss_growth / args.users:.0f} B/user), "
+          f"posting arrays {posting_bytes / 2 ** 20:.0f} MiB ({posting_bytes / args.users:.0f} B/user)")
+
+    by_kind = {}
+    for label, name, email in query_terms(rng, args.queries, first_names, last_names):
+        by_kind.setdefault(label, []).append((name, email))
+    print(f"\n{'query':>11} {'rows p50':>9} {'full p50':>9} {'full p99':>9} "
+          f"{'page p50':>9} {'page p99':>9}  (ms, page = first {args.page} rows)")
+    for label, terms in by_kind.items():
+        full, paged, counts = [], [], []
+        for name, email in terms:
+            elapsed, rows = timed(index.search, name, email)
+            full.append(elapsed)
+            counts.append(len(rows))
+            elapsed, page = timed(index.search, name, email, limit=args.page)
+            paged.append(elapsed)
+            assert page == rows[:args.page], (name, email)
+        print(f"{label:>11} {statistics.median(counts):>9.0f} "
+              f"{'{:9.2f} {:9.2f}'.format(*percentiles(full))} "
+              f"{'{:9.3f} {:9.3f}'.format(*percentiles(paged))}")
+
+    writes = {'add': [], 'update': [], 'remove': []}
+    next_id = args.users + 1
+    for user_id, name, email in users(rng, args.queries, first_names, last_names):
+        writes['add'].append(timed(index.add, next_id, name, email)[0])
+        next_id += 1
+        writes['update'].append(timed(index.update, rng.randrange(1, args.users + 1), name, email)[0])
+        writes['remove'].append(timed(index.remove, next_id - 1)[0])
+    print()
+    for label, samples in writes.items():
+        print(f"{label:>11}: p50 {percentiles(samples)[0]:7.3f} ms  p99 {percentiles(samples)[1]:7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Shared pytest fixtures for the user search tests
+"""
+import random
+import sqlite3
+
+import pytest
+
+from connection_pool import translate_placeholders
+
+NAMES = ['John Smith', 'Johanna Lee', 'joe_bloggs', 'Ann O%Neil', 'Zoë Ærø', 'MARY jones', 'Al', 'x']
+DOMAINS = ['example.com', 'Mail.ORG', 'test.io']
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class QmarkConnection:
+    """sqlite3 connection that accepts the %s placeholders user_search.py writes"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self):
+        return QmarkCursor(self.raw.cursor())
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+
+class QmarkCursor:
+    """Cursor wrapper translating %s to ? before executing"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def execute(self, sql, params=()):
+        self.raw.execute(translate_placeholders(sql, 'qmark'), params)
+        return self
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+    def __iter__(self):
+        return iter(self.raw)
+
+
+def random_user(rng):
+    """(name, email) with mixed case, LIKE wildcards, non-ASCII text and NULLs"""
+    name = None if rng.random() < 0.05 else rng.choice(NAMES) + str(rng.randrange(50))
+    email = None if rng.random() < 0.05 else f"user{rng.randrange(1000)}@{rng.choice(DOMAINS)}"
+    return name, email
+
+
+def create_users_table(raw, users=()):
+    """Create the users table and insert (name, email) pairs in id order"""
+    raw.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)")
+    raw.executemany("INSERT INTO users (name, email) VALUES (?, ?)", users)
+    raw.commit()
+
+
+@pytest.fixture
+def users_db():
+    """Factory for an in-memory users table behind a %s-placeholder connection"""
+    connections = []
+
+    def make(count=0, seed=0, check_same_thread=True):
+        rng = random.Random(seed)
+        raw = sqlite3.connect(':memory:', check_same_thread=check_same_thread)
+        create_users_table(raw, [random_user(rng) for _ in range(count)])
+        connections.append(raw)
+        return QmarkConnection(raw)
+
+    yield make
+    for raw in connections:
+        raw.close()
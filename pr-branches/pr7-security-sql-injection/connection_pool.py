@@ -0,0 +1,372 @@
+"""
+Database connection pool with per-connection prepared-statement cache
+Works with any DB-API 2.0 driver; tested locally with sqlite3
+
+Usage:
+    pool = ConnectionPool(config.get_database_connection, min_size=2, max_size=20)
+    user = get_user_by_id_pooled(pool, user_id)
+"""
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+DEFAULT_MAX_STATEMENTS = 64
+
+# "%s" placeholders (and "%%" escapes) as written in user_search.py
+_FORMAT_PLACEHOLDER = re.compile(r'%[s%]')
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no connection becomes free within the timeout"""
+
+
+class PoolClosedError(RuntimeError):
+    """Raised when acquiring from a closed pool"""
+
+
+def translate_placeholders(sql: str, paramstyle: str) -> str:
+    """
+    Rewrite "%s"-style SQL for the driver's paramstyle
+
+    Args:
+        sql: SQL using %s placeholders and %% for a literal %
+        paramstyle: Driver paramstyle ('format' or 'qmark')
+
+    Returns:
+        SQL the driver accepts
+    """
+    if paramstyle == 'format':
+        return sql
+    if paramstyle == 'qmark':
+        return _FORMAT_PLACEHOLDER.sub(lambda m: '?' if m.group() == '%s' else '%', sql)
+    raise ValueError(f"Unsupported paramstyle: {paramstyle}")
+
+
+def _default_prepare(raw_connection, sql: str):
+    """Dedicated cursor per statement; drivers cache the prepared plan per cursor/SQL"""
+    return raw_connection.cursor()
+
+
+class PooledConnection:
+    """
+    A pooled DB-API connection with a statement cache
+
+    execute() keeps one prepared cursor per distinct SQL text in an LRU
+    of max_statements entries, so a repeated query skips placeholder
+    translation and, with drivers that support it (e.g. prepare=lambda
+    c, sql: c.cursor(prepared=True) for mysql-connector), re-preparation
+    on the server. A cached cursor is reused by the next execute() of
+    the same SQL, so consume its rows first.
+    """
+
+    def __init__(self, raw_connection, paramstyle: str = 'format',
+                 max_statements: int = DEFAULT_MAX_STATEMENTS,
+                 prepare: Callable = _default_prepare):
+        self.raw = raw_connection
+        self.paramstyle = paramstyle
+        self.max_statements = max_statements
+        self._prepare = prepare
+        self._statements: 'OrderedDict[str, Tuple[str, Any]]' = OrderedDict()
+        self.statement_hits = 0
+        self.statement_misses = 0
+
+    def execute(self, sql: str, params: Sequence = ()):
+        """
+        Execute SQL with %s placeholders through the statement cache
+
+        Returns:
+            The statement's cursor, positioned at its results
+        """
+        driver_sql, cursor = self._statement(sql)
+        cursor.execute(driver_sql, params)
+        return cursor
+
+    def cursor(self):
+        """Plain uncached cursor"""
+        return self.raw.cursor()
+
+    def commit(self) -> None:
+        self.raw.commit()
+
+    def rollback(self) -> None:
+        self.raw.rollback()
+
+    def close(self) -> None:
+        """Close cached cursors and the underlying connection"""
+        for _, cursor in self._statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._statements.clear()
+        self.raw.close()
+
+    def _statement(self, sql: str) -> Tuple[str, Any]:
+        """Look up or prepare the cursor for a SQL text"""
+        entry = self._statements.get(sql)
+        if entry is not None:
+            self._statements.move_to_end(sql)
+            self.statement_hits += 1
+            return entry
+
+        self.statement_misses += 1
+        driver_sql = translate_placeholders(sql, self.paramstyle)
+        entry = (driver_sql, self._prepare(self.raw, driver_sql))
+        self._statements[sql] = entry
+        if len(self._statements) > self.max_statements:
+            _, (_, evicted) = self._statements.popitem(last=False)
+            evicted.close()
+        return entry
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections
+
+    Keeps at least min_size connections open and never more than
+    max_size. acquire() hands out the most recently used idle connection
+    (LIFO keeps a warm core), opens a new one while under max_size, and
+    otherwise waits up to timeout before raising PoolExhaustedError.
+
+    A connection idle for health_check_interval seconds or more is
+    checked with health_check_sql before being handed out and replaced
+    if the check fails. Released connections are rolled back so no
+    transaction leaks to the next borrower; a connection whose rollback
+    fails is discarded. Discarded connections are replaced until
+    min_size are open again.
+
+    Usage:
+        pool = ConnectionPool(config.get_database_connection, min_size=2, max_size=20)
+        with pool.connection() as conn:
+            row = conn.execute("SELECT * FROM users WHERE id = %s", (user_id,)).fetchone()
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, health_check_interval: float = 30.0,
+                 health_check_sql: str = 'SELECT 1', paramstyle: str = 'format',
+                 max_statements: int = DEFAULT_MAX_STATEMENTS,
+                 prepare: Callable = _default_prepare, clock=time.monotonic):
+        if max_size < 1 or not 0 <= min_size <= max_size:
+            raise ValueError("Require 0 <= min_size <= max_size and max_size >= 1")
+        translate_placeholders('', paramstyle)
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.health_check_sql = health_check_sql
+        self.paramstyle = paramstyle
+        self.max_statements = max_statements
+        self._prepare = prepare
+        self._clock = clock
+
+        self._cond = threading.Condition()
+        self._idle: deque = deque()
+        self._live: set = set()
+        self._size = 0
+        self._closed = False
+
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+        self.timeouts = 0
+        # Statement counters of connections already closed
+        self._closed_statement_hits = 0
+        self._closed_statement_misses = 0
+
+        for _ in range(min_size):
+            conn = self._open()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, clock()))
+
+    def __len__(self) -> int:
+        """Open connections (idle and in use)"""
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        """Idle connections"""
+        return len(self._idle)
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        Borrow a connection; pair with release(), or use connection()
+
+        Args:
+            timeout: Seconds to wait for a free connection (default: pool timeout)
+
+        Raises:
+            PoolExhaustedError: If none becomes free in time
+            PoolClosedError: If the pool is closed
+        """
+        deadline = self._clock() + (self.timeout if timeout is None else timeout)
+        while True:
+            conn, last_used = self._take(deadline)
+            if conn is None:
+                try:
+                    return self._open()
+                except BaseException:
+                    # No replenishing: the database just refused a connection
+                    self._forget(replenish=False)
+                    raise
+
+            if self._clock() - last_used < self.health_check_interval or self._healthy(conn):
+                self.reused += 1
+                return conn
+            self._close_quietly(conn)
+            self._forget()
+
+    def release(self, conn: PooledConnection, discard: bool = False) -> None:
+        """
+        Return a borrowed connection
+
+        Args:
+            conn: Connection from acquire()
+            discard: Close it instead of keeping it (e.g. after a network error)
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            keep = not discard and not self._closed
+            if keep:
+                self._idle.append((conn, self._clock()))
+            else:
+                self._size -= 1
+                self.discarded += 1
+            self._cond.notify()
+        if not keep:
+            self._close_quietly(conn)
+            self._replenish()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[PooledConnection]:
+        """Borrow a connection for the duration of a with block"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close idle connections; in-use ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Pool and statement-cache counters
+
+        Statement counters cover every connection the pool has opened:
+        idle, in use and already closed.
+        """
+        with self._cond:
+            live = list(self._live)
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'statement_hits': self._closed_statement_hits + sum(c.statement_hits for c in live),
+                'statement_misses': self._closed_statement_misses + sum(c.statement_misses for c in live),
+            }
+
+    def _take(self, deadline: float) -> Tuple[Optional[PooledConnection], float]:
+        """Pop an idle connection, or reserve a slot for a new one (None)"""
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolClosedError("Connection pool is closed")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, 0.0
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolExhaustedError(f"No connection free within {self.timeout}s "
+                                             f"(max_size={self.max_size})")
+                self.waits += 1
+                self._cond.wait(remaining)
+
+    def _forget(self, replenish: bool = True) -> None:
+        """Give back a reserved slot whose connection is gone"""
+        with self._cond:
+            self._size -= 1
+            self.discarded += 1
+            self._cond.notify()
+        if replenish:
+            self._replenish()
+
+    def _replenish(self) -> None:
+        """Open idle connections until min_size are open; gives up on the first failure"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                return
+            with self._cond:
+                keep = not self._closed
+                if keep:
+                    self._idle.append((conn, self._clock()))
+                    self._cond.notify()
+                else:
+                    self._size -= 1
+            if not keep:
+                self._close_quietly(conn)
+
+    def _open(self) -> PooledConnection:
+        """Open and wrap a new connection"""
+        conn = PooledConnection(self._connect(), self.paramstyle, self.max_statements, self._prepare)
+        with self._cond:
+            self.created += 1
+            self._live.add(conn)
+        return conn
+
+    def _healthy(self, conn: PooledConnection) -> bool:
+        """Run the health-check query"""
+        try:
+            cursor = conn.raw.cursor()
+            cursor.execute(self.health_check_sql)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn: PooledConnection) -> None:
+        """Close a connection, ignoring errors from already-broken ones"""
+        with self._cond:
+            if conn in self._live:
+                self._live.remove(conn)
+                self._closed_statement_hits += conn.statement_hits
+                self._closed_statement_misses += conn.statement_misses
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,256 @@
+"""
+User search result cache
+Bounded LRU+TTL cache of search results, invalidated by a generation counter on every write
+
+Usage (writes through user_search.py invalidate it; call users_changed() after other writes):
+    cache = SearchResultCache(max_size=1000, ttl=30)
+    return search_users_cached(db_connection, cache)
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import request, jsonify
+
+from trigram_index import fold
+from user_search import build_search_query, register_write_hook, unregister_write_hook
+
+# Defaults for the result cache
+CACHE_TTL = 30
+CACHE_SIZE = 1000
+
+# Larger results are returned but not cached, so one broad search cannot fill memory
+MAX_CACHED_ROWS = 1000
+
+SearchKey = Tuple[str, str, Optional[int]]
+
+
+def normalize_key(name: str, email: str, limit: Optional[int] = None,
+                  case_sensitive: bool = False) -> SearchKey:
+    """
+    Cache key for a search
+
+    Only differences LIKE ignores are folded away: ASCII letter case
+    (unless case_sensitive) and, with no name or email, any limit at or
+    above the 100 rows the unfiltered query returns anyway.
+
+    Args:
+        name: Name substring
+        email: Email substring
+        limit: Optional row cap
+        case_sensitive: Whether the database's LIKE is case-sensitive
+
+    Returns:
+        (name, email, limit) tuple
+    """
+    if not case_sensitive:
+        name, email = fold(name), fold(email)
+    if not name and not email and (limit is None or limit >= 100):
+        limit = None
+    return name, email, limit
+
+
+class SearchResultCache:
+    """
+    Bounded LRU cache of search results with a TTL
+
+    Entries expire after ttl seconds and the least recently used entry
+    is evicted once max_size is reached. Results with more than
+    max_rows rows are not stored.
+
+    The cache registers invalidate() as a user_search write hook, so
+    every write made through user_search.py (and any caller of
+    user_search.users_changed()) bumps the generation and empties the
+    cache. Other writers can call invalidate() directly or be wrapped
+    with invalidating(). A result is only stored if the generation is
+    unchanged since its query started, so a search that read the table
+    before a delete can never put the deleted user back into the cache.
+    close() unregisters the hook.
+
+    The generation is per process; with several workers, each needs
+    invalidate() called on writes (e.g. via a pub/sub message), or a TTL
+    short enough to bound staleness.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 max_rows: int = MAX_CACHED_ROWS, case_sensitive: bool = False,
+                 clock: Callable[[], float] = time.monotonic, invalidate_on_write: bool = True):
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[SearchKey, Tuple[Tuple, float]]' = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._max_rows = max_rows
+        self.case_sensitive = case_sensitive
+        self._clock = clock
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if invalidate_on_write:
+            register_write_hook(self.invalidate)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def key(self, name: str, email: str, limit: Optional[int] = None) -> SearchKey:
+        """normalize_key() with this cache's case sensitivity"""
+        return normalize_key(name, email, limit, self.case_sensitive)
+
+    def get(self, key: SearchKey) -> Optional[Tuple]:
+        """
+        Look up a search
+
+        Args:
+            key: From key()
+
+        Returns:
+            Cached rows, or None on a miss or an expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: SearchKey, rows, generation: int) -> bool:
+        """
+        Cache the rows of a search
+
+        Args:
+            key: From key()
+            rows: Query results
+            generation: self.generation read before the query ran
+
+        Returns:
+            True if stored; False if a write happened since the query
+            started or the result is too large
+        """
+        rows = tuple(rows)
+        if len(rows) > self._max_rows:
+            return False
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self._entries[key] = (rows, self._clock() + self._ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self) -> None:
+        """Start a new generation: drop every entry and refuse in-flight results"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def close(self) -> None:
+        """Stop listening for user_search writes"""
+        unregister_write_hook(self.invalidate)
+
+    def invalidating(self, write: Callable) -> Callable:
+        """
+        Wrap a write function so it invalidates the cache when it returns
+
+        Usage:
+            delete_user = cache.invalidating(delete_user_by_email_pooled)
+        """
+        @functools.wraps(write)
+        def wrapper(*args, **kwargs):
+            try:
+                return write(*args, **kwargs)
+            finally:
+                self.invalidate()
+        return wrapper
+
+    def search(self, db_connection, name: str = '', email: str = '',
+               limit: Optional[int] = None, bypass: bool = False) -> Tuple:
+        """
+        Rows of search_users_safe()'s query, from the cache when possible
+
+        Args:
+            db_connection: Database connection
+            name: Name substring
+            email: Email substring
+            limit: Optional row cap
+            bypass: Query the database without reading or filling the cache
+
+        Returns:
+            Tuple of rows
+        """
+        if bypass:
+            with self._lock:
+                self.bypasses += 1
+            return tuple(self._query(db_connection, name, email, limit))
+
+        key = self.key(name, email, limit)
+        rows = self.get(key)
+        if rows is not None:
+            return rows
+
+        generation = self.generation
+        rows = tuple(self._query(db_connection, name, email, limit))
+        self.put(key, rows, generation)
+        return rows
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with size, generation, hits, misses, bypasses,
+            evictions, invalidations and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'generation': self.generation,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypasses': self.bypasses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _query(db_connection, name: str, email: str, limit: Optional[int]) -> Any:
+        query, params = build_search_query(name, email, limit)
+        cursor = db_connection.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+
+def search_users_cached(db_connection, cache: SearchResultCache, bypass: bool = False):
+    """
+    search_users_safe() through a SearchResultCache
+
+    Query parameters:
+        - name: Search by name
+        - email: Search by email
+        - limit: Optional row cap
+
+    Args:
+        db_connection: Database connection
+        cache: Result cache shared by the app
+        bypass: Skip the cache for this call (e.g. admin tools that must
+            see the database as it is)
+    """
+    name = request.args.get('name', '')
+    email = request.args.get('email', '')
+    limit = request.args.get('limit', type=int)
+    if 'limit' in request.args and (limit is None or limit < 1):
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+
+    results = cache.search(db_connection, name, email, limit, bypass)
+    return jsonify({'users': list(results), 'count': len(results)})
@@ -0,0 +1,236 @@
+"""
+Streaming user search
+Pages through the cursor with fetchmany and encodes JSON as it goes, with keyset continuation tokens
+
+Usage:
+    return search_users_streaming(db_connection)  # GET ?name=a&limit=1000&cursor=<next>
+"""
+import base64
+import hashlib
+import json
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from flask import Response, current_app, jsonify, request
+
+from connection_pool import translate_placeholders
+from trigram_index import UNFILTERED_LIMIT
+
+# Rows per fetchmany() call, and so per response chunk
+DEFAULT_BATCH_SIZE = 500
+
+# Largest ?limit= a client may ask for
+MAX_PAGE_SIZE = 10000
+
+
+def _default_cursor(db_connection):
+    return db_connection.cursor()
+
+
+def _fingerprint(name: str, email: str) -> str:
+    """Short digest tying a token to the filters it was issued for"""
+    return hashlib.sha256(f"{name}\0{email}".encode()).hexdigest()[:16]
+
+
+def encode_token(after_id: Any, name: str, email: str) -> str:
+    """
+    Continuation token for the rows after after_id
+
+    Args:
+        after_id: Id of the last row the client received
+        name: Name filter of the search
+        email: Email filter of the search
+
+    Returns:
+        Opaque URL-safe token
+    """
+    payload = json.dumps([after_id, _fingerprint(name, email)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token: str, name: str, email: str) -> Any:
+    """
+    Id to resume after
+
+    Raises:
+        ValueError: If the token is malformed or was issued for other filters
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        after_id, fingerprint = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed continuation token") from e
+    # Ids are integers; anything else would reach the driver as a bad parameter
+    if not isinstance(after_id, int) or isinstance(after_id, bool):
+        raise ValueError("Malformed continuation token")
+    if fingerprint != _fingerprint(name, email):
+        raise ValueError("Continuation token belongs to a different search")
+    return after_id
+
+
+def build_keyset_query(name: str, email: str, after_id: Any = None,
+                       limit: Optional[int] = None) -> Tuple[str, List]:
+    """
+    Parameterized search query in id order, resuming after after_id
+
+    Uses "id > %s ORDER BY id" rather than OFFSET, so each page is an
+    index range scan from where the previous one stopped.
+
+    Args:
+        name: Name substring ('' for no condition)
+        email: Email substring ('' for no condition)
+        after_id: Last id already returned (None to start from the beginning)
+        limit: Optional row cap
+
+    Returns:
+        (SQL with %s placeholders, parameters)
+    """
+    params = []
+    conditions = []
+
+    if name:
+        conditions.append("name LIKE %s")
+        params.append(f"%{name}%")
+    if email:
+        conditions.append("email LIKE %s")
+        params.append(f"%{email}%")
+    if after_id is not None:
+        conditions.append("id > %s")
+        params.append(after_id)
+
+    query = "SELECT * FROM users"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+def iter_batches(cursor, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[List]:
+    """Yield fetchmany() batches until the cursor is exhausted"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+
+def stream_search(db_connection, name: str = '', email: str = '', after_id: Any = None,
+                  limit: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                  open_cursor: Callable = _default_cursor, paramstyle: str = 'format',
+                  dumps: Callable[[Any], str] = json.dumps) -> Iterator[str]:
+    """
+    Search results as JSON text chunks
+
+    The query runs before the first chunk is requested, so SQL errors
+    surface from this call rather than halfway through a response. Rows
+    are then fetched batch_size at a time and each batch is encoded and
+    yielded on its own: at most one batch is held in memory however many
+    rows match. The cursor is closed when the generator finishes or is
+    closed (e.g. the client disconnects).
+
+    The document is {"users": [...], "count": n, "next": token}; "next"
+    is a continuation token when limit cut the results short and null
+    otherwise.
+
+    Args:
+        db_connection: Database connection
+        name: Name substring
+        email: Email substring
+        after_id: Resume after this id (from decode_token)
+        limit: Optional cap on rows in this response
+        batch_size: Rows per fetchmany()
+        open_cursor: Cursor factory; pass a server-side cursor for
+            drivers that otherwise buffer the whole result set, e.g.
+            lambda c: c.cursor(name='user_search') for psycopg2 or
+            lambda c: c.cursor(pymysql.cursors.SSCursor) for PyMySQL
+        paramstyle: Driver paramstyle (see connection_pool.translate_placeholders)
+        dumps: JSON encoder for one row
+
+    Returns:
+        Generator of str chunks
+    """
+    # One extra row tells whether another page exists
+    query, params = build_keyset_query(name, email, after_id, None if limit is None else limit + 1)
+    cursor = open_cursor(db_connection)
+    try:
+        cursor.execute(translate_placeholders(query, paramstyle), params)
+        id_col = [d[0] for d in cursor.description].index('id')
+    except BaseException:
+        cursor.close()
+        raise
+    return _encode(cursor, id_col, name, email, limit, batch_size, dumps)
+
+
+def _encode(cursor, id_col, name, email, limit, batch_size, dumps) -> Iterator[str]:
+    """Generator behind stream_search()"""
+    count = 0
+    last_id = None
+    more = False
+    try:
+        yield '{"users":['
+        for rows in iter_batches(cursor, batch_size):
+            if limit is not None and count + len(rows) > limit:
+                rows = rows[:limit - count]
+                more = True
+            if rows:
+                chunk = ','.join(dumps(row) for row in rows)
+                yield chunk if count == 0 else ',' + chunk
+                count += len(rows)
+                last_id = _row_id(rows[-1], id_col)
+            if more:
+                break
+    finally:
+        cursor.close()
+
+    token = encode_token(last_id, name, email) if more else None
+    yield f'],"count":{count},"next":{json.dumps(token)}}}'
+
+
+def _row_id(row, id_col):
+    """Id of a tuple row or a dict row (DictCursor and similar)"""
+    return row['id'] if isinstance(row, dict) else row[id_col]
+
+
+def search_users_streaming(db_connection, open_cursor: Callable = _default_cursor,
+                           paramstyle: str = 'format', batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Streaming version of search_users_safe()
+
+    Query parameters:
+        - name: Search by name
+        - email: Search by email
+        - limit: Optional rows per response (at most MAX_PAGE_SIZE)
+        - cursor: Continuation token from a previous response's "next"
+
+    Results are in id order. Without limit every match is streamed in
+    one response, except that a search with neither name nor email is
+    capped at UNFILTERED_LIMIT rows like search_users_safe(). Follow
+    "next" to get the following page. When db_connection comes from a
+    ConnectionPool, release it once the response is done:
+    response.call_on_close(lambda: pool.release(conn)).
+
+    Returns:
+        Streaming JSON response, or 400 for a bad limit or token
+    """
+    name = request.args.get('name', '')
+    email = request.args.get('email', '')
+    token = request.args.get('cursor')
+
+    limit = request.args.get('limit', type=int)
+    if 'limit' in request.args and (limit is None or not 1 <= limit <= MAX_PAGE_SIZE):
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+    if limit is None and not name and not email:
+        limit = UNFILTERED_LIMIT
+
+    after_id = None
+    if token:
+        try:
+            after_id = decode_token(token, name, email)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    chunks = stream_search(db_connection, name, email, after_id, limit, batch_size,
+                           open_cursor, paramstyle, current_app.json.dumps)
+    return Response(chunks, mimetype='application/json')
@@ -0,0 +1,258 @@
+"""
+Tests for the connection pool and its statement cache
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from conftest import FakeClock, create_users_table
+from connection_pool import (
+    ConnectionPool, PoolClosedError, PoolExhaustedError, translate_placeholders,
+)
+
+LOOKUP_SQL = "SELECT * FROM users WHERE id = %s"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """SQLite file with three users"""
+    path = str(tmp_path / 'users.db')
+    raw = sqlite3.connect(path)
+    create_users_table(raw, [('Ann', 'ann@example.com'), ('Bob', 'bob@example.com'), ('Cy', None)])
+    raw.close()
+    return path
+
+
+@pytest.fixture
+def make_pool(db_path):
+    """Factory for qmark pools over the users file, closed after the test"""
+    pools = []
+
+    def make(**kwargs):
+        kwargs.setdefault('timeout', 1.0)
+        pool = ConnectionPool(lambda: sqlite3.connect(db_path, check_same_thread=False),
+                              paramstyle='qmark', **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def test_translate_placeholders():
+    """Test %s becomes ? and %% a literal % for qmark drivers"""
+    sql = "SELECT * FROM users WHERE name LIKE '100%%' AND id = %s"
+
+    assert translate_placeholders(sql, 'format') == sql
+    assert translate_placeholders(sql, 'qmark') == "SELECT * FROM users WHERE name LIKE '100%' AND id = ?"
+    with pytest.raises(ValueError):
+        translate_placeholders(sql, 'named')
+
+
+def test_exhaustion_times_out(make_pool):
+    """Test acquire raises PoolExhaustedError once max_size connections are out"""
+    pool = make_pool(min_size=0, max_size=1)
+    conn = pool.acquire()
+
+    with pytest.raises(PoolExhaustedError):
+        pool.acquire(timeout=0.05)
+
+    assert pool.stats()['timeouts'] == 1
+    pool.release(conn)
+    assert pool.acquire(timeout=0.05) is conn
+
+
+def test_release_wakes_waiter(make_pool):
+    """Test a thread waiting for a connection gets the one released"""
+    pool = make_pool(min_size=1, max_size=1)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5)))
+
+    waiter.start()
+    while pool.stats()['waits'] == 0:
+        time.sleep(0.001)
+    pool.release(conn)
+    waiter.join(5)
+
+    assert got == [conn]
+    assert len(pool) == 1
+
+
+def test_unhealthy_idle_connection_is_replaced(make_pool):
+    """Test a connection idle past the interval is checked and replaced if broken"""
+    clock = FakeClock()
+    pool = make_pool(min_size=1, max_size=2, health_check_interval=30, clock=clock)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    clock.now += 10
+    assert pool.acquire() is conn
+    pool.release(conn)
+
+    conn.raw.close()
+    clock.now += 31
+    replacement = pool.acquire()
+
+    assert replacement is not conn
+    assert replacement.execute(LOOKUP_SQL, (1,)).fetchone()[1] == 'Ann'
+    assert pool.stats()['discarded'] == 1
+    assert len(pool) == 1
+
+
+def test_release_rolls_back(make_pool):
+    """Test uncommitted work is rolled back before the next borrower"""
+    pool = make_pool(min_size=1, max_size=1)
+
+    with pool.connection() as conn:
+        conn.execute("DELETE FROM users WHERE id = %s", (1,))
+        assert conn.execute(LOOKUP_SQL, (1,)).fetchone() is None
+
+    with pool.connection() as conn:
+        assert conn.execute(LOOKUP_SQL, (1,)).fetchone()[1] == 'Ann'
+
+
+def test_failed_rollback_discards_and_replenishes(make_pool):
+    """Test a connection that cannot roll back is replaced up to min_size"""
+    pool = make_pool(min_size=2, max_size=3)
+    conn = pool.acquire()
+    conn.raw.close()
+
+    pool.release(conn)
+
+    stats = pool.stats()
+    assert stats['discarded'] == 1
+    assert stats['size'] == 2
+    assert stats['idle'] == 2
+    assert stats['created'] == 3
+
+
+def test_discard_replenishes_to_min_size(make_pool):
+    """Test release(discard=True) opens a replacement but only up to min_size"""
+    pool = make_pool(min_size=1, max_size=3)
+    first, second = pool.acquire(), pool.acquire()
+
+    pool.release(first, discard=True)
+    assert len(pool) == 1
+    pool.release(second, discard=True)
+
+    assert len(pool) == 1
+    assert pool.idle == 1
+
+
+def test_failed_connect_frees_slot(db_path):
+    """Test a connect error gives the slot back without retrying"""
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) > 1:
+            raise sqlite3.OperationalError("database is down")
+        return sqlite3.connect(db_path, check_same_thread=False)
+
+    pool = ConnectionPool(connect, min_size=1, max_size=2, paramstyle='qmark')
+    held = pool.acquire()
+
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+
+    assert len(attempts) == 2
+    assert len(pool) == 1
+    pool.release(held)
+    pool.close()
+
+
+def test_statement_cache_lru(make_pool):
+    """Test statements are reused and the least recently used one is closed"""
+    pool = make_pool(min_size=1, max_size=1, max_statements=2)
+    queries = ["SELECT name FROM users WHERE id = %s",
+               "SELECT email FROM users WHERE id = %s",
+               "SELECT id FROM users WHERE id = %s"]
+
+    with pool.connection() as conn:
+        first = conn.execute(queries[0], (1,))
+        evicted = conn.execute(queries[1], (1,))
+        assert conn.execute(queries[0], (2,)) is first
+        conn.execute(queries[2], (1,))
+
+        assert list(conn._statements) == [queries[0], queries[2]]
+        assert (conn.statement_hits, conn.statement_misses) == (1, 3)
+        with pytest.raises(sqlite3.ProgrammingError):
+            evicted.execute("SELECT 1")
+
+
+def test_stats_count_in_use_and_closed_connections(make_pool):
+    """Test statement counters are pool-wide, not only idle connections"""
+    pool = make_pool(min_size=0, max_size=2)
+    first = pool.acquire()
+    first.execute(LOOKUP_SQL, (1,))
+    first.execute(LOOKUP_SQL, (2,))
+
+    assert pool.stats()['statement_hits'] == 1
+    assert pool.stats()['statement_misses'] == 1
+
+    pool.release(first, discard=True)
+    with pool.connection() as second:
+        second.execute(LOOKUP_SQL, (3,))
+
+    stats = pool.stats()
+    assert stats['statement_hits'] == 1
+    assert stats['statement_misses'] == 2
+
+
+def test_eight_threads_share_the_pool(make_pool):
+    """Test concurrent lookups never exceed max_size and all succeed"""
+    pool = make_pool(min_size=1, max_size=3, timeout=10)
+    errors = []
+    seen = set()
+
+    def worker(offset):
+        try:
+            for i in range(200):
+                with pool.connection() as conn:
+                    seen.add(id(conn))
+                    row = conn.execute(LOOKUP_SQL, ((offset + i) % 3 + 1,)).fetchone()
+                    assert row is not None
+                    assert len(pool) <= 3
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    assert errors == []
+    assert len(seen) <= 3
+    assert stats['created'] <= 3
+    assert stats['statement_hits'] + stats['statement_misses'] == 1600
+
+
+def test_closed_pool(make_pool):
+    """Test a closed pool refuses acquires and closes connections on release"""
+    pool = make_pool(min_size=1, max_size=2)
+    conn = pool.acquire()
+
+    pool.close()
+
+    with pytest.raises(PoolClosedError):
+        pool.acquire()
+    pool.release(conn)
+    assert len(pool) == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.raw.execute("SELECT 1")
+
+
+def test_invalid_sizes():
+    """Test min_size/max_size validation"""
+    with pytest.raises(ValueError):
+        ConnectionPool(sqlite3.connect, min_size=2, max_size=1)
+    with pytest.raises(ValueError):
+        ConnectionPool(sqlite3.connect, max_size=0)
+    with pytest.raises(ValueError):
+        ConnectionPool(sqlite3.connect, min_size=0, paramstyle='named')
@@ -0,0 +1,190 @@
+"""
+Tests for the search result cache
+"""
+import sqlite3
+
+import pytest
+
+from conftest import FakeClock, QmarkConnection, create_users_table
+from connection_pool import ConnectionPool
+from search_cache import SearchResultCache, normalize_key
+from user_search import delete_user_by_email, delete_user_by_email_pooled, users_changed
+
+USERS = [('Ann', 'ann@example.com'), ('Bob', 'bob@example.com'), ('Annie', 'annie@test.io')]
+
+
+@pytest.fixture
+def clock():
+    """Fake clock shared by the cache and the test"""
+    return FakeClock()
+
+
+@pytest.fixture
+def make_cache(clock):
+    """Factory for caches on a fake clock, unregistered after the test"""
+    caches = []
+
+    def make(**kwargs):
+        kwargs.setdefault('clock', clock)
+        cache = SearchResultCache(**kwargs)
+        caches.append(cache)
+        return cache
+
+    yield make
+    for cache in caches:
+        cache.close()
+
+
+@pytest.fixture
+def db(users_db):
+    """Users table with three users"""
+    db = users_db()
+    db.raw.executemany("INSERT INTO users (name, email) VALUES (?, ?)", USERS)
+    db.raw.commit()
+    return db
+
+
+def test_normalize_key():
+    """Test case folding and the unfiltered limit collapse"""
+    assert normalize_key('ANN', 'X') == ('ann', 'x', None)
+    assert normalize_key('ANN', '', case_sensitive=True) == ('ANN', '', None)
+    assert normalize_key('', '', 500) == ('', '', None)
+    assert normalize_key('', '', 5) == ('', '', 5)
+    assert normalize_key('a', '', 500) == ('a', '', 500)
+
+
+def test_search_hits_and_stats(db, make_cache):
+    """Test a repeated search is served from the cache and counted"""
+    cache = make_cache()
+
+    first = cache.search(db, name='ann')
+    second = cache.search(db, name='ANN')
+
+    assert first == second
+    assert [row[1] for row in first] == ['Ann', 'Annie']
+    assert cache.stats() == {
+        'size': 1, 'generation': 0, 'hits': 1, 'misses': 1, 'bypasses': 0,
+        'evictions': 0, 'invalidations': 0, 'hit_rate': 0.5,
+    }
+
+
+def test_put_refuses_result_from_older_generation(make_cache):
+    """Test a query that started before a write cannot fill the cache"""
+    cache = make_cache()
+    key = cache.key('ann', '')
+    generation = cache.generation
+
+    cache.invalidate()
+
+    assert cache.put(key, [('stale',)], generation) is False
+    assert cache.get(key) is None
+    assert cache.put(key, [('fresh',)], cache.generation) is True
+    assert cache.get(key) == (('fresh',),)
+
+
+def test_ttl_expiry(make_cache, clock):
+    """Test entries expire after ttl seconds"""
+    cache = make_cache(ttl=30)
+    key = cache.key('ann', '')
+    cache.put(key, [(1,)], cache.generation)
+
+    clock.now += 29.9
+    assert cache.get(key) == ((1,),)
+    clock.now += 0.1
+    assert cache.get(key) is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction(make_cache):
+    """Test the least recently used entry goes first"""
+    cache = make_cache(max_size=2)
+    keys = [cache.key(name, '') for name in ('a', 'b', 'c')]
+    cache.put(keys[0], [], 0)
+    cache.put(keys[1], [], 0)
+    cache.get(keys[0])
+
+    cache.put(keys[2], [], 0)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == ()
+    assert cache.get(keys[2]) == ()
+    assert cache.stats()['evictions'] == 1
+
+
+def test_max_rows(make_cache):
+    """Test results larger than max_rows are not stored"""
+    cache = make_cache(max_rows=2)
+    key = cache.key('a', '')
+
+    assert cache.put(key, [(1,), (2,), (3,)], 0) is False
+    assert cache.put(key, [(1,), (2,)], 0) is True
+
+
+def test_bypass(db, make_cache):
+    """Test bypass neither reads nor fills the cache"""
+    cache = make_cache()
+    cache.put(cache.key('ann', ''), [('cached',)], 0)
+
+    rows = cache.search(db, name='ann', bypass=True)
+
+    assert [row[1] for row in rows] == ['Ann', 'Annie']
+    assert cache.search(db, name='bob', bypass=True)
+    assert len(cache) == 1
+    stats = cache.stats()
+    assert (stats['bypasses'], stats['hits'], stats['misses']) == (2, 0, 0)
+    assert stats['hit_rate'] == 0.0
+
+
+def test_delete_user_by_email_invalidates(db, make_cache):
+    """Test the user_search delete path empties the cache"""
+    cache = make_cache()
+    assert len(cache.search(db, name='ann')) == 2
+
+    assert delete_user_by_email(db, 'annie@test.io') == 1
+
+    assert cache.stats()['invalidations'] == 1
+    assert [row[1] for row in cache.search(db, name='ann')] == ['Ann']
+
+
+def test_pooled_delete_invalidates(tmp_path, make_cache):
+    """Test delete_user_by_email_pooled empties the cache too"""
+    path = str(tmp_path / 'users.db')
+    raw = sqlite3.connect(path)
+    create_users_table(raw, USERS)
+    raw.close()
+    pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), paramstyle='qmark')
+    reader = QmarkConnection(sqlite3.connect(path))
+    cache = make_cache()
+
+    assert len(cache.search(reader, email='example')) == 2
+    assert delete_user_by_email_pooled(pool, 'bob@example.com') == 1
+    assert [row[1] for row in cache.search(reader, email='example')] == ['Ann']
+    reader.close()
+    pool.close()
+
+
+def test_hooks_reach_every_cache_until_closed(make_cache):
+    """Test users_changed() invalidates each registered cache and close() detaches"""
+    first, second = make_cache(), make_cache()
+    detached = make_cache(invalidate_on_write=False)
+
+    users_changed()
+    second.close()
+    users_changed()
+
+    assert first.generation == 2
+    assert second.generation == 1
+    assert detached.generation == 0
+
+
+def test_invalidating_wrapper(make_cache):
+    """Test a wrapped write invalidates even when it raises"""
+    cache = make_cache(invalidate_on_write=False)
+
+    def failing_write():
+        raise RuntimeError("write failed")
+
+    with pytest.raises(RuntimeError):
+        cache.invalidating(failing_write)()
+    assert cache.invalidating(lambda: 3)() == 3
+    assert cache.generation == 2
@@ -0,0 +1,137 @@
+"""
+Tests for the streaming user search
+"""
+import base64
+import json
+
+import pytest
+from flask import Flask
+
+from streaming_search import MAX_PAGE_SIZE, decode_token, encode_token, search_users_streaming
+
+
+def raw_token(payload):
+    """Token carrying an arbitrary JSON payload"""
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+@pytest.fixture
+def client(users_db):
+    """App serving /users/stream over 250 users named 'user <id>' and 'other' every 5th id"""
+    db = users_db()
+    db.raw.executemany(
+        "INSERT INTO users (name, email) VALUES (?, ?)",
+        [('other' if i % 5 == 0 else f'user {i}', f'u{i}@example.com') for i in range(1, 251)],
+    )
+    db.raw.commit()
+
+    app = Flask(__name__)
+
+    @app.route('/users/stream')
+    def stream():
+        return search_users_streaming(db.raw, paramstyle='qmark', batch_size=7)
+
+    return app.test_client()
+
+
+def fetch(client, **params):
+    """GET /users/stream and return (status, JSON body)"""
+    response = client.get('/users/stream', query_string=params)
+    return response.status_code, json.loads(response.get_data(as_text=True))
+
+
+def test_token_round_trip():
+    """Test a token decodes to its id for the same filters only"""
+    token = encode_token(42, 'jo', '')
+
+    assert decode_token(token, 'jo', '') == 42
+    with pytest.raises(ValueError, match='different search'):
+        decode_token(token, 'joe', '')
+    with pytest.raises(ValueError, match='different search'):
+        decode_token(token, 'jo', 'x')
+
+
+@pytest.mark.parametrize('token', [
+    'not-a-token!',
+    raw_token([[1], 'x']),
+    raw_token(['5', 'x']),
+    raw_token([True, 'x']),
+    raw_token([None, 'x']),
+    raw_token({'a': 1, 'b': 2}),
+    raw_token([1, 2, 3]),
+])
+def test_malformed_token_rejected(client, token):
+    """Test bad tokens, including non-integer ids, get the 400 error"""
+    status, body = fetch(client, name='user', cursor=token)
+
+    assert status == 400
+    assert body == {'error': 'Malformed continuation token'}
+
+
+def test_token_for_other_filters_rejected(client):
+    """Test a token cannot be replayed against a different search"""
+    token = encode_token(10, 'user', '')
+
+    status, body = fetch(client, name='other', cursor=token)
+
+    assert status == 400
+    assert 'different search' in body['error']
+
+
+def test_pages_follow_next(client):
+    """Test limit+1 paging returns each match once and ends with next null"""
+    ids = []
+    params = {'name': 'user', 'limit': 60}
+    pages = 0
+    while True:
+        status, body = fetch(client, **params)
+        assert status == 200
+        assert body['count'] == len(body['users']) <= 60
+        ids.extend(row[0] for row in body['users'])
+        pages += 1
+        if body['next'] is None:
+            break
+        params['cursor'] = body['next']
+
+    assert ids == [i for i in range(1, 251) if i % 5]
+    assert pages == 4
+
+
+def test_exact_limit_has_no_next(client):
+    """Test a page that ends exactly at the last match does not offer another"""
+    status, body = fetch(client, name='other', limit=50)
+
+    assert status == 200
+    assert body['count'] == 50
+    assert body['next'] is None
+
+
+def test_filtered_search_without_limit_streams_everything(client):
+    """Test a filtered search with no limit returns every match"""
+    status, body = fetch(client, email='example')
+
+    assert status == 200
+    assert body['count'] == 250
+    assert body['next'] is None
+
+
+def test_unfiltered_search_is_capped(client):
+    """Test no filter and no limit keeps the 100-row cap, with a next token"""
+    status, body = fetch(client)
+
+    assert status == 200
+    assert body['count'] == 100
+    assert [row[0] for row in body['users']] == list(range(1, 101))
+    assert decode_token(body['next'], '', '') == 100
+
+    status, body = fetch(client, limit=200)
+    assert body['count'] == 200
+
+
+@pytest.mark.parametrize('limit', ['0', '-1', 'abc', str(MAX_PAGE_SIZE + 1)])
+def test_bad_limit(client, limit):
+    """Test limits outside 1..MAX_PAGE_SIZE are rejected"""
+    status, body = fetch(client, limit=limit)
+
+    assert status == 400
+    assert 'limit' in body['error']
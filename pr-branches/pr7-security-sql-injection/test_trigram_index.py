@@ -0,0 +1,188 @@
+"""
+Tests for the in-process trigram index
+"""
+import random
+from array import array
+
+import pytest
+
+from conftest import DOMAINS, NAMES, random_user
+from trigram_index import TrigramUserIndex, _intersect, literal_grams, ngrams
+from user_search import build_search_query
+
+EMAIL_PARTS = ['user12@'] + DOMAINS
+TERM_PARTS = ['jo', 'J', 'oh', 'smith', 'SMI', 'a', 'x', '%', '_', 'ø', 'Æ', 'e.c', 'io', '1', '@m', 'o%n', 'zz']
+
+
+def random_term(rng, values):
+    """Empty, random-part or substring-of-a-value term, sometimes with wildcards"""
+    kind = rng.random()
+    if kind < 0.2:
+        return ''
+    if kind < 0.5:
+        return ''.join(rng.choice(TERM_PARTS) for _ in range(rng.randrange(1, 3)))
+    value = rng.choice(values)
+    start = rng.randrange(len(value))
+    term = list(value[start:start + rng.randrange(1, 7)])
+    if rng.random() < 0.3:
+        term[rng.randrange(len(term))] = rng.choice('%_')
+    return ''.join(term).swapcase() if rng.random() < 0.3 else ''.join(term)
+
+
+def sql_search(db, name, email):
+    """Rows search_users_safe() would return"""
+    query, params = build_search_query(name, email)
+    cursor = db.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+def test_ngrams_and_literal_grams():
+    """Test short literal runs are looked up whole and long ones by trigram"""
+    assert ngrams('abcd') == {'a', 'b', 'c', 'd', 'ab', 'bc', 'cd', 'abc', 'bcd'}
+    assert literal_grams('Jo') == {'jo'}
+    assert literal_grams('j_hn%Smith') == {'j', 'hn', 'smi', 'mit', 'ith'}
+    assert literal_grams('%_') == set()
+
+
+def test_random_queries_match_sqlite(users_db):
+    """Test 800 random queries return the rows sqlite returns, before and after writes"""
+    rng = random.Random(20)
+    db = users_db(3000, seed=20)
+    index = TrigramUserIndex.from_connection(db)
+    queries = [(random_term(rng, NAMES), random_term(rng, EMAIL_PARTS)) for _ in range(800)]
+
+    for name, email in queries[:400]:
+        assert index.search(name, email) == sql_search(db, name, email), (name, email)
+
+    cursor = db.cursor()
+    for _ in range(500):
+        action = rng.random()
+        name, email = random_user(rng)
+        if action < 0.4:
+            cursor.execute("INSERT INTO users (name, email) VALUES (%s, %s)", (name, email))
+            user_id = cursor.lastrowid
+            index.add(user_id, name, email, (user_id, name, email))
+        else:
+            user_id = rng.choice(sorted(index._rows))
+            if action < 0.7:
+                cursor.execute("UPDATE users SET name = %s, email = %s WHERE id = %s", (name, email, user_id))
+                index.update(user_id, name, email, (user_id, name, email))
+            else:
+                cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+                index.remove(user_id)
+    db.commit()
+
+    for name, email in queries[400:]:
+        assert index.search(name, email) == sql_search(db, name, email), (name, email)
+
+
+def test_out_of_order_ids_stay_sorted():
+    """Test adding ids below the maximum and removing them keeps id order"""
+    index = TrigramUserIndex()
+    for user_id in (5, 1, 9, 3, 7):
+        index.add(user_id, f'user {user_id}', None)
+
+    assert index.search() == [1, 3, 5, 7, 9]
+    assert index.search(name='user') == [1, 3, 5, 7, 9]
+
+    index.remove(5)
+    index.add(4, 'user 4', None)
+    index.update(9, 'renamed', None)
+
+    assert index._sorted_ids.tolist() == [1, 3, 4, 7, 9]
+    assert index.search(name='user') == [1, 3, 4, 7]
+    assert index.search(name='ren') == [9]
+
+
+def test_candidates_are_verified():
+    """Test users holding every trigram of a term but not the term itself are dropped"""
+    index = TrigramUserIndex()
+    index.add(1, 'joh ohn', 'ab@cd')
+    index.add(2, 'John', 'ab.cd')
+
+    assert index.search(name='john') == [2]
+    assert index.search(name='j_hn') == [2]
+    assert index.search(email='b@c') == [1]
+    assert index.search(email='b_c') == [1, 2]
+    assert index.search(name='jo', email='@') == [1]
+
+
+def test_unfiltered_limit():
+    """Test the unfiltered search is capped at 100 rows and limit applies to filters"""
+    index = TrigramUserIndex()
+    for user_id in range(150):
+        index.add(user_id, 'same', 'same@example.com')
+
+    assert index.search() == list(range(100))
+    assert index.search(limit=500) == list(range(100))
+    assert index.search(limit=5) == list(range(5))
+    assert index.search(name='same') == list(range(150))
+    assert index.search(name='sa', limit=3) == [0, 1, 2]
+
+
+def test_pages_with_after_id_cover_every_match(users_db):
+    """Test walking limit-sized pages with after_id returns the full result in order"""
+    db = users_db(2000, seed=21)
+    index = TrigramUserIndex.from_connection(db)
+
+    for name, email in [('jo', ''), ('j_hn', ''), ('', 'mail'), ('o', 'e.c'), ('%', '')]:
+        expected = index.search(name, email)
+        pages = []
+        after_id = None
+        while True:
+            page = index.search(name, email, limit=7, after_id=after_id)
+            pages.extend(page)
+            if len(page) < 7:
+                break
+            after_id = page[-1][0]
+        assert pages == expected, (name, email)
+
+    assert index.search(after_id=5, limit=3) == index.search()[5:8]
+
+
+def test_intersect_gallop_and_filter_agree():
+    """Test both intersection strategies return the common ids in order"""
+    rng = random.Random(22)
+    posting = array('I', sorted(rng.sample(range(100000), 20000)))
+    for size in (3, 50, 5000):
+        ids = sorted(rng.sample(range(100000), size))
+        assert _intersect(ids, posting) == sorted(set(ids) & set(posting))
+
+
+def test_rejects_ids_that_do_not_fit_the_postings():
+    """Test add accepts only integer ids in [0, 2**32)"""
+    index = TrigramUserIndex()
+
+    with pytest.raises(TypeError):
+        index.add('1', 'a', 'b')
+    with pytest.raises(ValueError):
+        index.add(-1, 'a', 'b')
+    with pytest.raises(ValueError):
+        index.add(2 ** 32, 'a', 'b')
+    assert len(index) == 0
+
+
+def test_case_sensitive_index():
+    """Test case_sensitive=True matches case exactly"""
+    index = TrigramUserIndex(case_sensitive=True)
+    index.add(1, 'John', None)
+    index.add(2, 'john', None)
+
+    assert index.search(name='J') == [1]
+    assert index.search(name='jo') == [2]
+    assert index.search(name='JOHN') == []
+
+
+def test_invalid_changes():
+    """Test duplicate adds and unknown updates/removes"""
+    index = TrigramUserIndex()
+    index.add(1, 'a', 'b')
+
+    with pytest.raises(ValueError):
+        index.add(1, 'a', 'b')
+    with pytest.raises(KeyError):
+        index.update(2, 'a', 'b')
+    with pytest.raises(KeyError):
+        index.remove(2)
+    assert index.search() == [1]
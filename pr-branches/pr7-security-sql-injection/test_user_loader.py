@@ -0,0 +1,160 @@
+"""
+Tests for batched user lookup and the request-scoped UserLoader
+"""
+import pytest
+from flask import Flask
+
+from user_loader import UserLoader, get_user_by_id_batched, get_user_loader, load_user_by_id_batched
+from user_search import get_users_by_ids
+
+
+class CountingConnection:
+    """Connection wrapper counting executed statements"""
+
+    def __init__(self, db):
+        self.db = db
+        self.queries = 0
+
+    def cursor(self):
+        cursor = self.db.cursor()
+        execute = cursor.execute
+
+        def counted(sql, params=()):
+            self.queries += 1
+            return execute(sql, params)
+
+        cursor.execute = counted
+        return cursor
+
+
+@pytest.fixture
+def db(users_db):
+    """Counting connection over 12 users with ids 1-12"""
+    return CountingConnection(users_db(12, seed=23))
+
+
+def test_get_users_by_ids_order_duplicates_and_missing(db):
+    """Test rows come back in input order, once per input id, None when missing"""
+    rows = get_users_by_ids(db, [5, 99, 2, 5, 1])
+
+    assert [row[0] if row else None for row in rows] == [5, None, 2, 5, 1]
+    assert rows[0] is rows[3]
+    assert db.queries == 1
+
+
+def test_get_users_by_ids_chunks(db):
+    """Test ids are split into ceil(unique / chunk_size) queries"""
+    rows = get_users_by_ids(db, list(range(1, 13)) + [3, 3], chunk_size=5)
+
+    assert [row[0] for row in rows] == list(range(1, 13)) + [3, 3]
+    assert db.queries == 3
+
+
+def test_get_users_by_ids_string_ids(db):
+    """Test decimal-string ids find their rows and malformed ids raise"""
+    rows = get_users_by_ids(db, ['2', 5, ' 7 ', '2'])
+
+    assert [row[0] for row in rows] == [2, 5, 7, 2]
+    assert db.queries == 1
+    for bad in ('abc', None, 2.0, ''):
+        with pytest.raises(ValueError):
+            get_users_by_ids(db, [1, bad])
+
+
+def test_loader_shares_string_and_int_ids(db):
+    """Test '3' and 3 are one cached lookup on the loader"""
+    loader = UserLoader(db)
+    pending = [loader.load('3'), loader.load(3)]
+
+    assert [p.result()[0] for p in pending] == [3, 3]
+    assert loader.get(' 3') is pending[0].result()
+    assert db.queries == 1
+    with pytest.raises(ValueError):
+        loader.load('three')
+
+
+def test_get_users_by_ids_empty(db):
+    """Test no ids means no query"""
+    assert get_users_by_ids(db, []) == []
+    assert db.queries == 0
+
+
+def test_queued_loads_share_one_query(db):
+    """Test loads queued before the first read are fetched together"""
+    loader = UserLoader(db)
+    pending = [loader.load(user_id) for user_id in (3, 1, 3, 42)]
+
+    results = [p.result() for p in pending]
+
+    assert [row[0] if row else None for row in results] == [3, 1, 3, None]
+    assert db.queries == 1
+    assert loader.batches == 1
+
+
+def test_rows_are_memoised(db):
+    """Test ids fetched once, including missing ones, are not queried again"""
+    loader = UserLoader(db)
+    loader.load_many([1, 2, 42])
+
+    assert loader.get(2)[0] == 2
+    assert loader.get(42) is None
+    assert loader.load_many([1, 2]) == [loader.get(1), loader.get(2)]
+    assert db.queries == 1
+
+
+def test_sequential_gets_are_not_coalesced(db):
+    """Test get() fetches at once: one query per new id, with queued ids included"""
+    loader = UserLoader(db)
+
+    for user_id in (1, 2, 3):
+        loader.get(user_id)
+    assert db.queries == 3
+
+    queued = loader.load(4)
+    loader.get(5)
+    assert db.queries == 4
+    assert queued.result()[0] == 4
+    assert db.queries == 4
+
+
+def test_prime_and_clear(db):
+    """Test primed rows skip the query and clear() forces a refetch"""
+    loader = UserLoader(db)
+    loader.load(1)
+    loader.prime(1, 'primed')
+
+    assert loader.get(1) == 'primed'
+    assert db.queries == 0
+
+    loader.clear(1)
+    assert loader.get(1)[0] == 1
+    loader.clear()
+    loader.get(1)
+    assert db.queries == 2
+
+
+def test_dispatch_chunks_large_batches(db):
+    """Test the loader passes its chunk size to get_users_by_ids"""
+    loader = UserLoader(db, chunk_size=4)
+    loader.load_many(range(1, 11))
+
+    assert db.queries == 3
+    assert loader.batches == 1
+
+
+def test_loader_is_request_scoped(db):
+    """Test each request gets its own loader and the helpers share it"""
+    app = Flask(__name__)
+
+    with app.test_request_context():
+        loader = get_user_loader(db)
+        pending = [load_user_by_id_batched(db, user_id) for user_id in (1, 2)]
+        assert get_user_by_id_batched(db, 3)[0] == 3
+        assert get_user_loader(db) is loader
+        assert [p.result()[0] for p in pending] == [1, 2]
+        assert db.queries == 1
+
+    with app.test_request_context():
+        assert get_user_loader(db) is not loader
+        get_user_by_id_batched(db, 1)
+        assert db.queries == 2
@@ -0,0 +1,350 @@
+"""
+In-process trigram index for substring user search
+Answers name/email LIKE '%term%' queries without a table scan
+
+Usage:
+    index = TrigramUserIndex.from_connection(db_connection)
+    rows = index.search(name='smi')       # same rows and order as search_users_safe()
+    index.add(user_id, name, email, row)  # keep in step with INSERT/UPDATE/DELETE
+"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from flask import request, jsonify
+
+# Rows returned by search_users_safe() when no filter is given
+UNFILTERED_LIMIT = 100
+
+# Posting lists are arrays of unsigned 32-bit ids
+ID_TYPECODE = 'I'
+MAX_USER_ID = 2 ** 32 - 1
+
+# Ids taken from the rarest posting list per step when search() has a limit
+CHUNK_SIZE = 256
+
+# Binary search a chunk into a posting list when the list's span is this
+# many times longer; otherwise filter the span through a set of the chunk
+GALLOP_RATIO = 16
+
+# Longest substring indexed; shorter literal terms are looked up directly
+GRAM_SIZE = 3
+
+# LIKE folds ASCII letters only (SQLite, MySQL's default collations)
+_ASCII_FOLD = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def fold(text: str) -> str:
+    """Lower-case ASCII letters, as a case-insensitive LIKE compares them"""
+    return text.translate(_ASCII_FOLD)
+
+
+def trigrams(text: str) -> Set[str]:
+    """All 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def ngrams(text: str) -> Set[str]:
+    """All substrings of text of 1 to GRAM_SIZE characters"""
+    return {text[i:i + n] for n in range(1, GRAM_SIZE + 1) for i in range(len(text) - n + 1)}
+
+
+def like_contains_regex(term: str, case_sensitive: bool = False):
+    """
+    Compile the regex equivalent of LIKE '%term%'
+
+    '%' and '_' in the term keep their LIKE meaning (any run / any one
+    character), exactly as they do when the term is bound into the
+    '%{term}%' pattern in search_users_safe().
+    """
+    parts = ['.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in term]
+    flags = re.DOTALL if case_sensitive else re.DOTALL | re.IGNORECASE | re.ASCII
+    return re.compile(''.join(parts), flags)
+
+
+def literal_grams(term: str, case_sensitive: bool = False) -> Set[str]:
+    """
+    Indexed grams every match must contain
+
+    A literal run between wildcards contributes its trigrams, or the
+    whole run if it is shorter than GRAM_SIZE.
+    """
+    text = term if case_sensitive else fold(term)
+    grams: Set[str] = set()
+    for fragment in re.split('[%_]', text):
+        if len(fragment) >= GRAM_SIZE:
+            grams |= trigrams(fragment)
+        elif fragment:
+            grams.add(fragment)
+    return grams
+
+
+def is_exact_gram(term: str) -> bool:
+    """Whether a term's gram posting list is exactly its LIKE '%term%' matches"""
+    return 0 < len(term) <= GRAM_SIZE and '%' not in term and '_' not in term
+
+
+class TrigramUserIndex:
+    """
+    Trigram posting lists over user names and emails
+
+    search() gives the same rows, in the same order, as
+    search_users_safe(): every user whose name contains the name term
+    and whose email contains the email term, matched like SQL LIKE
+    (ASCII case-insensitive by default), in id order, with LIMIT 100
+    only when neither term is given.
+
+    Every substring of 1 to 3 characters is indexed. Each posting list is
+    a sorted array('I') of user ids (4 bytes per entry), so ids must be
+    integers in [0, 2**32). Candidates are walked in id order along the
+    rarest posting list, in chunks, and each chunk is narrowed by the
+    next rarest list: by binary search when the chunk is much shorter
+    than the slice of the list it spans, by a set filter otherwise.
+    Survivors are verified against the exact LIKE pattern. A term of at
+    most 3 characters without wildcards is its own posting list, so its
+    matches need no verification. Only a term made of wildcards alone
+    falls back to verifying every user.
+
+    With a limit, the walk stops once enough rows are found, so a page
+    costs about the same whatever the total match count; after_id
+    resumes from the last id of the previous page.
+
+    Keep the index current by calling add/update/remove alongside the
+    corresponding INSERT/UPDATE/DELETE.
+    """
+
+    FIELDS = ('name', 'email')
+
+    def __init__(self, case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self._rows: Dict[int, Any] = {}
+        self._values: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        self._postings: Dict[str, Dict[str, array]] = {field: {} for field in self.FIELDS}
+        self._sorted_ids = array(ID_TYPECODE)
+
+    @classmethod
+    def from_connection(cls, db_connection, case_sensitive: bool = False) -> 'TrigramUserIndex':
+        """
+        Build an index from the users table
+
+        Rows are kept exactly as SELECT * returns them, so search()
+        results can replace the SQL path's results one for one. Reading
+        in id order makes every posting-list insert an append.
+        """
+        index = cls(case_sensitive)
+        cursor = db_connection.cursor()
+        cursor.execute("SELECT * FROM users ORDER BY id")
+        columns = [d[0] for d in cursor.description]
+        id_col, name_col, email_col = (columns.index(c) for c in ('id', 'name', 'email'))
+        for row in cursor.fetchall():
+            index.add(row[id_col], row[name_col], row[email_col], row)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, user_id: Any) -> bool:
+        return user_id in self._rows
+
+    def add(self, user_id: int, name: Optional[str], email: Optional[str], row: Any = None) -> None:
+        """
+        Index a new user
+
+        Args:
+            user_id: Integer primary key in [0, 2**32) (defines result order)
+            name: User name (None never matches, like SQL NULL)
+            email: Email address
+            row: What search() returns for this user (default: user_id)
+
+        Raises:
+            TypeError: If user_id is not an integer
+            ValueError: If the user is already indexed or user_id is out of range
+        """
+        if not isinstance(user_id, int):
+            raise TypeError(f"User id must be an integer, got {type(user_id).__name__}")
+        if not 0 <= user_id <= MAX_USER_ID:
+            raise ValueError(f"User id {user_id} is outside [0, {MAX_USER_ID}]")
+        if user_id in self._rows:
+            raise ValueError(f"User {user_id!r} is already indexed")
+        self._insert(user_id, name, email, row)
+        _insert_id(self._sorted_ids, user_id)
+
+    def update(self, user_id: int, name: Optional[str], email: Optional[str], row: Any = None) -> None:
+        """
+        Re-index a user whose name or email changed
+
+        Only grams the old and new values do not share are touched.
+
+        Raises:
+            KeyError: If the user is not indexed
+        """
+        old_grams = self._grams(self._values[user_id])
+        new_values = (name, email)
+        new_grams = self._grams(new_values)
+        for field, old, new in zip(self.FIELDS, old_grams, new_grams):
+            field_postings = self._postings[field]
+            for gram in old - new:
+                _delete_id(field_postings, gram, user_id)
+            for gram in new - old:
+                _add_id(field_postings, gram, user_id)
+        self._values[user_id] = new_values
+        self._rows[user_id] = user_id if row is None else row
+
+    def remove(self, user_id: int) -> None:
+        """
+        Drop a user from the index
+
+        Raises:
+            KeyError: If the user is not indexed
+        """
+        values = self._values.pop(user_id)
+        del self._rows[user_id]
+        for field, grams in zip(self.FIELDS, self._grams(values)):
+            field_postings = self._postings[field]
+            for gram in grams:
+                _delete_id(field_postings, gram, user_id)
+        ids = self._sorted_ids
+        del ids[bisect_left(ids, user_id)]
+
+    def search(self, name: str = '', email: str = '', limit: Optional[int] = None,
+               after_id: Optional[int] = None) -> List[Any]:
+        """
+        Users matching name LIKE '%name%' AND email LIKE '%email%'
+
+        Args:
+            name: Name substring ('' for no condition)
+            email: Email substring ('' for no condition)
+            limit: Optional cap on the number of rows
+            after_id: Only return users with a greater id (next page)
+
+        Returns:
+            Rows in id order
+        """
+        terms = [(field, term) for field, term in zip(self.FIELDS, (name, email)) if term]
+        if not terms:
+            limit = UNFILTERED_LIMIT if limit is None else min(limit, UNFILTERED_LIMIT)
+            ids = self._sorted_ids
+            start = 0 if after_id is None else bisect_right(ids, after_id)
+            return [self._rows[user_id] for user_id in ids[start:start + limit]]
+
+        rows = self._rows
+        return [rows[user_id] for user_id in self._matching_ids(terms, limit, after_id)]
+
+    def _matching_ids(self, terms, limit: Optional[int], after_id: Optional[int]) -> List[int]:
+        """Ids of users matching every term, in id order, at most limit of them"""
+        postings = []
+        for field, term in terms:
+            for gram in literal_grams(term, self.case_sensitive):
+                posting = self._postings[field].get(gram)
+                if posting is None:
+                    return []
+                postings.append(posting)
+        postings.sort(key=len)
+        base = postings.pop(0) if postings else self._sorted_ids
+
+        patterns = [
+            (self.FIELDS.index(field), like_contains_regex(term, self.case_sensitive))
+            for field, term in terms if not is_exact_gram(term)
+        ]
+        values = self._values
+        start = 0 if after_id is None else bisect_right(base, after_id)
+        chunk_size = len(base) if limit is None else max(CHUNK_SIZE, 2 * limit)
+        matches: List[int] = []
+        while start < len(base):
+            ids = base[start:start + chunk_size]
+            start += chunk_size
+            for posting in postings:
+                ids = _intersect(ids, posting)
+                if not ids:
+                    break
+            if patterns:
+                ids = [
+                    user_id for user_id in ids
+                    if all(values[user_id][position] is not None
+                           and pattern.search(values[user_id][position])
+                           for position, pattern in patterns)
+                ]
+            matches.extend(ids)
+            if limit is not None and len(matches) >= limit:
+                return matches[:limit]
+        return matches
+
+    def _grams(self, values) -> Tuple[Set[str], ...]:
+        """Indexed grams of a (name, email) pair, one set per field"""
+        return tuple(
+            set() if value is None else ngrams(value if self.case_sensitive else fold(value))
+            for value in values
+        )
+
+    def _insert(self, user_id, name, email, row) -> None:
+        """Store a user and add its grams to the posting lists"""
+        values = (name, email)
+        self._rows[user_id] = user_id if row is None else row
+        self._values[user_id] = values
+        for field, grams in zip(self.FIELDS, self._grams(values)):
+            field_postings = self._postings[field]
+            for gram in grams:
+                _add_id(field_postings, gram, user_id)
+
+
+def _insert_id(ids: array, user_id: int) -> None:
+    """Add an id to a sorted array (an append in the usual ascending case)"""
+    if not ids or ids[-1] < user_id:
+        ids.append(user_id)
+    else:
+        ids.insert(bisect_left(ids, user_id), user_id)
+
+
+def _add_id(field_postings: Dict[str, array], gram: str, user_id: int) -> None:
+    """Add an id to a gram's posting list, creating the list if needed"""
+    posting = field_postings.get(gram)
+    if posting is None:
+        field_postings[gram] = array(ID_TYPECODE, (user_id,))
+    else:
+        _insert_id(posting, user_id)
+
+
+def _delete_id(field_postings: Dict[str, array], gram: str, user_id: int) -> None:
+    """Drop an id from a gram's posting list, and the list once it is empty"""
+    posting = field_postings[gram]
+    del posting[bisect_left(posting, user_id)]
+    if not posting:
+        del field_postings[gram]
+
+
+def _intersect(ids, posting: array) -> List[int]:
+    """
+    Ids (sorted) that also appear in posting, in order
+
+    Only the slice of posting between the first and last id is looked
+    at: a short ids list is binary searched into it, a long one turns
+    into a set the slice is filtered through.
+    """
+    lo = bisect_left(posting, ids[0])
+    hi = bisect_right(posting, ids[-1], lo)
+    if hi == lo:
+        return []
+    if len(ids) * GALLOP_RATIO < hi - lo:
+        found = []
+        for user_id in ids:
+            lo = bisect_left(posting, user_id, lo, hi)
+            if lo == hi:
+                break
+            if posting[lo] == user_id:
+                found.append(user_id)
+        return found
+    wanted = set(ids)
+    return [user_id for user_id in posting[lo:hi] if user_id in wanted]
+
+
+def search_users_indexed(index: TrigramUserIndex):
+    """
+    search_users_safe() answered from a TrigramUserIndex
+
+    Same query parameters and response shape as search_users_safe().
+    """
+    name = request.args.get('name', '')
+    email = request.args.get('email', '')
+    results = index.search(name, email)
+    return jsonify({'users': results, 'count': len(results)})
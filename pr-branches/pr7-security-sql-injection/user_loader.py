@@ -0,0 +1,148 @@
+"""
+Request-scoped user batcher
+DataLoader-style coalescing of single-user lookups into get_users_by_ids() queries
+
+Usage (queue every lookup first, then read; reading as you go is one query per id):
+    loader = get_user_loader(db_connection)
+    pending = [loader.load(order['user_id']) for order in orders]
+    users = [p.result() for p in pending]  # one query
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from flask import g
+
+from user_search import IN_CHUNK_SIZE, as_user_id, get_users_by_ids
+
+
+class PendingUser:
+    """A queued lookup; result() runs the batch it belongs to if needed"""
+
+    __slots__ = ('_loader', 'user_id')
+
+    def __init__(self, loader: 'UserLoader', user_id: Any):
+        self._loader = loader
+        self.user_id = user_id
+
+    def result(self):
+        """The user row, or None if there is no such user"""
+        return self._loader._resolve(self.user_id)
+
+
+class UserLoader:
+    """
+    Coalesces user lookups made during one request
+
+    load() only queues an id. The first result() (or get()) afterwards
+    fetches every queued id with one get_users_by_ids() call, and the
+    rows are memoised for the rest of the loader's life, so each id is
+    queried at most once. Code that renders N rows queues first and
+    reads afterwards:
+
+        pending = [loader.load(order['user_id']) for order in orders]
+        users = [p.result() for p in pending]    # one query
+
+    Nothing is coalesced unless ids are queued before the first read:
+    get() and result() fetch at once, so a loop that calls get() per
+    row still makes one query per id (only repeats are served from the
+    cache).
+
+    A loader holds rows as of its first fetch; call clear() after
+    writing a user within the same request.
+    """
+
+    def __init__(self, db_connection, chunk_size: int = IN_CHUNK_SIZE):
+        self._db_connection = db_connection
+        self.chunk_size = chunk_size
+        self._cache: Dict[Any, Any] = {}
+        self._queue: Dict[Any, None] = {}
+        self.batches = 0
+
+    def load(self, user_id: Any) -> PendingUser:
+        """
+        Queue a lookup without querying yet
+
+        Raises:
+            ValueError: If user_id is not an integer or decimal string
+        """
+        user_id = as_user_id(user_id)
+        if user_id not in self._cache:
+            self._queue[user_id] = None
+        return PendingUser(self, user_id)
+
+    def get(self, user_id: Any):
+        """
+        The user row, or None; fetched now unless already cached
+
+        The fetch includes every id queued with load() so far, but ids
+        requested by later get() calls are not waited for.
+        """
+        return self.load(user_id).result()
+
+    def load_many(self, user_ids: Iterable[Any]) -> List[Optional[Any]]:
+        """Rows for user_ids in input order (None for unknown ids), in one batch"""
+        pending = [self.load(user_id) for user_id in user_ids]
+        return [p.result() for p in pending]
+
+    def prime(self, user_id: Any, row: Any) -> None:
+        """Seed the cache with a row obtained elsewhere"""
+        user_id = as_user_id(user_id)
+        self._cache[user_id] = row
+        self._queue.pop(user_id, None)
+
+    def clear(self, user_id: Any = None) -> None:
+        """Forget one cached user, or all of them"""
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(as_user_id(user_id), None)
+
+    def dispatch(self) -> None:
+        """Fetch every queued id now"""
+        if not self._queue:
+            return
+        user_ids = list(self._queue)
+        self._queue.clear()
+        rows = get_users_by_ids(self._db_connection, user_ids, self.chunk_size)
+        self._cache.update(zip(user_ids, rows))
+        self.batches += 1
+
+    def _resolve(self, user_id: Any):
+        if user_id not in self._cache:
+            self._queue[user_id] = None
+            self.dispatch()
+        return self._cache[user_id]
+
+
+def get_user_loader(db_connection) -> UserLoader:
+    """
+    The current request's UserLoader, created on first use
+
+    Stored on flask.g, so it is discarded with the request and cached
+    rows never leak into another request.
+    """
+    loader = g.get('user_loader')
+    if loader is None:
+        loader = g.user_loader = UserLoader(db_connection)
+    return loader
+
+
+def get_user_by_id_batched(db_connection, user_id):
+    """
+    get_user_by_id() through the request's UserLoader
+
+    Returns the row immediately, so on its own it saves only repeated
+    lookups of the same id. It coalesces with ids queued earlier via
+    load_user_by_id_batched(); queue all ids first to get one query.
+    """
+    return get_user_loader(db_connection).get(user_id)
+
+
+def load_user_by_id_batched(db_connection, user_id) -> PendingUser:
+    """
+    Queue a lookup on the request's UserLoader
+
+    Returns:
+        PendingUser; the first result() call fetches every id queued so
+        far in one query
+    """
+    return get_user_loader(db_connection).load(user_id)
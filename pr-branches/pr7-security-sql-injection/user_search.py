@@ -1,8 +1,37 @@
 """
 User search functionality with SQL queries
 """
+import operator
+from typing import Any, Callable, List, Optional
+
 from flask import request, jsonify
 
+# Called with no arguments after every write to the users table
+_write_hooks: List[Callable[[], None]] = []
+
+
+def register_write_hook(hook: Callable[[], None]) -> Callable[[], None]:
+    """
+    Run hook after each users-table write made through this module
+
+    Used by derived data such as search_cache.SearchResultCache to
+    invalidate itself. Returns hook so it can be used as a decorator.
+    """
+    _write_hooks.append(hook)
+    return hook
+
+
+def unregister_write_hook(hook: Callable[[], None]) -> None:
+    """Stop calling a hook added with register_write_hook()"""
+    if hook in _write_hooks:
+        _write_hooks.remove(hook)
+
+
+def users_changed() -> None:
+    """Run the write hooks; call after writing users outside this module"""
+    for hook in list(_write_hooks):
+        hook()
+
 
 def search_users(db_connection):
     """
@@ -71,21 +100,29 @@ def delete_user_by_email(db_connection, email):
     # SECURITY ISSUE: SQL Injection vulnerability
     query = f"DELETE FROM users WHERE email = '{email}'"
     
-    cursor = db_connection.cursor()
-    cursor.execute(query)
-    db_connection.commit()
+    try:
+        cursor = db_connection.cursor()
+        cursor.execute(query)
+        db_connection.commit()
+    finally:
+        users_changed()
     
     return cursor.rowcount
 
 
 # CORRECT APPROACH (for reference):
-def search_users_safe(db_connection):
+def build_search_query(name: str, email: str, limit: Optional[int] = None):
     """
-    Safe version using parameterized queries
+    Build the parameterized search query
+
+    Args:
+        name: Name substring ('' for no condition)
+        email: Email substring ('' for no condition)
+        limit: Optional row cap (never above 100 when there is no condition)
+
+    Returns:
+        (SQL with %s placeholders, parameters)
     """
-    name = request.args.get('name', '')
-    email = request.args.get('email', '')
-    
     params = []
     conditions = []
     
@@ -99,11 +136,137 @@ def search_users_safe(db_connection):
     
     if conditions:
         query = f"SELECT * FROM users WHERE {' AND '.join(conditions)}"
+        if limit is not None:
+            query += " LIMIT %s"
+            params.append(limit)
+    elif limit is not None and limit < 100:
+        query = "SELECT * FROM users LIMIT %s"
+        params.append(limit)
     else:
         query = "SELECT * FROM users LIMIT 100"
     
+    return query, params
+
+
+def search_users_safe(db_connection):
+    """
+    Safe version using parameterized queries
+    """
+    name = request.args.get('name', '')
+    email = request.args.get('email', '')
+    
+    query, params = build_search_query(name, email)
+    
     cursor = db_connection.cursor()
     cursor.execute(query, params)
     results = cursor.fetchall()
     
     return jsonify({'users': results, 'count': len(results)})
+
+
+def search_users_pooled(pool):
+    """
+    search_users_safe() on a connection borrowed from a ConnectionPool
+
+    Args:
+        pool: connection_pool.ConnectionPool
+    """
+    name = request.args.get('name', '')
+    email = request.args.get('email', '')
+    
+    query, params = build_search_query(name, email)
+    
+    with pool.connection() as conn:
+        results = conn.execute(query, params).fetchall()
+    
+    return jsonify({'users': results, 'count': len(results)})
+
+
+def get_user_by_id_pooled(pool, user_id):
+    """
+    Get user by ID through the pool's prepared-statement cache
+    
+    Args:
+        pool: connection_pool.ConnectionPool
+        user_id: User ID to fetch
+        
+    Returns:
+        User row or None
+    """
+    with pool.connection() as conn:
+        return conn.execute("SELECT * FROM users WHERE id = %s", (user_id,)).fetchone()
+
+
+def delete_user_by_email_pooled(pool, email):
+    """
+    Delete user by email address on a pooled connection
+    
+    Args:
+        pool: connection_pool.ConnectionPool
+        email: User email to delete
+        
+    Returns:
+        Number of deleted rows
+    """
+    try:
+        with pool.connection() as conn:
+            cursor = conn.execute("DELETE FROM users WHERE email = %s", (email,))
+            conn.commit()
+            return cursor.rowcount
+    finally:
+        users_changed()
+
+
+# Ids bound per IN (...) query; stays under SQLite's 999-variable and Oracle's 1000-item limits
+IN_CHUNK_SIZE = 500
+
+
+def as_user_id(user_id: Any) -> int:
+    """
+    A user id as the integer the users.id column holds
+
+    Accepts ints and decimal strings such as a route or query parameter
+    ('2'); anything else (floats, None, 'abc') raises ValueError rather
+    than silently matching no row.
+    """
+    try:
+        return int(user_id) if isinstance(user_id, str) else operator.index(user_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid user id: {user_id!r}") from e
+
+
+def get_users_by_ids(db_connection, user_ids, chunk_size: int = IN_CHUNK_SIZE):
+    """
+    Get many users in as few queries as possible
+
+    Duplicate ids are queried once and the ids are sent in chunks of
+    chunk_size per "WHERE id IN (...)" query, so rendering a list of N
+    rows costs ceil(unique / chunk_size) round trips instead of N.
+
+    Args:
+        db_connection: Database connection
+        user_ids: User IDs (ints or decimal strings), in the order the
+            caller wants them back
+        chunk_size: Maximum ids per query
+
+    Returns:
+        One entry per input id, in input order: the user row, or None
+        if there is no user with that id
+
+    Raises:
+        ValueError: If an id is not an integer or decimal string
+    """
+    user_ids = [as_user_id(user_id) for user_id in user_ids]
+    unique_ids = list(dict.fromkeys(user_ids))
+    found = {}
+
+    cursor = db_connection.cursor()
+    for start in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[start:start + chunk_size]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(f"SELECT * FROM users WHERE id IN ({placeholders})", chunk)
+        id_col = [d[0] for d in cursor.description].index('id')
+        for row in cursor.fetchall():
+            found[row['id'] if isinstance(row, dict) else row[id_col]] = row
+
+    return [found.get(user_id) for user_id in user_ids]
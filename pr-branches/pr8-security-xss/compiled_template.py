@@ -0,0 +1,276 @@
+"""
+Compiled HTML templates and a versioned page cache
+Static chunks are split once at import; each slot is escaped once per render with markupsafe.escape
+
+Usage:
+    cache = PageCache(max_size=1000)
+    return render_product_page_cached(product, cache, version=product['updated_at'])
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from flask import Response
+from markupsafe import escape
+
+DEFAULT_CACHE_SIZE = 1000
+
+# {{ name }} is escaped; {{ name|safe }} is inserted as is (pre-rendered HTML)
+_SLOT = re.compile(r'\{\{\s*(\w+)\s*(\|\s*safe\s*)?\}\}')
+
+
+class CompiledTemplate:
+    """
+    A template split into static chunks and slots
+
+    The source is parsed once. render() then only escapes the slot
+    values, each distinct slot once no matter how often it appears, and
+    joins them with the static chunks. Escaping is markupsafe.escape
+    itself, so output is byte-for-byte what escape() in an f-string
+    gives, including objects with __html__ (e.g. Markup) passing through.
+
+    Usage:
+        page = CompiledTemplate("<h1>{{ name }}</h1>{{ body|safe }}")
+        html = page.render(name=product['name'], body=reviews_html)
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._chunks: List[str] = []
+        self._slots: List[str] = []
+        raw: Dict[str, bool] = {}
+        position = 0
+        for match in _SLOT.finditer(source):
+            name, is_raw = match.group(1), bool(match.group(2))
+            if raw.setdefault(name, is_raw) != is_raw:
+                raise ValueError(f"Slot {name!r} is used both escaped and |safe")
+            self._chunks.append(source[position:match.start()])
+            self._slots.append(name)
+            position = match.end()
+        self._chunks.append(source[position:])
+
+        self.slots = tuple(raw)
+        self._safe = frozenset(name for name, is_raw in raw.items() if is_raw)
+
+    def render(self, **values: Any) -> str:
+        """
+        Fill the slots
+
+        Raises:
+            KeyError: If a slot has no value
+        """
+        filled = {
+            name: values[name] if name in self._safe else escape(values[name])
+            for name in self.slots
+        }
+        chunks = self._chunks
+        parts = [chunks[0]]
+        for name, chunk in zip(self._slots, chunks[1:]):
+            parts.append(str(filled[name]))
+            parts.append(chunk)
+        return ''.join(parts)
+
+
+# Same markup as render_product_page_safe()
+PRODUCT_PAGE = CompiledTemplate("""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>{{ name }}</title>
+    </head>
+    <body>
+        <h1>{{ name }}</h1>
+        <div class="description">
+            {{ description }}
+        </div>
+        <p class="price">${{ price }}</p>
+    </body>
+    </html>
+    """)
+
+# Same markup as render_product_page(), with every field escaped
+PRODUCT_PAGE_WITH_REVIEWS = CompiledTemplate("""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>{{ name }}</title>
+    </head>
+    <body>
+        <h1>{{ name }}</h1>
+        <div class="description">
+            {{ description }}
+        </div>
+        <p class="price">${{ price }}</p>
+        
+        <div class="reviews">
+            <h2>Customer Reviews</h2>
+            {{ reviews|safe }}
+        </div>
+    </body>
+    </html>
+    """)
+
+# Same markup as one review in render_reviews(), with every field escaped
+REVIEW = CompiledTemplate("""
+        <div class="review">
+            <h3>{{ title }}</h3>
+            <p class="author">By {{ author }}</p>
+            <div class="rating">Rating: {{ rating }}/5</div>
+            <div class="comment">{{ comment }}</div>
+        </div>
+        """)
+
+
+def render_reviews_compiled(reviews) -> str:
+    """render_reviews() markup with every review field escaped"""
+    if not reviews:
+        return "<p>No reviews yet</p>"
+    return "\n".join(
+        REVIEW.render(title=r['title'], author=r['author'], rating=r['rating'], comment=r['comment'])
+        for r in reviews
+    )
+
+
+def render_product_html(product: Dict, include_reviews: bool = False) -> str:
+    """
+    Product page HTML from the compiled templates
+
+    Args:
+        product: Product dictionary with name, description, price, reviews
+        include_reviews: Use the render_product_page() layout with reviews
+
+    Returns:
+        HTML string
+    """
+    if include_reviews:
+        return PRODUCT_PAGE_WITH_REVIEWS.render(
+            name=product['name'], description=product['description'], price=product['price'],
+            reviews=render_reviews_compiled(product.get('reviews', []))
+        )
+    return PRODUCT_PAGE.render(
+        name=product['name'], description=product['description'], price=product['price']
+    )
+
+
+class PageCache:
+    """
+    LRU cache of rendered pages keyed by (product id, version, layout)
+
+    Pages are stored as encoded bytes, so a hit is served without
+    rendering or encoding. Only the latest version of each product is
+    kept: storing a new version drops the old one in every layout. The
+    version must change whenever anything shown on the page changes
+    (price, reviews, ...); an updated_at timestamp or a row version
+    column both work. layout tells apart pages rendered differently from
+    the same product (e.g. with and without reviews).
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._pages: 'OrderedDict[Tuple[Hashable, Hashable, Hashable], bytes]' = OrderedDict()
+        self._versions: Dict[Hashable, Hashable] = {}
+        self._layouts: Dict[Hashable, Set[Hashable]] = {}
+        self._max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def get(self, product_id: Hashable, version: Hashable, layout: Hashable = None) -> Optional[bytes]:
+        """Cached page, or None"""
+        key = (product_id, version, layout)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, product_id: Hashable, version: Hashable, page: bytes, layout: Hashable = None) -> None:
+        """Store a page, replacing every page of another version of the same product"""
+        with self._lock:
+            old = self._versions.get(product_id)
+            if old is not None and old != version:
+                self._drop(product_id)
+            self._versions[product_id] = version
+            self._layouts.setdefault(product_id, set()).add(layout)
+            key = (product_id, version, layout)
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self._max_size:
+                (evicted_id, _, evicted_layout), _ = self._pages.popitem(last=False)
+                layouts = self._layouts[evicted_id]
+                layouts.discard(evicted_layout)
+                if not layouts:
+                    del self._layouts[evicted_id]
+                    del self._versions[evicted_id]
+
+    def discard(self, product_id: Hashable) -> None:
+        """Drop a product's pages (e.g. when it is deleted)"""
+        with self._lock:
+            self._drop(product_id)
+
+    def _drop(self, product_id: Hashable) -> None:
+        """Remove every layout of a product's cached version (caller holds the lock)"""
+        version = self._versions.pop(product_id, None)
+        for layout in self._layouts.pop(product_id, ()):
+            self._pages.pop((product_id, version, layout), None)
+
+    def clear(self) -> None:
+        """Empty the cache and reset the counters"""
+        with self._lock:
+            self._pages.clear()
+            self._versions.clear()
+            self._layouts.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with size, hits, misses and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._pages),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def render_product_page_cached(product: Dict, cache: PageCache, version: Hashable = None,
+                               include_reviews: bool = False):
+    """
+    render_product_page_safe() served from a PageCache
+
+    Args:
+        product: Product dictionary with id, name, description, price
+            (and reviews)
+        cache: Page cache shared by the app
+        version: Product version (default: product['version'] or
+            product['updated_at']); without one the page is rendered
+            but not cached
+        include_reviews: Use the layout with reviews; each layout is
+            cached separately
+
+    Returns:
+        HTML response with the same body as render_product_html()
+    """
+    if version is None:
+        version = product.get('version', product.get('updated_at'))
+    if version is None:
+        return Response(render_product_html(product, include_reviews), mimetype='text/html')
+
+    layout = 'reviews' if include_reviews else 'plain'
+    page = cache.get(product['id'], version, layout)
+    if page is None:
+        page = render_product_html(product, include_reviews).encode('utf-8')
+        cache.put(product['id'], version, page, layout)
+    return Response(page, mimetype='text/html')
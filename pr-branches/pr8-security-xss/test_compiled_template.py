@@ -0,0 +1,201 @@
+"""
+Tests for compiled templates and the versioned page cache
+"""
+import pytest
+from markupsafe import Markup, escape
+
+from compiled_template import (
+    PRODUCT_PAGE_WITH_REVIEWS, CompiledTemplate, PageCache, render_product_html, render_product_page_cached,
+)
+from product_display import render_product_page, render_product_page_safe
+
+
+class HtmlObject:
+    """Object providing its own HTML via __html__"""
+
+    def __html__(self):
+        return '<em>trusted</em>'
+
+
+HOSTILE_VALUES = [
+    '<script>alert(1)</script>',
+    '"double" & \'single\' <quotes>',
+    Markup('<b>already safe</b>'),
+    HtmlObject(),
+    19.99,
+    'Ünïcødé — ✓ &amp;',
+    '',
+]
+
+
+def make_product(value, **extra):
+    """Product with value in every displayed field"""
+    review = {'title': value, 'author': value, 'rating': value, 'comment': value}
+    return {'id': 1, 'name': value, 'description': value, 'price': value, 'reviews': [review, review], **extra}
+
+
+@pytest.mark.parametrize('value', HOSTILE_VALUES)
+def test_matches_render_product_page_safe(value):
+    """Test output is byte-for-byte render_product_page_safe()"""
+    product = make_product(value)
+    expected = render_product_page_safe(product).get_data()
+
+    assert render_product_html(product).encode('utf-8') == expected
+    assert render_product_page_cached(product, PageCache()).get_data() == expected
+    cached = render_product_page_cached(product, PageCache(), version=1)
+    assert cached.get_data() == expected
+    assert cached.mimetype == 'text/html'
+
+
+@pytest.mark.parametrize('value', HOSTILE_VALUES)
+def test_reviews_layout_matches_escaped_render_product_page(value):
+    """Test the reviews page equals render_product_page() fed escaped fields"""
+    product = make_product(value)
+    escaped = {
+        'name': escape(value), 'description': escape(value), 'price': escape(value),
+        'reviews': [{field: escape(v) for field, v in review.items()} for review in product['reviews']],
+    }
+
+    expected = render_product_page(escaped).get_data(as_text=True)
+
+    assert render_product_html(product, include_reviews=True) == expected
+    assert '<script>' not in render_product_html(product, include_reviews=True)
+
+
+def test_no_reviews():
+    """Test the empty-reviews placeholder"""
+    product = make_product('x', reviews=[])
+
+    assert render_product_html(product, include_reviews=True) == render_product_page(product).get_data(as_text=True)
+
+
+def test_template_slots():
+    """Test repeated slots, |safe slots and missing values"""
+    page = CompiledTemplate("<h1>{{ name }}</h1><p>{{name}}</p>{{ body | safe }}")
+
+    assert page.slots == ('name', 'body')
+    assert page.render(name='<i>', body='<br>') == '<h1>&lt;i&gt;</h1><p>&lt;i&gt;</p><br>'
+    with pytest.raises(KeyError):
+        page.render(name='x')
+
+
+def test_slot_both_escaped_and_safe_is_rejected():
+    """Test a slot may not be escaped in one place and raw in another"""
+    with pytest.raises(ValueError, match="'body'"):
+        CompiledTemplate("{{ body }}{{ body|safe }}")
+    with pytest.raises(ValueError):
+        CompiledTemplate(PRODUCT_PAGE_WITH_REVIEWS.source + "{{ reviews }}")
+
+
+def test_new_version_replaces_old_page():
+    """Test storing a new version drops the previous page of that product"""
+    cache = PageCache()
+    cache.put(1, 'v1', b'old')
+    cache.put(1, 'v2', b'new')
+
+    assert cache.get(1, 'v1') is None
+    assert cache.get(1, 'v2') == b'new'
+    assert len(cache) == 1
+    assert cache._versions == {1: 'v2'}
+
+
+def test_lru_eviction_keeps_versions_in_sync():
+    """Test evicted products also leave the version map"""
+    cache = PageCache(max_size=2)
+    cache.put(1, 'a', b'1')
+    cache.put(2, 'a', b'2')
+    cache.get(1, 'a')
+    cache.put(3, 'a', b'3')
+
+    assert cache.get(2, 'a') is None
+    assert set(cache._versions) == {1, 3}
+    assert set(cache._pages) == {(1, 'a', None), (3, 'a', None)}
+
+    cache.put(2, 'b', b'2b')
+    assert set(cache._versions) == {3, 2}
+    assert len(cache) == 2
+
+
+def test_layouts_are_cached_separately():
+    """Test each layout gets its own page and a new version replaces all of them"""
+    cache = PageCache()
+    product = make_product('<i>x</i>', version=1)
+
+    with_reviews = render_product_page_cached(product, cache, include_reviews=True)
+    plain = render_product_page_cached(product, cache)
+
+    assert with_reviews.get_data() == render_product_html(product, include_reviews=True).encode('utf-8')
+    assert plain.get_data() == render_product_page_safe(product).get_data()
+    assert render_product_page_cached(product, cache, include_reviews=True).get_data() == with_reviews.get_data()
+    assert render_product_page_cached(product, cache).get_data() == plain.get_data()
+    assert cache.stats()['hits'] == 2
+    assert len(cache) == 2
+
+    render_product_page_cached(make_product('y', version=2), cache)
+    assert set(cache._pages) == {(1, 2, 'plain')}
+    assert cache._layouts == {1: {'plain'}}
+    uncached = render_product_page_cached(make_product('y'), cache, include_reviews=True)
+    assert uncached.get_data() == render_product_html(make_product('y'), include_reviews=True).encode('utf-8')
+
+
+def test_eviction_and_discard_cover_every_layout():
+    """Test the version map outlives evictions while another layout is cached"""
+    cache = PageCache(max_size=2)
+    cache.put(1, 'a', b'plain', 'plain')
+    cache.put(1, 'a', b'reviews', 'reviews')
+    cache.put(2, 'a', b'2')
+
+    assert cache._versions == {1: 'a', 2: 'a'}
+    assert cache.get(1, 'a', 'reviews') == b'reviews'
+    cache.put(3, 'a', b'3')
+    assert cache._versions == {1: 'a', 3: 'a'}
+    assert cache._layouts == {1: {'reviews'}, 3: {None}}
+
+    cache.put(1, 'a', b'plain', 'plain')
+    cache.discard(1)
+    assert set(cache._pages) == {(3, 'a', None)}
+    assert cache._versions == {3: 'a'} and cache._layouts == {3: {None}}
+
+
+def test_discard_clear_and_stats():
+    """Test discard, clear and the hit counters"""
+    cache = PageCache()
+    cache.put(1, 'a', b'1')
+    cache.get(1, 'a')
+    cache.get(2, 'a')
+
+    assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+    cache.discard(1)
+    cache.discard(99)
+    assert len(cache) == 0
+    assert cache._versions == {}
+    cache.put(1, 'a', b'1')
+    cache.clear()
+    assert cache.stats() == {'size': 0, 'hits': 0, 'misses': 0, 'hit_rate': 0.0}
+
+
+def test_no_caching_without_version():
+    """Test products without a version are rendered every time and never stored"""
+    cache = PageCache()
+    product = make_product('x')
+
+    render_product_page_cached(product, cache)
+    render_product_page_cached(product, cache)
+
+    assert len(cache) == 0
+    assert cache.stats()['misses'] == 0
+
+
+def test_version_from_product_fields():
+    """Test version and updated_at are used when no version is passed"""
+    cache = PageCache()
+    render_product_page_cached(make_product('x', updated_at='t1'), cache)
+    render_product_page_cached(make_product('x', version=7, updated_at='t1'), cache)
+
+    assert cache._versions == {1: 7}
+
+    stale = render_product_page_cached(make_product('renamed', version=7), cache)
+    assert b'renamed' not in stale.get_data()
+    fresh = render_product_page_cached(make_product('renamed', version=8), cache)
+    assert b'renamed' in fresh.get_data()
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,240 @@
+"""
+API key registry with O(1) lookup and constant-time verification
+Keys are indexed by a non-secret key id; only keyed hashes are stored
+
+Usage:
+    registry = ApiKeyRegistry(pepper=os.environ['API_KEY_PEPPER'].encode())
+    api_key, record = registry.issue('billing-service')  # "ak_<key id>_<secret>"
+    record = registry.authenticate(api_key)              # O(1); None if invalid
+"""
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+# API key layout: "ak_<12 hex key id>_<secret>"
+KEY_PREFIX = 'ak_'
+KEY_ID_CHARS = 12
+SECRET_BYTES = 32
+
+
+class ApiKeyRecord(NamedTuple):
+    """Stored metadata for one API key (never the key itself)"""
+    key_id: str
+    key_hash: str
+    owner: str
+    created_at: float
+    expires_at: Optional[float] = None
+
+
+def parse_api_key(api_key: str) -> Optional[Tuple[str, str]]:
+    """
+    Split an API key into its key id and secret
+
+    Args:
+        api_key: Full API key string
+
+    Returns:
+        (key id, secret), or None if the key is malformed
+    """
+    id_end = len(KEY_PREFIX) + KEY_ID_CHARS
+    if (not isinstance(api_key, str) or not api_key.startswith(KEY_PREFIX)
+            or len(api_key) <= id_end + 1 or api_key[id_end] != '_'):
+        return None
+    return api_key[len(KEY_PREFIX):id_end], api_key[id_end + 1:]
+
+
+class ApiKeyRegistry:
+    """
+    In-memory API key index
+
+    Lookup goes straight to the record by key id, so authentication is
+    O(1) regardless of how many keys exist. The secret part is checked by
+    comparing an HMAC-SHA256 (keyed with a server-side pepper that is
+    never stored next to the hashes) with hmac.compare_digest.
+
+    The index can be bulk loaded from and saved to a JSON-lines snapshot,
+    so it is rebuilt in one pass at startup.
+    """
+
+    def __init__(self, pepper: bytes, clock=time.time):
+        if not pepper:
+            raise ValueError("A non-empty pepper is required")
+        self._pepper = pepper
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._records: Dict[str, ApiKeyRecord] = {}
+        # Compared against when the key id is unknown so timing stays uniform
+        self._dummy_hash = self.hash_secret('0' * KEY_ID_CHARS, secrets.token_urlsafe(SECRET_BYTES))
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def hash_secret(self, key_id: str, secret: str) -> str:
+        """
+        Compute the stored hash for a key
+
+        The key id is part of the MAC input, so a hash cannot be moved
+        to another key id.
+
+        Args:
+            key_id: Non-secret key id
+            secret: Secret part of the key
+
+        Returns:
+            Hex HMAC-SHA256
+        """
+        message = f"{key_id}:{secret}".encode()
+        return hmac.new(self._pepper, message, hashlib.sha256).hexdigest()
+
+    def issue(self, owner: str, expires_at: Optional[float] = None) -> Tuple[str, ApiKeyRecord]:
+        """
+        Create and register a new API key
+
+        Args:
+            owner: Service or user the key belongs to
+            expires_at: Optional expiry timestamp
+
+        Returns:
+            (full API key to hand out once, stored record)
+        """
+        secret = secrets.token_urlsafe(SECRET_BYTES)
+        with self._lock:
+            key_id = secrets.token_hex(KEY_ID_CHARS // 2)
+            while key_id in self._records:
+                key_id = secrets.token_hex(KEY_ID_CHARS // 2)
+            record = ApiKeyRecord(key_id, self.hash_secret(key_id, secret), owner,
+                                  self._clock(), expires_at)
+            self._records[key_id] = record
+        return f"{KEY_PREFIX}{key_id}_{secret}", record
+
+    def authenticate(self, api_key: str) -> Optional[ApiKeyRecord]:
+        """
+        Authenticate an API key
+
+        Args:
+            api_key: Full API key presented by the client
+
+        Returns:
+            The key's record, or None if the key is malformed, unknown,
+            wrong, revoked or expired
+        """
+        parsed = parse_api_key(api_key)
+        if parsed is None:
+            return None
+
+        key_id, secret = parsed
+        record = self._records.get(key_id)
+        expected = record.key_hash if record is not None else self._dummy_hash
+        matches = hmac.compare_digest(self.hash_secret(key_id, secret), expected)
+
+        if record is None or not matches:
+            return None
+        if record.expires_at is not None and record.expires_at <= self._clock():
+            return None
+        return record
+
+    def get(self, key_id: str) -> Optional[ApiKeyRecord]:
+        """Get a key's record by key id"""
+        return self._records.get(key_id)
+
+    def revoke(self, key_id: str) -> bool:
+        """
+        Remove a key immediately
+
+        Returns:
+            True if the key existed
+        """
+        with self._lock:
+            return self._records.pop(key_id, None) is not None
+
+    def rotate(self, key_id: str, grace_seconds: float = 0) -> Tuple[str, ApiKeyRecord]:
+        """
+        Replace a key with a new one for the same owner
+
+        The old key keeps working for grace_seconds so clients can switch
+        over, but never past the expiry it already had. The new key gets
+        the same lifetime the old one was issued with, counted from now
+        (no expiry if the old key had none).
+
+        Args:
+            key_id: Key to rotate
+            grace_seconds: How long the old key stays valid
+
+        Returns:
+            (new full API key, new record)
+
+        Raises:
+            KeyError: If key_id is not registered
+        """
+        now = self._clock()
+        with self._lock:
+            old = self._records[key_id]
+            if grace_seconds > 0:
+                grace_end = now + grace_seconds
+                if old.expires_at is not None:
+                    grace_end = min(grace_end, old.expires_at)
+                self._records[key_id] = old._replace(expires_at=grace_end)
+            else:
+                del self._records[key_id]
+
+        expires_at = None
+        if old.expires_at is not None:
+            expires_at = now + (old.expires_at - old.created_at)
+        return self.issue(old.owner, expires_at=expires_at)
+
+    def bulk_load(self, records: Iterable[ApiKeyRecord], replace: bool = True) -> int:
+        """
+        Load many records at once
+
+        The new index is built off to the side and swapped in, so
+        concurrent authentications never see a half-loaded registry.
+
+        Args:
+            records: Records to load
+            replace: Drop existing records first (default) or merge into them
+
+        Returns:
+            Number of records in the registry afterwards
+        """
+        index = {record.key_id: record for record in records}
+        with self._lock:
+            if not replace:
+                index = {**self._records, **index}
+            self._records = index
+            return len(index)
+
+    def save_snapshot(self, path: str) -> None:
+        """
+        Write all records to a JSON-lines snapshot (hashes only)
+
+        Written to a temporary file and renamed, so readers never see a
+        partial snapshot.
+
+        Args:
+            path: Snapshot file path
+        """
+        records = list(self._records.values())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record._asdict()) + '\n')
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str) -> int:
+        """
+        Rebuild the index from a snapshot written by save_snapshot
+
+        Args:
+            path: Snapshot file path
+
+        Returns:
+            Number of records loaded
+        """
+        with open(path, encoding='utf-8') as f:
+            records = [ApiKeyRecord(**json.loads(line)) for line in f if line.strip()]
+        return self.bulk_load(records)
@@ -0,0 +1,189 @@
+"""
+Tests for the API key registry
+"""
+import pytest
+from api_key_registry import KEY_PREFIX, ApiKeyRecord, ApiKeyRegistry, parse_api_key
+
+
+class FakeClock:
+    """Manually advanced clock for expiry tests"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Fake clock fixture"""
+    return FakeClock()
+
+
+@pytest.fixture
+def registry(clock):
+    """Empty registry on the fake clock"""
+    return ApiKeyRegistry(b'test-pepper', clock=clock)
+
+
+def test_authenticate_valid_key(registry):
+    """Test an issued key authenticates to its record"""
+    api_key, record = registry.issue('billing')
+
+    assert api_key.startswith(KEY_PREFIX)
+    assert registry.authenticate(api_key) == record
+    assert record.owner == 'billing'
+
+
+def test_authenticate_wrong_secret(registry):
+    """Test a known key id with the wrong secret is rejected"""
+    api_key, _ = registry.issue('billing')
+    key_id, secret = parse_api_key(api_key)
+
+    assert registry.authenticate(f"{KEY_PREFIX}{key_id}_{secret[:-1]}x") is None
+    assert registry.authenticate(f"{KEY_PREFIX}{key_id}_{secret}x") is None
+
+
+def test_authenticate_unknown_key(registry):
+    """Test a well-formed key that was never issued is rejected"""
+    registry.issue('billing')
+
+    assert registry.authenticate(f"{KEY_PREFIX}{'a' * 12}_secret") is None
+
+
+@pytest.mark.parametrize("api_key", [
+    '',
+    'ak_',
+    'ak_abc',
+    'ak_0123456789ab',
+    'ak_0123456789ab_',
+    'ak_0123456789abXsecret',
+    'xx_0123456789ab_secret',
+    None,
+    123,
+])
+def test_authenticate_malformed_key(registry, api_key):
+    """Test malformed keys are rejected without raising"""
+    assert registry.authenticate(api_key) is None
+
+
+def test_authenticate_expired_key(registry, clock):
+    """Test a key stops working at its expiry"""
+    api_key, _ = registry.issue('billing', expires_at=1100)
+
+    clock.now = 1099
+    assert registry.authenticate(api_key) is not None
+
+    clock.now = 1100
+    assert registry.authenticate(api_key) is None
+
+
+def test_revoke(registry):
+    """Test a revoked key no longer authenticates"""
+    api_key, record = registry.issue('billing')
+
+    assert registry.revoke(record.key_id) is True
+    assert registry.authenticate(api_key) is None
+    assert registry.revoke(record.key_id) is False
+
+
+def test_rotate_without_grace(registry):
+    """Test rotation without grace invalidates the old key at once"""
+    old_key, old = registry.issue('billing')
+
+    new_key, new = registry.rotate(old.key_id)
+
+    assert registry.authenticate(old_key) is None
+    assert registry.authenticate(new_key) == new
+    assert new.owner == 'billing'
+    assert new.expires_at is None
+    assert len(registry) == 1
+
+
+def test_rotate_with_grace(registry, clock):
+    """Test the old key works during the grace period only"""
+    old_key, old = registry.issue('billing')
+
+    new_key, _ = registry.rotate(old.key_id, grace_seconds=60)
+
+    clock.now += 59
+    assert registry.authenticate(old_key) is not None
+    assert registry.authenticate(new_key) is not None
+    clock.now += 1
+    assert registry.authenticate(old_key) is None
+    assert registry.authenticate(new_key) is not None
+
+
+def test_rotate_grace_never_extends_old_expiry(registry, clock):
+    """Test a grace period longer than the key's remaining life does not extend it"""
+    old_key, old = registry.issue('billing', expires_at=1010)
+
+    registry.rotate(old.key_id, grace_seconds=3600)
+
+    assert registry.get(old.key_id).expires_at == 1010
+    clock.now = 1500
+    assert registry.authenticate(old_key) is None
+
+
+def test_rotate_new_key_gets_full_lifetime(registry, clock):
+    """Test the replacement key is issued with the old key's lifetime from now"""
+    _, old = registry.issue('billing', expires_at=1000 + 3600)
+
+    clock.now = 4000
+    new_key, new = registry.rotate(old.key_id, grace_seconds=60)
+
+    assert new.expires_at == 4000 + 3600
+    clock.now = 4000 + 3599
+    assert registry.authenticate(new_key) == new
+
+
+def test_rotate_unknown_key(registry):
+    """Test rotating an unknown key id raises KeyError"""
+    with pytest.raises(KeyError):
+        registry.rotate('000000000000')
+
+
+def test_bulk_load_replace(registry):
+    """Test bulk_load replaces existing records by default"""
+    old_key, _ = registry.issue('old')
+    records = [ApiKeyRecord(f'{i:012x}', 'hash', 'svc', 0.0) for i in range(3)]
+
+    assert registry.bulk_load(records) == 3
+    assert registry.authenticate(old_key) is None
+    assert registry.get('000000000001').owner == 'svc'
+
+
+def test_bulk_load_merge(registry):
+    """Test bulk_load with replace=False keeps existing records"""
+    old_key, _ = registry.issue('old')
+    records = [ApiKeyRecord(f'{i:012x}', 'hash', 'svc', 0.0) for i in range(3)]
+
+    assert registry.bulk_load(records, replace=False) == 4
+    assert registry.authenticate(old_key) is not None
+
+
+def test_snapshot_round_trip(registry, clock, tmp_path):
+    """Test keys keep authenticating after a snapshot save and load"""
+    keys = [registry.issue(f'svc{i}', expires_at=None if i % 2 else 5000)[0] for i in range(5)]
+    path = str(tmp_path / 'keys.jsonl')
+
+    registry.save_snapshot(path)
+    restored = ApiKeyRegistry(b'test-pepper', clock=clock)
+
+    assert restored.load_snapshot(path) == 5
+    for api_key in keys:
+        assert restored.authenticate(api_key) == registry.authenticate(api_key)
+    assert 'test-pepper' not in (tmp_path / 'keys.jsonl').read_text()
+
+
+def test_snapshot_needs_same_pepper(registry, clock, tmp_path):
+    """Test a snapshot is useless without the pepper"""
+    api_key, _ = registry.issue('billing')
+    path = str(tmp_path / 'keys.jsonl')
+    registry.save_snapshot(path)
+
+    other = ApiKeyRegistry(b'other-pepper', clock=clock)
+    other.load_snapshot(path)
+
+    assert other.authenticate(api_key) is None
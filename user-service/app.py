@@ -2,29 +2,98 @@
 User Service - Flask Microservice
 Handles user management operations
 """
-from flask import Flask, request, jsonify
-from functools import wraps
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Flask, Response, g, request, jsonify
+from functools import lru_cache, wraps
 import os
+import secrets
+
+from hashing_pool import PasswordHashingPool, PoolSaturatedError
+from passwords import hash_password
+from session_tokens import SessionTokenSigner, parse_key_spec
+from token_auth import TokenVerifier
+from user_store import UserStore, DuplicateEmailError, StaleCursorError
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
 
 # In-memory user storage (for demo purposes)
-users_db = {}
-user_id_counter = 1
+user_store = UserStore()
+
+# Stateless signed bearer tokens, verified through an LRU+TTL cache.
+# SESSION_KEYS="kid:secret,..." lists signing keys, active key first;
+# older keys stay valid for verification during a rotation.
+session_keys = parse_key_spec(os.getenv('SESSION_KEYS', f"k1:{app.config['SECRET_KEY']}"))
+token_verifier = TokenVerifier(SessionTokenSigner(session_keys), user_exists=user_store.__contains__)
+
+# Password hashing runs in a bounded process pool; a full queue means 503
+hashing_pool = PasswordHashingPool()
+HASHING_TIMEOUT = 10
+
+# Pagination limits for GET /users
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 500
 
 
 def require_auth(f):
-    """Simple authentication decorator"""
+    """
+    Authentication decorator
+    
+    Verifies the Bearer token and stores the caller's id and token in
+    flask.g (g.user_id, g.token) for the wrapped route.
+    """
     @wraps(f)
     def decorated_function(*args, **kwargs):
         auth_header = request.headers.get('Authorization')
         if not auth_header or not auth_header.startswith('Bearer '):
             return jsonify({'error': 'Unauthorized'}), 401
+        
+        token = auth_header[len('Bearer '):]
+        user_id = token_verifier.verify(token)
+        if user_id is None:
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        g.user_id = user_id
+        g.token = token
         return f(*args, **kwargs)
     return decorated_function
 
 
+@app.errorhandler(PoolSaturatedError)
+def hashing_unavailable(error):
+    """
+    Shed load when the password hashing pool is saturated
+    
+    Clients should wait Retry-After before retrying: each rejected
+    login is still a full request competing with other endpoints.
+    """
+    response = jsonify({'error': 'Service busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+def _wait_for_hashing(future):
+    """
+    Wait for a hashing job, treating a timeout like a saturated pool
+    
+    Raises:
+        PoolSaturatedError: If the job does not finish in HASHING_TIMEOUT
+    """
+    try:
+        return future.result(timeout=HASHING_TIMEOUT)
+    except FutureTimeoutError:
+        # Not the builtin TimeoutError before Python 3.11
+        future.cancel()
+        raise PoolSaturatedError("Password hashing timed out")
+
+
+@lru_cache(maxsize=1)
+def _dummy_password_hash():
+    """Hash verified for unknown emails so they take as long as known ones"""
+    return hash_password(secrets.token_urlsafe(), hashing_pool.params)
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -36,27 +105,43 @@ def login():
     """
     User login endpoint
     Returns authentication token on success
+    
+    Returns:
+        200: Token and user
+        400: Missing email or password
+        401: Invalid credentials
+        503: Password hashing pool saturated (retry later)
     """
     data = request.get_json()
     
-    if not data or 'email' not in data or 'password' not in data:
+    if not isinstance(data, dict) or not data.get('email') or not data.get('password'):
         return jsonify({'error': 'Email and password required'}), 400
     
+    if not isinstance(data['email'], str):
+        return jsonify({'error': 'Email must be a string'}), 400
+    
+    # Checked before submitting: workers call password.encode()
+    if not isinstance(data['password'], str):
+        return jsonify({'error': 'Password must be a string'}), 400
+    
     email = data['email']
     password = data['password']
     
-    # Find user by email
-    user = None
-    for uid, u in users_db.items():
-        if u['email'] == email:
-            user = u
-            break
+    # Find user by email (O(1) index lookup)
+    user = user_store.get_by_email(email)
+    
+    # Verify off-thread; unknown emails still pay for one verification
+    stored_hash = user['password'] if user else _dummy_password_hash()
+    valid, new_hash = _wait_for_hashing(hashing_pool.verify_and_update_async(password, stored_hash))
     
-    if not user or user['password'] != password:
+    if not user or not valid:
         return jsonify({'error': 'Invalid credentials'}), 401
     
-    # Generate simple token (in production, use JWT)
-    token = f"token_{user['id']}_{user['email']}"
+    # Transparently upgrade hashes made with outdated cost parameters
+    if new_hash is not None:
+        user_store.update(user['id'], password=new_hash)
+    
+    token = token_verifier.issue(user['id'])
     
     return jsonify({
         'token': token,
@@ -68,40 +153,288 @@ def login():
     }), 200
 
 
+@app.route('/auth/logout', methods=['POST'])
+@require_auth
+def logout():
+    """
+    Revoke the caller's token
+    
+    Returns:
+        200: Token revoked
+        401: Missing or invalid token
+    """
+    token_verifier.revoke(g.token)
+    return jsonify({'message': 'Logged out'}), 200
+
+
+@app.route('/users', methods=['POST'])
+@require_auth
+def create_user():
+    """
+    Create a new user
+    
+    Request JSON:
+        - email: User email (required)
+        - password: User password (required)
+        - name: User full name (required)
+    
+    Returns:
+        201: User created successfully
+        400: Invalid input
+        409: User already exists
+        503: Password hashing pool saturated (retry later)
+    """
+    data = request.get_json()
+    
+    # Validate required fields
+    if not isinstance(data, dict) or not data:
+        return jsonify({'error': 'Request body required'}), 400
+    
+    if 'email' not in data or not data['email']:
+        return jsonify({'error': 'Email is required'}), 400
+    
+    if 'password' not in data or not data['password']:
+        return jsonify({'error': 'Password is required'}), 400
+    
+    if 'name' not in data or not data['name']:
+        return jsonify({'error': 'Name is required'}), 400
+    
+    for field in ('email', 'password', 'name'):
+        if not isinstance(data[field], str):
+            return jsonify({'error': f'{field.capitalize()} must be a string'}), 400
+    
+    email = data['email'].strip()
+    password = data['password']
+    name = data['name'].strip()
+    
+    # Validate email format (basic validation)
+    if '@' not in email or '.' not in email:
+        return jsonify({'error': 'Invalid email format'}), 400
+    
+    # Cheap early exit before paying for the hash
+    if user_store.get_by_email(email) is not None:
+        return jsonify({'error': 'User with this email already exists'}), 409
+    
+    password_hash = _wait_for_hashing(hashing_pool.hash_async(password))
+    
+    # Duplicate check happens atomically against the email index
+    try:
+        new_user = user_store.create(email=email, password=password_hash, name=name)
+    except DuplicateEmailError:
+        return jsonify({'error': 'User with this email already exists'}), 409
+    
+    # Return user without password
+    user_response = {
+        'id': new_user['id'],
+        'email': new_user['email'],
+        'name': new_user['name']
+    }
+    
+    return jsonify(user_response), 201
+
+
+@app.route('/users/changes', methods=['GET'])
+@require_auth
+def list_user_changes():
+    """
+    Incremental change feed for mirroring the user list
+    
+    Query parameters:
+        - since: Last sequence number already applied (default 0)
+        - limit: Maximum number of changes (1-1000, default 100)
+    
+    Only the latest change per user is returned: apply 'create' and
+    'update' as upserts of the embedded user, and 'delete' as a removal.
+    Keep calling with since=next_since until count is 0.
+    
+    Resync: a new mirror, one that got 410 (its cursor is older than the
+    capped change log), or one that sees the epoch change, replaces its
+    copy with GET /users (the export, or a full limit/after walk) and
+    resumes here from that response's next_since (the first page's, for
+    a walk). Writes racing with the snapshot come after next_since, so
+    replaying them as above converges. A fresh mirror should start from
+    GET /users rather than since=0, which is stale as soon as the log
+    has been capped.
+    
+    Returns:
+        200: {'changes': [...], 'count': n, 'next_since': seq, 'epoch': str}
+        400: Invalid since or limit parameter
+        410: Changes after since were compacted; resync from GET /users
+            and resume from its next_since
+    """
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    
+    if since < 0:
+        return jsonify({'error': 'since must be a non-negative integer'}), 400
+    
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+    
+    try:
+        changes, next_since = user_store.changes_since(since, limit)
+    except StaleCursorError:
+        return jsonify({'error': 'Change history no longer available, resync from /users'}), 410
+    
+    fragments = [
+        b'{"seq":%d,"op":"%s","id":%d,"user":%s}' % (seq, op.encode(), user_id, body or b'null')
+        for seq, op, user_id, body in changes
+    ]
+    body = (b'{"changes":[' + b','.join(fragments) +
+            b'],"count":%d,"next_since":%d,"epoch":"%s"}'
+            % (len(changes), next_since, user_store.epoch.encode()))
+    
+    return Response(body, mimetype='application/json'), 200
+
+
 @app.route('/users/<int:user_id>', methods=['GET'])
 @require_auth
 def get_user(user_id):
-    """Get user by ID"""
-    user = users_db.get(user_id)
+    """
+    Get user by ID
+    
+    Supports conditional requests: the response carries a strong ETag
+    derived from the record version, and a matching If-None-Match
+    header is answered with 304 and no body.
     
-    if not user:
+    Returns:
+        200: User (without password)
+        304: Client copy is current
+        404: User not found
+    """
+    # Pre-encoded public projection (no password), rebuilt on every write
+    entry = user_store.versioned_public_json(user_id)
+    
+    if entry is None:
         return jsonify({'error': 'User not found'}), 404
     
-    # Don't return password
-    user_data = {k: v for k, v in user.items() if k != 'password'}
+    version, body = entry
+    etag = f'{user_store.epoch}-u{user_id}-v{version}'
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
     
-    return jsonify(user_data), 200
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response, 200
 
 
 @app.route('/users', methods=['GET'])
 @require_auth
 def list_users():
-    """List all users"""
-    users = []
-    for user in users_db.values():
-        user_data = {k: v for k, v in user.items() if k != 'password'}
-        users.append(user_data)
+    """
+    List users
+    
+    Query parameters:
+        - limit: Page size (1-1000, default 100); enables keyset pagination
+        - after: Return users with an id greater than this (keyset cursor)
+    
+    Without limit/after the full list is exported as a streamed JSON
+    array, built chunk by chunk so memory stays constant.
+    
+    Responses carry a strong ETag derived from the collection version;
+    a matching If-None-Match header is answered with 304 and no body.
     
-    return jsonify({'users': users, 'count': len(users)}), 200
+    Every response also carries 'next_since' and 'epoch', the change
+    feed cursor for resuming a mirror built from this snapshot (see
+    GET /users/changes).
+    
+    Returns:
+        200: {'users': [...], 'count': n, 'next_since': seq, 'epoch': str}
+             plus 'next_after' when paginated
+        304: Client copy is current
+        400: Invalid limit or after parameter
+    """
+    # Read the version before the records: a write racing with this
+    # request can only make the body newer than its ETag and next_since,
+    # never older
+    epoch, version = user_store.sync_point()
+    etag = f'{epoch}-c{version}'
+    
+    if 'limit' not in request.args and 'after' not in request.args:
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+        response = Response(_export_users(epoch, version), mimetype='application/json')
+        response.set_etag(etag)
+        return response
+    
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({'error': 'limit and after must be integers'}), 400
+    
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+    
+    if after < 0:
+        return jsonify({'error': 'after must be a non-negative integer'}), 400
+    
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    
+    # Fetch one extra row to know whether another page exists
+    page = user_store.public_json_page(after=after, limit=limit + 1)
+    has_more = len(page) > limit
+    page = page[:limit]
+    
+    next_after = b'%d' % page[-1][0] if has_more else b'null'
+    body = (b'{"users":[' + b','.join(fragment for _, fragment in page) +
+            b'],"count":%d,"next_after":%s,"next_since":%d,"epoch":"%s"}'
+            % (len(page), next_after, version, epoch.encode()))
+    
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response, 200
+
+
+@app.route('/users/<int:user_id>', methods=['DELETE'])
+@require_auth
+def delete_user(user_id):
+    """
+    Delete the caller's own account and revoke all of its tokens
+    
+    Returns:
+        200: User deleted
+        403: Attempt to delete another user
+        404: User not found
+    """
+    if user_id != g.user_id:
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if user_store.delete(user_id) is None:
+        return jsonify({'error': 'User not found'}), 404
+    
+    token_verifier.revoke_user(user_id)
+    return jsonify({'message': 'User deleted'}), 200
+
+
+def _not_modified(etag):
+    """Build an empty 304 response carrying the current ETag"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+
+def _export_users(epoch, version):
+    """Yield the full user list as JSON by joining cached fragments chunk by chunk"""
+    yield b'{"users":['
+    count = 0
+    for chunk in user_store.iter_public_json_chunks(EXPORT_CHUNK_SIZE):
+        body = b','.join(chunk)
+        yield body if count == 0 else b',' + body
+        count += len(chunk)
+    yield b'],"count":%d,"next_since":%d,"epoch":"%s"}' % (count, version, epoch.encode())
 
 
 if __name__ == '__main__':
     # Add sample user for testing
-    users_db[1] = {
-        'id': 1,
-        'email': 'test@example.com',
-        'password': 'password123',
-        'name': 'Test User'
-    }
+    user_store.create(
+        email='test@example.com',
+        password=hash_password('password123'),
+        name='Test User'
+    )
     
     app.run(debug=True, port=5000)
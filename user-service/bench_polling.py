@@ -0,0 +1,64 @@
+"""
+Conditional GET polling benchmark
+Compares CPU time and bytes per poll with and without If-None-Match
+
+Usage:
+    python bench_polling.py [--users 10000] [--polls 500]
+"""
+import argparse
+import time
+
+from app import app, token_verifier, user_store
+
+
+def populate(count):
+    """Fill the store with count synthetic users"""
+    user_store.clear()
+    for i in range(count):
+        user_store.create(
+            email=f'user{i}@example.com',
+            password=f'password{i}',
+            name=f'User {i}'
+        )
+
+
+def poll(client, url, polls, conditional):
+    """Poll url repeatedly and return (CPU microseconds, bytes) per poll"""
+    auth_headers = {'Authorization': f'Bearer {token_verifier.issue(1)}'}
+    etag = client.get(url, headers=auth_headers).headers['ETag']
+    headers = dict(auth_headers, **({'If-None-Match': etag} if conditional else {}))
+    expected = 304 if conditional else 200
+    transferred = 0
+
+    start = time.process_time()
+    for _ in range(polls):
+        response = client.get(url, headers=headers)
+        transferred += len(response.get_data())
+        assert response.status_code == expected
+    elapsed = time.process_time() - start
+
+    return elapsed / polls * 1e6, transferred / polls
+
+
+def main():
+    """Run unconditional and conditional polls against each read endpoint"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--polls', type=int, default=500)
+    args = parser.parse_args()
+
+    app.config['TESTING'] = True
+    populate(args.users)
+
+    print(f"{'endpoint':<22} {'mode':<12} {'cpu/poll (us)':>14} {'bytes/poll':>12}")
+    with app.test_client() as client:
+        for url in ('/users/1', '/users?limit=100', '/users'):
+            for conditional in (False, True):
+                cpu, size = poll(client, url, args.polls, conditional)
+                mode = 'If-None-Match' if conditional else 'full'
+                print(f"{url:<22} {mode:<12} {cpu:>14.1f} {size:>12.0f}")
+    user_store.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Session token micro-benchmark
+Measures issue and verify throughput of stateless HMAC session tokens
+
+Usage:
+    python bench_session_tokens.py [--iterations 200000]
+"""
+import argparse
+import time
+
+from session_tokens import SessionTokenSigner
+from token_auth import TokenVerifier
+
+
+def throughput(fn, args, iterations):
+    """Call fn over args cyclically and return calls per second"""
+    count = len(args)
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(args[i % count])
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    """Benchmark issue, stateless verify and cached verify"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    signer = SessionTokenSigner({'k2': b'new-secret', 'k1': b'old-secret'})
+    tokens = [signer.issue(user_id) for user_id in range(1000)]
+    verifier = TokenVerifier(signer, user_exists=lambda user_id: True)
+
+    results = [
+        ('issue', throughput(signer.issue, list(range(1000)), args.iterations)),
+        ('verify (stateless)', throughput(signer.decode, tokens, args.iterations)),
+        ('verify (cached)', throughput(verifier.verify, tokens, args.iterations)),
+    ]
+
+    print(f"{'operation':<20} {'ops/s':>12} {'us/op':>8}")
+    for name, ops in results:
+        print(f"{name:<20} {ops:>12,.0f} {1e6 / ops:>8.2f}")
+    print(f"token length: {len(tokens[0])} chars")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Off-thread password hashing
+Runs slow KDF work in a process pool with a bounded queue and backpressure
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+import passwords
+
+# Pending jobs allowed per worker before new requests are rejected
+QUEUE_FACTOR = 4
+
+# CPUs left to request threads when sizing the pool from the CPU count
+RESERVED_CPUS = 1
+
+# Niceness added to worker processes so request threads win the CPU under load
+WORKER_NICE = 10
+
+WORKERS_ENV_VAR = 'PASSWORD_HASH_WORKERS'
+NICE_ENV_VAR = 'PASSWORD_HASH_NICE'
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on (respects affinity/cgroup cpusets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configured_workers() -> int:
+    """
+    Get the default worker count
+
+    Returns:
+        PASSWORD_HASH_WORKERS if set, else the available CPUs minus
+        RESERVED_CPUS (at least 1)
+
+    Raises:
+        ValueError: If PASSWORD_HASH_WORKERS is not a positive integer
+    """
+    spec = os.getenv(WORKERS_ENV_VAR)
+    if spec:
+        workers = int(spec)
+        if workers < 1:
+            raise ValueError(f"Invalid {WORKERS_ENV_VAR}: {spec!r}")
+        return workers
+    return max(1, available_cpus() - RESERVED_CPUS)
+
+
+def configured_nice() -> int:
+    """
+    Get the niceness increment for worker processes
+
+    Returns:
+        PASSWORD_HASH_NICE if set, else WORKER_NICE (0 disables it)
+    """
+    spec = os.getenv(NICE_ENV_VAR)
+    return int(spec) if spec else WORKER_NICE
+
+
+def _lower_priority(increment: int) -> None:
+    """Worker initializer: deprioritise KDF work behind request handling"""
+    if increment and hasattr(os, 'nice'):
+        try:
+            os.nice(increment)
+        except OSError:
+            pass
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when the hashing queue is full; callers should answer 503"""
+
+
+class PasswordHashingPool:
+    """
+    Bounded executor for password hashing and verification
+
+    Hashing runs in worker processes, so request threads only wait on a
+    future while the rest of the worker keeps serving other endpoints.
+    The pool leaves RESERVED_CPUS cores to request handling and runs its
+    workers at a lower priority (nice), so a saturated pool cannot starve
+    non-auth endpoints even on a single core. At most max_pending jobs
+    may be queued or running; beyond that submissions fail fast with
+    PoolSaturatedError instead of piling up latency.
+
+    New hashes use params, which are sent with each job so workers never
+    depend on their own configuration.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 executor_factory: Optional[Callable[[int], Executor]] = None,
+                 params: Optional[passwords.KdfParams] = None, nice: Optional[int] = None):
+        self.params = params or passwords.configured_params()
+        self.max_workers = max_workers or configured_workers()
+        self.nice = configured_nice() if nice is None else nice
+        self.max_pending = max_pending or self.max_workers * QUEUE_FACTOR
+        self._executor_factory = executor_factory or self._default_executor
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.rejected = 0
+
+    def hash_async(self, password: str) -> 'Future[str]':
+        """
+        Schedule hashing of a password
+
+        Args:
+            password: Plain text password
+
+        Returns:
+            Future resolving to the encoded hash
+
+        Raises:
+            PoolSaturatedError: If max_pending jobs are already in flight
+        """
+        return self._submit(passwords.hash_password, password, self.params)
+
+    def verify_async(self, password: str, hashed_password: str) -> 'Future[bool]':
+        """
+        Schedule verification of a password against a stored hash
+
+        Args:
+            password: Plain text password
+            hashed_password: Encoded hash
+
+        Returns:
+            Future resolving to True if the password matches
+
+        Raises:
+            PoolSaturatedError: If max_pending jobs are already in flight
+        """
+        return self._submit(passwords.verify_password, password, hashed_password)
+
+    def verify_and_update_async(self, password: str,
+                                hashed_password: str) -> 'Future[Tuple[bool, Optional[str]]]':
+        """
+        Schedule verification, re-hashing with current params if outdated
+
+        Args:
+            password: Plain text password
+            hashed_password: Encoded hash
+
+        Returns:
+            Future resolving to (matches, new hash to store or None)
+
+        Raises:
+            PoolSaturatedError: If max_pending jobs are already in flight
+        """
+        return self._submit(passwords.verify_and_update, password, hashed_password, self.params)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes; the pool restarts lazily on next use"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _submit(self, fn, *args) -> Future:
+        """Submit a job if a queue slot is free"""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PoolSaturatedError("Password hashing queue is full")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _get_executor(self) -> Executor:
+        """Create the executor on first use"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = self._executor_factory(self.max_workers)
+        return self._executor
+
+    def _default_executor(self, max_workers: int) -> Executor:
+        """Low-priority process pool using spawn, which is safe to start from a threaded server"""
+        return ProcessPoolExecutor(max_workers=max_workers,
+                                   mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_lower_priority, initargs=(self.nice,))
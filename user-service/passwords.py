@@ -0,0 +1,253 @@
+"""
+Password hashing utilities
+Self-describing scrypt/PBKDF2 hashes with host-calibrated cost parameters
+
+Stored hashes look like "<algorithm>$<cost...>$<salt>$<key>", e.g.
+"scrypt$16384$8$1$<salt>$<key>" or "pbkdf2_sha256$600000$<salt>$<key>",
+so every hash carries the parameters needed to verify it.
+
+Usage (calibrate for this host):
+    python passwords.py --algorithm scrypt --target-ms 50
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import statistics
+import time
+from typing import NamedTuple, Optional, Tuple
+
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Cost parameters per algorithm: scrypt (n, r, p), pbkdf2_sha256 (iterations,)
+COST_FIELDS = {
+    'scrypt': 3,
+    'pbkdf2_sha256': 1,
+}
+
+# Environment variable holding the parameters for new hashes,
+# in the same "<algorithm>$<cost...>" form as a stored hash prefix
+PARAMS_ENV_VAR = 'PASSWORD_HASH_PARAMS'
+
+
+class KdfParams(NamedTuple):
+    """Algorithm and cost parameters of a password hash"""
+    algorithm: str
+    cost: Tuple[int, ...]
+
+    def encode(self) -> str:
+        """Encode as the "<algorithm>$<cost...>" hash prefix"""
+        return '$'.join([self.algorithm, *map(str, self.cost)])
+
+    @classmethod
+    def decode(cls, spec: str) -> 'KdfParams':
+        """
+        Parse a "<algorithm>$<cost...>" string
+
+        Raises:
+            ValueError: If the algorithm is unknown or the cost is invalid
+        """
+        algorithm, *cost = spec.split('$')
+        if COST_FIELDS.get(algorithm) != len(cost):
+            raise ValueError(f"Invalid password hash parameters: {spec!r}")
+        params = cls(algorithm, tuple(int(c) for c in cost))
+        if algorithm == 'scrypt':
+            n, r, p = params.cost
+            if n < 2 or n & (n - 1) or r < 1 or p < 1:
+                raise ValueError(f"Invalid scrypt parameters: {spec!r}")
+        elif params.cost[0] < 1:
+            raise ValueError(f"Invalid PBKDF2 iteration count: {spec!r}")
+        return params
+
+
+# Used when PASSWORD_HASH_PARAMS is not set (16 MiB, ~50 ms on a typical core)
+DEFAULT_PARAMS = KdfParams('scrypt', (2 ** 14, 8, 1))
+
+
+def configured_params() -> KdfParams:
+    """
+    Get the parameters for new hashes
+
+    Returns:
+        Parameters from PASSWORD_HASH_PARAMS, or DEFAULT_PARAMS
+    """
+    spec = os.getenv(PARAMS_ENV_VAR)
+    return KdfParams.decode(spec) if spec else DEFAULT_PARAMS
+
+
+def _b64encode(data: bytes) -> str:
+    """Standard base64 without padding"""
+    return base64.b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    """Inverse of _b64encode"""
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+
+def _derive(password: str, salt: bytes, params: KdfParams) -> bytes:
+    """Derive the key for a password with the given parameters"""
+    if params.algorithm == 'scrypt':
+        n, r, p = params.cost
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p,
+            maxmem=128 * n * r * p + 1024 * 1024, dklen=KEY_BYTES
+        )
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params.cost[0], dklen=KEY_BYTES)
+
+
+def hash_password(password: str, params: Optional[KdfParams] = None) -> str:
+    """
+    Hash a password for storage
+
+    CPU- and memory-heavy by design; call through PasswordHashingPool
+    from request handlers.
+
+    Args:
+        password: Plain text password
+        params: Cost parameters (default: configured_params())
+
+    Returns:
+        Self-describing hash "<algorithm>$<cost...>$<salt>$<key>"
+    """
+    params = params or configured_params()
+    salt = os.urandom(SALT_BYTES)
+    key = _derive(password, salt, params)
+    return f"{params.encode()}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against a stored hash
+
+    Args:
+        password: Plain text password to verify
+        hashed_password: Hash produced by hash_password, with any parameters
+
+    Returns:
+        True if password matches, False otherwise (including malformed hashes)
+    """
+    try:
+        spec, salt, key = hashed_password.rsplit('$', 2)
+        params = KdfParams.decode(spec)
+        expected = _b64decode(key)
+        actual = _derive(password, _b64decode(salt), params)
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(hashed_password: str, params: Optional[KdfParams] = None) -> bool:
+    """
+    Check whether a stored hash uses outdated parameters
+
+    Args:
+        hashed_password: Stored hash
+        params: Current parameters (default: configured_params())
+
+    Returns:
+        True if the hash was not made with exactly these parameters
+    """
+    params = params or configured_params()
+    return not hashed_password.startswith(params.encode() + '$')
+
+
+def verify_and_update(password: str, hashed_password: str,
+                      params: Optional[KdfParams] = None) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and re-hash it if its parameters are outdated
+
+    Args:
+        password: Plain text password to verify
+        hashed_password: Stored hash
+        params: Current parameters (default: configured_params())
+
+    Returns:
+        (matches, new hash to store or None)
+    """
+    params = params or configured_params()
+    if not verify_password(password, hashed_password):
+        return False, None
+    if needs_rehash(hashed_password, params):
+        return True, hash_password(password, params)
+    return True, None
+
+
+def time_params(params: KdfParams, rounds: int = 3) -> float:
+    """
+    Measure the median time of one hash with the given parameters
+
+    Returns:
+        Seconds per hash
+    """
+    salt = os.urandom(SALT_BYTES)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _derive('calibration-password', salt, params)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def calibrate(algorithm: str = 'scrypt', target_ms: float = 50,
+              max_memory_mb: int = 64, rounds: int = 3) -> Tuple[KdfParams, float]:
+    """
+    Pick cost parameters that take about target_ms on this host
+
+    scrypt keeps r=8, p=1 and doubles N while a hash stays within the
+    target (and memory within max_memory_mb). PBKDF2 scales the
+    iteration count linearly from a probe measurement.
+
+    Args:
+        algorithm: 'scrypt' or 'pbkdf2_sha256'
+        target_ms: Latency budget for one hash, in milliseconds
+        max_memory_mb: Upper bound on scrypt memory per hash
+        rounds: Timing samples per candidate
+
+    Returns:
+        (chosen parameters, measured milliseconds per hash)
+    """
+    target = target_ms / 1000.0
+
+    if algorithm == 'scrypt':
+        r, p = 8, 1
+        best = KdfParams('scrypt', (2 ** 10, r, p))
+        best_time = time_params(best, rounds)
+        n = 2 ** 11
+        while 128 * n * r <= max_memory_mb * 1024 * 1024:
+            candidate = KdfParams('scrypt', (n, r, p))
+            elapsed = time_params(candidate, rounds)
+            if elapsed > target:
+                break
+            best, best_time = candidate, elapsed
+            n *= 2
+        return best, best_time * 1000
+
+    if algorithm == 'pbkdf2_sha256':
+        probe = KdfParams(algorithm, (100000,))
+        per_iteration = time_params(probe, rounds) / 100000
+        iterations = max(1000, int(target / per_iteration) // 1000 * 1000)
+        params = KdfParams(algorithm, (iterations,))
+        return params, time_params(params, rounds) * 1000
+
+    raise ValueError(f"Unsupported algorithm: {algorithm}")
+
+
+def main():
+    """Calibrate parameters for this host and print the setting to deploy"""
+    parser = argparse.ArgumentParser(description='Calibrate password hashing cost for this host')
+    parser.add_argument('--algorithm', choices=sorted(COST_FIELDS), default='scrypt')
+    parser.add_argument('--target-ms', type=float, default=50)
+    parser.add_argument('--max-memory-mb', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    params, elapsed_ms = calibrate(args.algorithm, args.target_ms, args.max_memory_mb, args.rounds)
+    print(f"# {elapsed_ms:.1f} ms per hash (target {args.target_ms:g} ms)")
+    print(f"{PARAMS_ENV_VAR}='{params.encode()}'")
+
+
+if __name__ == '__main__':
+    main()
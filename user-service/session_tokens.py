@@ -0,0 +1,178 @@
+"""
+Stateless HMAC session tokens
+Compact, self-verifying tokens carrying user id, expiry and key id
+"""
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+# Default token lifetime in seconds
+TOKEN_MAX_AGE = 24 * 60 * 60
+
+# Truncated HMAC-SHA256 tag length (128 bits)
+TAG_BYTES = 16
+
+# user id (uint64), expiry (uint32 unix seconds), nonce (4 random bytes)
+_PAYLOAD = struct.Struct('>QI4s')
+
+
+class SessionClaims(NamedTuple):
+    """Claims carried by a verified session token"""
+    user_id: int
+    expires_at: int
+    kid: str
+
+
+def _b64encode(data: bytes) -> str:
+    """URL-safe base64 without padding"""
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    """Inverse of _b64encode"""
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def parse_key_spec(spec: str) -> Dict[str, bytes]:
+    """
+    Parse a signing key specification
+
+    Args:
+        spec: Comma-separated "kid:secret" pairs, active key first,
+            e.g. "k2:new-secret,k1:old-secret"
+
+    Returns:
+        Ordered mapping of key id to secret bytes
+
+    Raises:
+        ValueError: If an entry is malformed or a key id repeats
+    """
+    keys = {}
+    for entry in spec.split(','):
+        kid, sep, secret = entry.strip().partition(':')
+        if not sep or not kid or not secret or '.' in kid:
+            raise ValueError(f"Invalid signing key entry: {entry!r}")
+        if kid in keys:
+            raise ValueError(f"Duplicate signing key id: {kid}")
+        keys[kid] = secret.encode()
+    return keys
+
+
+class SessionTokenSigner:
+    """
+    Issues and verifies stateless session tokens
+
+    Token format: "<kid>.<payload>.<tag>" where payload is the base64url
+    packing of (user id, expiry, nonce) and tag is a truncated
+    HMAC-SHA256 over "<kid>.<payload>" with the key named by kid.
+
+    Any worker holding the key set can verify a token without a session
+    store. To rotate, add a new key as active and keep the old one for
+    verification until its last tokens have expired, then retire it.
+    """
+
+    def __init__(self, keys: Dict[str, bytes], active_kid: Optional[str] = None,
+                 max_age: int = TOKEN_MAX_AGE, clock: Callable[[], float] = time.time):
+        if not keys:
+            raise ValueError("At least one signing key is required")
+        self._macs: Dict[str, 'hmac.HMAC'] = {}
+        for kid, secret in keys.items():
+            self.add_key(kid, secret)
+        self.active_kid = active_kid if active_kid is not None else next(iter(keys))
+        if self.active_kid not in self._macs:
+            raise ValueError(f"Unknown active key id: {self.active_kid}")
+        self._max_age = max_age
+        self._clock = clock
+
+    @property
+    def kids(self):
+        """Key ids currently accepted for verification"""
+        return list(self._macs)
+
+    def add_key(self, kid: str, secret: bytes) -> None:
+        """
+        Register a verification key
+
+        Args:
+            kid: Key id embedded in tokens (must not contain '.')
+            secret: HMAC key
+        """
+        if not kid or '.' in kid:
+            raise ValueError(f"Invalid key id: {kid!r}")
+        # Keyed HMAC state is computed once and copied per token
+        self._macs[kid] = hmac.new(secret, digestmod=hashlib.sha256)
+
+    def rotate(self, kid: str, secret: bytes) -> None:
+        """
+        Add a key and make it the one used for new tokens
+
+        Args:
+            kid: New key id
+            secret: New HMAC key
+        """
+        self.add_key(kid, secret)
+        self.active_kid = kid
+
+    def retire(self, kid: str) -> None:
+        """
+        Stop accepting tokens signed with a key
+
+        Args:
+            kid: Key id to remove (cannot be the active key)
+        """
+        if kid == self.active_kid:
+            raise ValueError("Cannot retire the active signing key")
+        self._macs.pop(kid, None)
+
+    def issue(self, user_id: int) -> str:
+        """
+        Create a token for a user, signed with the active key
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Token string
+        """
+        expires_at = int(self._clock()) + self._max_age
+        payload = _b64encode(_PAYLOAD.pack(user_id, expires_at, os.urandom(4)))
+        signed = f"{self.active_kid}.{payload}"
+        return f"{signed}.{self._tag(self.active_kid, signed)}"
+
+    def decode(self, token: str) -> Optional[SessionClaims]:
+        """
+        Verify a token and return its claims
+
+        Args:
+            token: Token string
+
+        Returns:
+            SessionClaims, or None if the token is malformed, signed with
+            an unknown key, forged or expired
+        """
+        if not token.isascii():
+            return None
+
+        signed, _, tag = token.rpartition('.')
+        kid, _, payload = signed.partition('.')
+        if kid not in self._macs or not hmac.compare_digest(tag, self._tag(kid, signed)):
+            return None
+
+        try:
+            user_id, expires_at, _ = _PAYLOAD.unpack(_b64decode(payload))
+        except (ValueError, struct.error):
+            return None
+
+        if expires_at <= self._clock():
+            return None
+        return SessionClaims(user_id, expires_at, kid)
+
+    def _tag(self, kid: str, signed: str) -> str:
+        """Compute the truncated base64url HMAC tag for a signed prefix"""
+        mac = self._macs[kid].copy()
+        mac.update(signed.encode('ascii'))
+        return _b64encode(mac.digest()[:TAG_BYTES])
@@ -0,0 +1,23 @@
+"""
+Shared pytest fixtures for User Service tests
+"""
+import pytest
+from app import token_verifier, user_store
+from passwords import hash_password
+
+# Hashed once per session; scrypt is deliberately slow
+SAMPLE_PASSWORD_HASH = hash_password('password123')
+
+
+@pytest.fixture(autouse=True)
+def seeded_store():
+    """Reset the user store and seed the sample user (id 1) for every test"""
+    user_store.clear()
+    token_verifier.cache.clear()
+    user_store.create(
+        email='test@example.com',
+        password=SAMPLE_PASSWORD_HASH,
+        name='Test User'
+    )
+    yield user_store
+    user_store.clear()
@@ -3,7 +3,7 @@ Tests for User Service
 Demonstrates good testing practices with pytest
 """
 import pytest
-from app import app, users_db
+from app import app, token_verifier, user_store
 
 
 @pytest.fixture
@@ -26,9 +26,9 @@ def sample_user():
 
 @pytest.fixture
 def auth_headers():
-    """Authentication headers fixture"""
+    """Authentication headers fixture (signed token for user 1)"""
     return {
-        'Authorization': 'Bearer token_1_test@example.com'
+        'Authorization': f'Bearer {token_verifier.issue(1)}'
     }
 
 
@@ -155,8 +155,317 @@ def test_list_users_unauthorized(client):
     ({'email': 'test@example.com', 'password': ''}, 400),
     ({}, 400),
     ({'email': 'wrong@example.com', 'password': 'password123'}, 401),
+    ({'email': 123, 'password': 'password123'}, 400),
+    ({'email': ['test@example.com'], 'password': 'password123'}, 400),
+    ({'email': {'a': 1}, 'password': 'password123'}, 400),
+    (['test@example.com', 'password123'], 400),
+    ({'email': 'test@example.com', 'password': 123}, 400),
+    ({'email': 'test@example.com', 'password': ['password123']}, 400),
 ])
 def test_login_various_inputs(client, login_data, expected_status):
     """Test login with various input combinations"""
     response = client.post('/auth/login', json=login_data)
     assert response.status_code == expected_status
+
+
+def test_login_email_case_insensitive(client):
+    """Test login finds the user through the normalised email index"""
+    login_data = {
+        'email': 'TEST@example.com',
+        'password': 'password123'
+    }
+    
+    response = client.post('/auth/login', json=login_data)
+    
+    assert response.status_code == 200
+    assert response.json['user']['id'] == 1
+
+
+def test_create_user_success(client, auth_headers, sample_user):
+    """Test creating a user and logging in with it"""
+    response = client.post('/users', json=sample_user, headers=auth_headers)
+    
+    assert response.status_code == 201
+    assert response.json['email'] == sample_user['email']
+    assert 'password' not in response.json
+    assert user_store.get_by_email(sample_user['email'])['id'] == response.json['id']
+    
+    login = client.post('/auth/login', json={
+        'email': sample_user['email'],
+        'password': sample_user['password']
+    })
+    assert login.status_code == 200
+
+
+def test_create_user_duplicate_email(client, auth_headers, sample_user):
+    """Test duplicate emails are rejected case-insensitively"""
+    sample_user['email'] = 'Test@Example.com'
+    
+    response = client.post('/users', json=sample_user, headers=auth_headers)
+    
+    assert response.status_code == 409
+    assert 'error' in response.json
+
+
+@pytest.mark.parametrize("missing_field", ['email', 'password', 'name'])
+def test_create_user_missing_field(client, auth_headers, sample_user, missing_field):
+    """Test create_user validation of required fields"""
+    del sample_user[missing_field]
+    
+    response = client.post('/users', json=sample_user, headers=auth_headers)
+    
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+@pytest.mark.parametrize("field", ['email', 'password', 'name'])
+@pytest.mark.parametrize("value", [123, ['x@example.com'], {'a': 1}])
+def test_create_user_non_string_field(client, auth_headers, sample_user, field, value):
+    """Test create_user rejects non-string fields instead of failing"""
+    sample_user[field] = value
+    
+    response = client.post('/users', json=sample_user, headers=auth_headers)
+    
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+def test_create_user_invalid_email(client, auth_headers, sample_user):
+    """Test create_user rejects malformed emails"""
+    sample_user['email'] = 'not-an-email'
+    
+    response = client.post('/users', json=sample_user, headers=auth_headers)
+    
+    assert response.status_code == 400
+
+
+def test_create_user_unauthorized(client, sample_user):
+    """Test create_user requires authentication"""
+    response = client.post('/users', json=sample_user)
+    
+    assert response.status_code == 401
+
+
+@pytest.fixture
+def many_users():
+    """Add users 2-25 to the seeded store"""
+    for i in range(2, 26):
+        user_store.create(email=f'user{i}@example.com', password='pw', name=f'User {i}')
+
+
+def test_list_users_export_streams_all(client, auth_headers, many_users):
+    """Test the unpaginated export returns every user without passwords"""
+    response = client.get('/users', headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.json['count'] == 25
+    assert [u['id'] for u in response.json['users']] == list(range(1, 26))
+    assert all('password' not in u for u in response.json['users'])
+
+
+def test_list_users_keyset_pagination(client, auth_headers, many_users):
+    """Test walking pages with limit/after until next_after is null"""
+    ids = []
+    after = 0
+    while after is not None:
+        response = client.get(f'/users?limit=10&after={after}', headers=auth_headers)
+        assert response.status_code == 200
+        ids.extend(u['id'] for u in response.json['users'])
+        after = response.json['next_after']
+    
+    assert ids == list(range(1, 26))
+
+
+def test_list_users_last_page_has_no_cursor(client, auth_headers):
+    """Test next_after is null when the page is not full"""
+    response = client.get('/users?limit=5', headers=auth_headers)
+    
+    assert response.json['count'] == 1
+    assert response.json['next_after'] is None
+
+
+@pytest.mark.parametrize("query", [
+    'limit=0',
+    'limit=1001',
+    'limit=abc',
+    'after=-1',
+    'after=abc',
+])
+def test_list_users_invalid_pagination(client, auth_headers, query):
+    """Test invalid pagination parameters are rejected"""
+    response = client.get(f'/users?{query}', headers=auth_headers)
+    
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+def test_get_user_reflects_update(client, auth_headers):
+    """Test get_user serves the projection rebuilt by the last write"""
+    user_store.update(1, name='Renamed User')
+    
+    response = client.get('/users/1', headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert response.content_type == 'application/json'
+    assert response.json['name'] == 'Renamed User'
+    assert 'password' not in response.json
+
+
+@pytest.mark.parametrize("url", ['/users/1', '/users', '/users?limit=10'])
+def test_conditional_get_not_modified(client, auth_headers, url):
+    """Test a matching If-None-Match is answered with an empty 304"""
+    first = client.get(url, headers=auth_headers)
+    etag = first.headers['ETag']
+    
+    response = client.get(url, headers={**auth_headers, 'If-None-Match': etag})
+    
+    assert first.status_code == 200
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_get_user_etag_changes_on_update(client, auth_headers):
+    """Test updating a user invalidates its ETag"""
+    etag = client.get('/users/1', headers=auth_headers).headers['ETag']
+    user_store.update(1, name='Renamed User')
+    
+    response = client.get('/users/1', headers={**auth_headers, 'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.json['name'] == 'Renamed User'
+
+
+def test_list_users_etag_changes_on_any_write(client, auth_headers):
+    """Test the collection ETag moves when any user is created"""
+    etag = client.get('/users', headers=auth_headers).headers['ETag']
+    user_store.create(email='other@example.com', password='pw', name='Other')
+    
+    response = client.get('/users', headers={**auth_headers, 'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert response.json['count'] == 2
+
+
+def test_get_user_etag_stable_across_unrelated_writes(client, auth_headers):
+    """Test record ETags ignore writes to other users"""
+    etag = client.get('/users/1', headers=auth_headers).headers['ETag']
+    user_store.create(email='other@example.com', password='pw', name='Other')
+    
+    response = client.get('/users/1', headers={**auth_headers, 'If-None-Match': etag})
+    
+    assert response.status_code == 304
+
+
+def test_user_changes_feed(client, auth_headers):
+    """Test a mirror only receives deltas after its cursor"""
+    first = client.get('/users/changes?since=0', headers=auth_headers)
+    since = first.json['next_since']
+    created = user_store.create(email='other@example.com', password='pw', name='Other')
+    user_store.delete(1)
+    
+    response = client.get(f'/users/changes?since={since}', headers=auth_headers)
+    
+    assert first.json['count'] == 1
+    assert response.status_code == 200
+    assert [(c['op'], c['id']) for c in response.json['changes']] == [
+        ('create', created['id']), ('delete', 1)
+    ]
+    assert response.json['changes'][0]['user']['email'] == 'other@example.com'
+    assert 'password' not in response.json['changes'][0]['user']
+    assert response.json['changes'][1]['user'] is None
+    assert response.json['epoch'] == user_store.epoch
+
+
+def test_user_changes_stale_cursor(client, auth_headers):
+    """Test a cursor ahead of the log asks the client to resync"""
+    response = client.get('/users/changes?since=9999', headers=auth_headers)
+    
+    assert response.status_code == 410
+    assert 'error' in response.json
+
+
+def mirror_from_export(client, auth_headers, url='/users'):
+    """Mirror {id: user} and change feed cursor from a GET /users snapshot"""
+    response = client.get(url, headers=auth_headers)
+    assert response.json['epoch'] == user_store.epoch
+    return {u['id']: u for u in response.json['users']}, response.json['next_since']
+
+
+def apply_changes(client, auth_headers, mirror, since):
+    """Replay the change feed from since onto mirror; return the status and cursor"""
+    while True:
+        response = client.get(f'/users/changes?since={since}&limit=2', headers=auth_headers)
+        if response.status_code != 200:
+            return response.status_code, since
+        for change in response.json['changes']:
+            if change['op'] == 'delete':
+                mirror.pop(change['id'], None)
+            else:
+                mirror[change['id']] = change['user']
+        since = response.json['next_since']
+        if response.json['count'] == 0:
+            return 200, since
+
+
+def current_users(client, auth_headers):
+    """Users as the export shows them now"""
+    return {u['id']: u for u in client.get('/users', headers=auth_headers).json['users']}
+
+
+@pytest.mark.parametrize("url", ['/users', '/users?limit=1000'])
+def test_user_changes_gone_resync_and_resume(client, auth_headers, monkeypatch, url):
+    """Test a 410 mirror resyncs from GET /users and resumes from its next_since"""
+    monkeypatch.setattr(user_store, '_max_changes', 3)
+    mirror, since = mirror_from_export(client, auth_headers, url)
+    for i in range(2, 8):
+        user_store.create(email=f'user{i}@example.com', password='pw', name=f'User {i}')
+    
+    assert apply_changes(client, auth_headers, mirror, since)[0] == 410
+    assert client.get('/users/changes?since=0', headers=auth_headers).status_code == 410
+    
+    mirror, since = mirror_from_export(client, auth_headers, url)
+    assert since == user_store.version
+    user_store.update(3, name='Renamed')
+    user_store.delete(5)
+    user_store.create(email='late@example.com', password='pw', name='Late')
+    
+    status, since = apply_changes(client, auth_headers, mirror, since)
+    
+    assert status == 200
+    assert since == user_store.version
+    assert mirror == current_users(client, auth_headers)
+
+
+def test_export_next_since_covers_writes_during_the_walk(client, auth_headers, many_users):
+    """Test writes between the first and last page of a walk are replayed from its next_since"""
+    first = client.get('/users?limit=10', headers=auth_headers).json
+    mirror = {u['id']: u for u in first['users']}
+    user_store.update(2, name='Changed behind the cursor')
+    user_store.delete(20)
+    after = first['next_after']
+    while after is not None:
+        page = client.get(f'/users?limit=10&after={after}', headers=auth_headers).json
+        mirror.update((u['id'], u) for u in page['users'])
+        after = page['next_after']
+    
+    assert mirror != current_users(client, auth_headers)
+    assert apply_changes(client, auth_headers, mirror, first['next_since'])[0] == 200
+    assert mirror == current_users(client, auth_headers)
+
+
+@pytest.mark.parametrize("query", ['since=-1', 'since=abc', 'limit=0', 'limit=5000'])
+def test_user_changes_invalid_params(client, auth_headers, query):
+    """Test invalid change feed parameters are rejected"""
+    response = client.get(f'/users/changes?{query}', headers=auth_headers)
+    
+    assert response.status_code == 400
+
+
+def test_user_changes_unauthorized(client):
+    """Test the change feed requires authentication"""
+    response = client.get('/users/changes')
+    
+    assert response.status_code == 401
@@ -3,7 +3,8 @@ Tests for middleware functionality
 Demonstrates testing authentication and error handling
 """
 import pytest
-from app import app
+from app import app, token_verifier, user_store
+from session_tokens import _PAYLOAD, _b64decode, _b64encode
 
 
 @pytest.fixture
@@ -21,11 +22,78 @@ class TestAuthentication:
         """Test endpoint access with valid Bearer token"""
         response = client.get(
             '/users/1',
-            headers={'Authorization': 'Bearer valid_token_here'}
+            headers={'Authorization': f'Bearer {token_verifier.issue(1)}'}
         )
         # Should not get 401 (will get 200 or other status based on logic)
         assert response.status_code != 401
     
+    def test_auth_with_unsigned_token(self, client):
+        """Test endpoint access with a token that was never issued"""
+        response = client.get(
+            '/users/1',
+            headers={'Authorization': 'Bearer valid_token_here'}
+        )
+        
+        assert response.status_code == 401
+        assert response.json['error'] == 'Unauthorized'
+    
+    def test_auth_with_tampered_token(self, client):
+        """Test a token whose user id was changed fails the signature check"""
+        other = user_store.create(email='other@example.com', password='x', name='Other')
+        kid, payload, tag = token_verifier.issue(1).split('.')
+        _, expires_at, nonce = _PAYLOAD.unpack(_b64decode(payload))
+        repacked = '.'.join([kid, _b64encode(_PAYLOAD.pack(1, expires_at, nonce)), tag])
+        forged = '.'.join([kid, _b64encode(_PAYLOAD.pack(other['id'], expires_at, nonce)), tag])
+        
+        control = client.get('/users/1', headers={'Authorization': f'Bearer {repacked}'})
+        response = client.get('/users/1', headers={'Authorization': f'Bearer {forged}'})
+        
+        assert control.status_code == 200
+        assert response.status_code == 401
+    
+    def test_auth_cache_hit_on_repeat_requests(self, client):
+        """Test repeated requests with one token are served from the cache"""
+        headers = {'Authorization': f'Bearer {token_verifier.issue(1)}'}
+        
+        client.get('/users/1', headers=headers)
+        hits = token_verifier.cache.hits
+        client.get('/users/1', headers=headers)
+        
+        assert token_verifier.cache.hits == hits + 1
+    
+    def test_logout_revokes_token(self, client):
+        """Test a token stops working after logout"""
+        headers = {'Authorization': f'Bearer {token_verifier.issue(1)}'}
+        client.get('/users/1', headers=headers)
+        
+        logout = client.post('/auth/logout', headers=headers)
+        response = client.get('/users/1', headers=headers)
+        
+        assert logout.status_code == 200
+        assert response.status_code == 401
+    
+    def test_delete_user_revokes_tokens(self, client):
+        """Test deleting an account invalidates its cached tokens"""
+        other = user_store.create(email='other@example.com', password='pw', name='Other')
+        headers = {'Authorization': f'Bearer {token_verifier.issue(other["id"])}'}
+        client.get('/users/1', headers=headers)
+        
+        deleted = client.delete(f'/users/{other["id"]}', headers=headers)
+        response = client.get('/users/1', headers=headers)
+        
+        assert deleted.status_code == 200
+        assert response.status_code == 401
+    
+    def test_delete_other_user_forbidden(self, client):
+        """Test users can only delete their own account"""
+        other = user_store.create(email='other@example.com', password='pw', name='Other')
+        headers = {'Authorization': f'Bearer {token_verifier.issue(other["id"])}'}
+        
+        response = client.delete('/users/1', headers=headers)
+        
+        assert response.status_code == 403
+        assert 1 in user_store
+    
     def test_auth_without_header(self, client):
         """Test endpoint access without Authorization header"""
         response = client.get('/users/1')
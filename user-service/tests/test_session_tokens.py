@@ -0,0 +1,123 @@
+"""
+Tests for stateless HMAC session tokens
+"""
+import pytest
+from session_tokens import SessionTokenSigner, parse_key_spec
+
+
+class FakeClock:
+    """Manually advanced clock for expiry tests"""
+    
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Fake clock fixture"""
+    return FakeClock()
+
+
+@pytest.fixture
+def signer(clock):
+    """Signer with two keys, k2 active"""
+    return SessionTokenSigner({'k2': b'new-secret', 'k1': b'old-secret'}, max_age=3600, clock=clock)
+
+
+def test_round_trip_claims(signer, clock):
+    """Test a token decodes to the user id, expiry and key id"""
+    claims = signer.decode(signer.issue(42))
+    
+    assert claims.user_id == 42
+    assert claims.expires_at == int(clock.now) + 3600
+    assert claims.kid == 'k2'
+
+
+def test_token_is_compact(signer):
+    """Test the token stays short enough for a header"""
+    token = signer.issue(2 ** 63)
+    
+    assert len(token) <= 50
+    assert token.startswith('k2.')
+
+
+def test_tokens_are_unique(signer):
+    """Test two tokens for the same user in the same second differ"""
+    assert signer.issue(1) != signer.issue(1)
+
+
+def test_expired_token_rejected(signer, clock):
+    """Test tokens stop decoding at their expiry"""
+    token = signer.issue(1)
+    
+    clock.now += 3600
+    
+    assert signer.decode(token) is None
+
+
+def test_tampered_payload_rejected(signer):
+    """Test changing any payload byte breaks the tag"""
+    kid, payload, tag = signer.issue(1).split('.')
+    forged_payload = ('B' if payload[0] != 'B' else 'C') + payload[1:]
+    
+    assert signer.decode(f'{kid}.{forged_payload}.{tag}') is None
+
+
+def test_kid_cannot_be_swapped(signer):
+    """Test the key id is covered by the tag"""
+    _, payload, tag = signer.issue(1).split('.')
+    
+    assert signer.decode(f'k1.{payload}.{tag}') is None
+
+
+@pytest.mark.parametrize("token", ['', '...', 'k2', 'k2.abc.def', 'nokey.abc.def', 'k2.é.x'])
+def test_malformed_tokens_rejected(signer, token):
+    """Test malformed tokens decode to None instead of raising"""
+    assert signer.decode(token) is None
+
+
+def test_rotation_keeps_old_tokens_valid(signer):
+    """Test rotating keeps verifying tokens from previous keys until retired"""
+    old_token = signer.issue(1)
+    
+    signer.rotate('k3', b'newest-secret')
+    new_token = signer.issue(1)
+    
+    assert new_token.startswith('k3.')
+    assert signer.decode(old_token).kid == 'k2'
+    
+    signer.retire('k2')
+    
+    assert signer.decode(old_token) is None
+    assert signer.decode(new_token).user_id == 1
+
+
+def test_cannot_retire_active_key(signer):
+    """Test the active key cannot be removed"""
+    with pytest.raises(ValueError):
+        signer.retire('k2')
+
+
+def test_other_worker_with_same_keys_verifies(signer, clock):
+    """Test verification needs only the key set, not shared state"""
+    worker = SessionTokenSigner({'k1': b'old-secret', 'k2': b'new-secret'}, clock=clock)
+    
+    assert worker.decode(signer.issue(7)).user_id == 7
+
+
+def test_parse_key_spec():
+    """Test key specs keep the active key first"""
+    keys = parse_key_spec('k2:new, k1:old:with:colons')
+    
+    assert list(keys) == ['k2', 'k1']
+    assert keys['k1'] == b'old:with:colons'
+
+
+@pytest.mark.parametrize("spec", ['', 'nokey', ':secret', 'k1:', 'a.b:secret', 'k1:a,k1:b'])
+def test_parse_key_spec_invalid(spec):
+    """Test malformed key specs are rejected"""
+    with pytest.raises(ValueError):
+        parse_key_spec(spec)
@@ -0,0 +1,147 @@
+"""
+Tests for token issuing, verification and the verification cache
+"""
+import pytest
+from session_tokens import SessionTokenSigner
+from token_auth import TokenCache, TokenVerifier
+
+
+class FakeClock:
+    """Manually advanced clock for TTL tests"""
+    
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Fake clock fixture"""
+    return FakeClock()
+
+
+@pytest.fixture
+def users():
+    """Set of existing user ids"""
+    return {1, 2}
+
+
+@pytest.fixture
+def verifier(clock, users):
+    """Token verifier with a small cache and a one-hour token lifetime"""
+    signer = SessionTokenSigner({'k1': b'test-secret'}, max_age=3600, clock=clock)
+    cache = TokenCache(max_size=3, ttl=60, clock=clock)
+    return TokenVerifier(signer, users.__contains__, cache=cache, clock=clock)
+
+
+def test_issue_and_verify(verifier):
+    """Test a freshly issued token verifies to its user"""
+    token = verifier.issue(1)
+    
+    assert verifier.verify(token) == 1
+
+
+def test_second_verify_is_cache_hit(verifier):
+    """Test repeat verifications are served from the cache"""
+    token = verifier.issue(1)
+    
+    verifier.verify(token)
+    verifier.verify(token)
+    
+    assert verifier.cache.stats() == {'size': 1, 'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+
+@pytest.mark.parametrize("token", [
+    '',
+    'garbage',
+    'k1.x.y',
+    'k9.AAAAAAAAAAEAAAAAAAAAAA.AAAAAAAAAAAAAAAAAAAAAA',
+    'ü.1.2',
+])
+def test_malformed_or_forged_tokens_rejected(verifier, token):
+    """Test tokens without a valid signature never verify"""
+    assert verifier.verify(token) is None
+
+
+def test_token_signed_with_other_secret_rejected(verifier, users, clock):
+    """Test tokens from a different key are rejected"""
+    other = SessionTokenSigner({'k1': b'other-secret'}, clock=clock)
+    
+    assert verifier.verify(other.issue(1)) is None
+
+
+def test_expired_token_rejected(verifier, clock):
+    """Test tokens stop verifying after max_age, even when cached"""
+    token = verifier.issue(1)
+    verifier.verify(token)
+    
+    clock.now += 3601
+    
+    assert verifier.verify(token) is None
+
+
+def test_cache_entry_expires_after_ttl(verifier, clock, users):
+    """Test cached results are re-verified once the TTL passes"""
+    token = verifier.issue(1)
+    verifier.verify(token)
+    users.discard(1)
+    
+    clock.now += 30
+    assert verifier.verify(token) == 1
+    
+    clock.now += 31
+    assert verifier.verify(token) is None
+
+
+def test_lru_eviction(verifier):
+    """Test the least recently used token is evicted at max_size"""
+    tokens = [verifier.issue(1) for _ in range(3)]
+    for token in tokens:
+        verifier.verify(token)
+    verifier.verify(tokens[0])
+    
+    verifier.verify(verifier.issue(2))
+    
+    assert len(verifier.cache) == 3
+    assert verifier.cache.get(tokens[0]) == 1
+    assert verifier.cache.get(tokens[1]) is None
+
+
+def test_revoke_token(verifier):
+    """Test revoked tokens fail even after the cache entry is gone"""
+    token = verifier.issue(1)
+    other = verifier.issue(1)
+    verifier.verify(token)
+    
+    verifier.revoke(token)
+    
+    assert verifier.verify(token) is None
+    assert verifier.verify(other) == 1
+
+
+def test_revocation_list_purged_after_expiry(verifier, clock):
+    """Test revoked tokens are forgotten once they would have expired"""
+    token = verifier.issue(1)
+    verifier.revoke(token)
+    
+    clock.now += 3601
+    verifier.revoke(verifier.issue(1))
+    
+    assert token not in verifier._revoked
+    assert len(verifier._revoked) == 1
+
+
+def test_revoke_user_drops_cached_tokens(verifier, users):
+    """Test deleting a user invalidates every cached token at once"""
+    tokens = [verifier.issue(1), verifier.issue(1)]
+    kept = verifier.issue(2)
+    for token in tokens + [kept]:
+        verifier.verify(token)
+    
+    users.discard(1)
+    verifier.revoke_user(1)
+    
+    assert all(verifier.verify(token) is None for token in tokens)
+    assert verifier.verify(kept) == 2
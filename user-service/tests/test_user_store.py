@@ -0,0 +1,328 @@
+"""
+Tests for the indexed user store
+"""
+import json
+
+import pytest
+from user_store import UserStore, DuplicateEmailError, StaleCursorError, normalize_email
+
+
+@pytest.fixture
+def store():
+    """Empty user store fixture"""
+    return UserStore()
+
+
+def test_create_assigns_sequential_ids(store):
+    """Test ids are assigned from a counter starting at 1"""
+    first = store.create(email='a@example.com', password='pw', name='A')
+    second = store.create(email='b@example.com', password='pw', name='B')
+    
+    assert first['id'] == 1
+    assert second['id'] == 2
+    assert len(store) == 2
+
+
+def test_get_by_email_is_case_insensitive(store):
+    """Test email lookups use the normalised index"""
+    created = store.create(email='Mixed.Case@Example.com', password='pw', name='M')
+    
+    found = store.get_by_email('  mixed.case@example.COM ')
+    
+    assert found['id'] == created['id']
+    assert found['email'] == 'Mixed.Case@Example.com'
+
+
+def test_create_duplicate_email_rejected(store):
+    """Test the email index enforces uniqueness regardless of case"""
+    store.create(email='dup@example.com', password='pw', name='D')
+    
+    with pytest.raises(DuplicateEmailError):
+        store.create(email='DUP@example.com', password='pw', name='D2')
+    assert len(store) == 1
+
+
+def test_update_email_moves_index_entry(store):
+    """Test changing the email re-keys the email index"""
+    user = store.create(email='old@example.com', password='pw', name='U')
+    
+    store.update(user['id'], email='new@example.com')
+    
+    assert store.get_by_email('old@example.com') is None
+    assert store.get_by_email('new@example.com')['id'] == user['id']
+
+
+def test_update_to_taken_email_rejected(store):
+    """Test an update cannot steal another user's email"""
+    store.create(email='a@example.com', password='pw', name='A')
+    b = store.create(email='b@example.com', password='pw', name='B')
+    
+    with pytest.raises(DuplicateEmailError):
+        store.update(b['id'], email='A@example.com')
+    assert store.get_by_email('b@example.com')['id'] == b['id']
+
+
+def test_update_ignores_id_and_missing_user(store):
+    """Test the id cannot be overwritten and unknown ids return None"""
+    user = store.create(email='a@example.com', password='pw', name='A')
+    
+    updated = store.update(user['id'], id=99, name='Renamed')
+    
+    assert updated['id'] == user['id']
+    assert updated['name'] == 'Renamed'
+    assert store.update(999, name='X') is None
+
+
+def test_delete_removes_from_both_indexes(store):
+    """Test delete drops the record and frees the email"""
+    user = store.create(email='a@example.com', password='pw', name='A')
+    
+    assert store.delete(user['id'])['id'] == user['id']
+    assert store.get(user['id']) is None
+    assert store.get_by_email('a@example.com') is None
+    assert store.delete(user['id']) is None
+    store.create(email='a@example.com', password='pw', name='A again')
+
+
+def test_returned_records_are_copies(store):
+    """Test mutating a returned record does not corrupt the store"""
+    user = store.create(email='a@example.com', password='pw', name='A')
+    
+    user['email'] = 'hacked@example.com'
+    store.get(user['id'])['name'] = 'Hacked'
+    
+    assert store.get_by_email('a@example.com')['name'] == 'A'
+
+
+def test_clear_resets_counter(store):
+    """Test clear empties the store and restarts ids at 1"""
+    store.create(email='a@example.com', password='pw', name='A')
+    
+    store.clear()
+    
+    assert len(store) == 0
+    assert store.create(email='a@example.com', password='pw', name='A')['id'] == 1
+
+
+@pytest.mark.parametrize("raw,expected", [
+    ('User@Example.com', 'user@example.com'),
+    ('  spaced@example.com ', 'spaced@example.com'),
+    ('lower@example.com', 'lower@example.com'),
+])
+def test_normalize_email(raw, expected):
+    """Test email normalisation"""
+    assert normalize_email(raw) == expected
+
+
+@pytest.fixture
+def populated_store(store):
+    """Store with ten users (ids 1-10)"""
+    for i in range(10):
+        store.create(email=f'user{i}@example.com', password='pw', name=f'User {i}')
+    return store
+
+
+def test_page_keyset_cursor(populated_store):
+    """Test pages continue strictly after the cursor id"""
+    first = populated_store.page(after=0, limit=4)
+    second = populated_store.page(after=first[-1]['id'], limit=4)
+    
+    assert [u['id'] for u in first] == [1, 2, 3, 4]
+    assert [u['id'] for u in second] == [5, 6, 7, 8]
+
+
+def test_page_skips_deleted_ids(populated_store):
+    """Test deleted users drop out of the ordered id index"""
+    populated_store.delete(3)
+    populated_store.delete(4)
+    
+    page = populated_store.page(after=2, limit=2)
+    
+    assert [u['id'] for u in page] == [5, 6]
+
+
+def test_iter_chunks_covers_all_users(populated_store):
+    """Test chunked iteration visits every user once, in id order"""
+    chunks = list(populated_store.iter_chunks(chunk_size=3))
+    
+    assert [len(c) for c in chunks] == [3, 3, 3, 1]
+    assert [u['id'] for c in chunks for u in c] == list(range(1, 11))
+
+
+def test_iter_chunks_tolerates_concurrent_delete(populated_store):
+    """Test deleting ahead of the cursor mid-walk does not break iteration"""
+    seen = []
+    for chunk in populated_store.iter_chunks(chunk_size=3):
+        seen.extend(u['id'] for u in chunk)
+        populated_store.delete(seen[-1] + 1)
+    
+    assert seen == [1, 2, 3, 5, 6, 7, 9, 10]
+
+
+def test_public_json_excludes_private_fields(store):
+    """Test the cached projection never contains the password"""
+    user = store.create(email='a@example.com', password='secret', name='A')
+    
+    public = json.loads(store.public_json(user['id']))
+    
+    assert public == {'id': user['id'], 'email': 'a@example.com', 'name': 'A'}
+
+
+def test_public_json_rebuilt_on_update(store):
+    """Test writes refresh the cached projection"""
+    user = store.create(email='a@example.com', password='secret', name='A')
+    before = store.public_json(user['id'])
+    
+    store.update(user['id'], name='Renamed')
+    
+    assert store.public_json(user['id']) != before
+    assert json.loads(store.public_json(user['id']))['name'] == 'Renamed'
+
+
+def test_public_json_dropped_on_delete(store):
+    """Test deleted users have no cached projection"""
+    user = store.create(email='a@example.com', password='secret', name='A')
+    
+    store.delete(user['id'])
+    
+    assert store.public_json(user['id']) is None
+    assert store.public_json_page() == []
+
+
+def test_public_json_page_and_chunks(populated_store):
+    """Test cached fragments are served in id order"""
+    page = populated_store.public_json_page(after=8, limit=5)
+    chunks = list(populated_store.iter_public_json_chunks(chunk_size=4))
+    
+    assert [user_id for user_id, _ in page] == [9, 10]
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert json.loads(chunks[0][0])['id'] == 1
+
+
+def test_custom_private_fields():
+    """Test extra private fields are excluded from the projection"""
+    store = UserStore(private_fields={'password', 'internal_notes'})
+    user = store.create(email='a@example.com', password='pw', name='A', internal_notes='vip')
+    
+    assert 'internal_notes' not in json.loads(store.public_json(user['id']))
+    assert store.get(user['id'])['internal_notes'] == 'vip'
+
+
+def test_versions_are_monotonic(store):
+    """Test every write bumps the collection and record versions"""
+    a = store.create(email='a@example.com', password='pw', name='A')
+    v_created = store.record_version(a['id'])
+    b = store.create(email='b@example.com', password='pw', name='B')
+    
+    store.update(a['id'], name='A2')
+    
+    assert store.record_version(a['id']) > v_created
+    assert store.record_version(b['id']) < store.record_version(a['id'])
+    assert store.version == 3
+    
+    store.delete(b['id'])
+    
+    assert store.version == 4
+    assert store.record_version(b['id']) is None
+
+
+def test_versioned_public_json_pairs_version_and_body(store):
+    """Test the version and the body come from the same write"""
+    user = store.create(email='a@example.com', password='pw', name='A')
+    store.update(user['id'], name='B')
+    
+    version, body = store.versioned_public_json(user['id'])
+    
+    assert version == store.record_version(user['id'])
+    assert json.loads(body)['name'] == 'B'
+    assert store.versioned_public_json(999) is None
+
+
+def test_clear_changes_epoch(store):
+    """Test clearing the store starts a new version sequence"""
+    epoch = store.epoch
+    store.create(email='a@example.com', password='pw', name='A')
+    
+    store.clear()
+    
+    assert store.version == 0
+    assert store.epoch != epoch
+
+
+def test_changes_since_returns_deltas_in_order(store):
+    """Test the change log records creates, updates and deletes"""
+    a = store.create(email='a@example.com', password='pw', name='A')
+    b = store.create(email='b@example.com', password='pw', name='B')
+    since = store.version
+    store.update(a['id'], name='A2')
+    store.delete(b['id'])
+    
+    changes, next_since = store.changes_since(since)
+    
+    assert [(op, user_id) for _, op, user_id, _ in changes] == [('update', a['id']), ('delete', b['id'])]
+    assert json.loads(changes[0][3])['name'] == 'A2'
+    assert changes[1][3] is None
+    assert next_since == store.version
+    assert store.changes_since(next_since) == ([], next_since)
+
+
+def test_changes_compacted_to_latest_per_user(store):
+    """Test repeated writes to one user collapse into a single entry"""
+    user = store.create(email='a@example.com', password='pw', name='A')
+    for i in range(5):
+        store.update(user['id'], name=f'A{i}')
+    
+    changes, _ = store.changes_since(0)
+    
+    assert len(changes) == 1
+    assert changes[0][0] == store.version
+    assert json.loads(changes[0][3])['name'] == 'A4'
+
+
+def test_changes_since_limit_pages_forward(store):
+    """Test next_since continues a truncated page"""
+    for i in range(5):
+        store.create(email=f'u{i}@example.com', password='pw', name=f'U{i}')
+    
+    first, cursor = store.changes_since(0, limit=3)
+    rest, cursor = store.changes_since(cursor, limit=3)
+    
+    assert [seq for seq, *_ in first] == [1, 2, 3]
+    assert [seq for seq, *_ in rest] == [4, 5]
+    assert cursor == 5
+
+
+def test_changes_capped_and_stale_cursor_rejected():
+    """Test the log is bounded and cursors older than it must resync"""
+    store = UserStore(max_changes=3)
+    for i in range(5):
+        store.create(email=f'u{i}@example.com', password='pw', name=f'U{i}')
+    
+    changes, _ = store.changes_since(2)
+    
+    assert [seq for seq, *_ in changes] == [3, 4, 5]
+    with pytest.raises(StaleCursorError):
+        store.changes_since(1)
+    with pytest.raises(StaleCursorError):
+        store.changes_since(store.version + 1)
+
+
+def test_sync_point_tracks_epoch_and_version(store):
+    """Test sync_point reports the epoch and the version of the latest write"""
+    store.create(email='a@example.com', password='pw', name='A')
+    
+    assert store.sync_point() == (store.epoch, store.version) == (store.epoch, 1)
+    store.clear()
+    assert store.sync_point() == (store.epoch, 0)
+
+
+def test_private_only_update_keeps_version(store):
+    """Test changing only the password does not move the version or feed"""
+    user = store.create(email='a@example.com', password='old-hash', name='A')
+    version = store.version
+    
+    store.update(user['id'], password='new-hash')
+    
+    assert store.get(user['id'])['password'] == 'new-hash'
+    assert store.version == version
+    assert store.changes_since(version) == ([], version)
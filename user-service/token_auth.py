@@ -0,0 +1,226 @@
+"""
+Bearer token issuing and verification
+Stateless signed tokens plus a bounded LRU+TTL cache of verified tokens
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from session_tokens import SessionTokenSigner
+
+# Defaults for the verification cache
+CACHE_TTL = 60
+CACHE_SIZE = 10000
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified tokens with a per-entry TTL
+
+    Maps token -> user id. Entries expire after ttl seconds (or earlier
+    if the token itself expires sooner) and the least recently used
+    entry is evicted once max_size is reached. Tokens are also indexed
+    by user id so all of a user's tokens can be dropped at once.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 clock: Callable[[], float] = time.time):
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, Tuple[int, float]]' = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[int]:
+        """
+        Look up a verified token
+
+        Args:
+            token: Raw token string
+
+        Returns:
+            User id, or None on a miss or an expired entry
+        """
+        entry = self._entries.get(token)
+        if entry is not None and entry[1] > self._clock():
+            with self._lock:
+                if token in self._entries:
+                    self._entries.move_to_end(token)
+                self.hits += 1
+            return entry[0]
+
+        with self._lock:
+            if entry is not None:
+                self._discard(token)
+            self.misses += 1
+        return None
+
+    def put(self, token: str, user_id: int, expires_at: float) -> None:
+        """
+        Cache a verified token
+
+        Args:
+            token: Raw token string
+            user_id: User the token belongs to
+            expires_at: Time at which the token itself stops being valid
+        """
+        expires_at = min(expires_at, self._clock() + self._ttl)
+        with self._lock:
+            self._discard(token)
+            self._entries[token] = (user_id, expires_at)
+            self._tokens_by_user.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self._max_size:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def discard(self, token: str) -> None:
+        """Drop a single token from the cache"""
+        with self._lock:
+            self._discard(token)
+
+    def discard_user(self, user_id: int) -> None:
+        """Drop every cached token belonging to a user"""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._discard(token)
+
+    def clear(self) -> None:
+        """Empty the cache and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with size, hits, misses and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _discard(self, token: str) -> None:
+        """Remove a token from both indexes (caller holds the lock)"""
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_user.get(entry[0])
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[entry[0]]
+
+
+class TokenVerifier:
+    """
+    Issues and verifies bearer tokens
+
+    Tokens are stateless SessionTokenSigner tokens. A full verification
+    checks the signature and expiry, the revocation list and that the
+    user still exists; successful results are kept in a TokenCache so an
+    already-seen token costs one dict lookup.
+    """
+
+    def __init__(self, signer: SessionTokenSigner, user_exists: Callable[[int], bool],
+                 cache: Optional[TokenCache] = None, clock: Callable[[], float] = time.time):
+        self.signer = signer
+        self._user_exists = user_exists
+        self._clock = clock
+        self.cache = cache if cache is not None else TokenCache(clock=clock)
+        self._lock = threading.Lock()
+        self._revoked: Set[str] = set()
+        self._revoked_expiry: List[Tuple[float, str]] = []
+
+    def issue(self, user_id: int) -> str:
+        """
+        Create a signed token for a user
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Token string
+        """
+        return self.signer.issue(user_id)
+
+    def verify(self, token: str) -> Optional[int]:
+        """
+        Verify a token
+
+        Args:
+            token: Raw token string (without the "Bearer " prefix)
+
+        Returns:
+            The authenticated user id, or None if the token is invalid,
+            expired, revoked or belongs to a deleted user
+        """
+        user_id = self.cache.get(token)
+        if user_id is not None:
+            return user_id
+
+        claims = self.signer.decode(token)
+        if claims is None:
+            return None
+
+        user_id = claims.user_id
+        if token in self._revoked or not self._user_exists(user_id):
+            return None
+
+        self.cache.put(token, user_id, claims.expires_at)
+        # A revoke or user deletion racing with this call may have run
+        # before the put; re-check so it cannot leave a stale entry behind
+        if token in self._revoked or not self._user_exists(user_id):
+            self.cache.discard(token)
+            return None
+        return user_id
+
+    def revoke(self, token: str) -> None:
+        """
+        Revoke a token (e.g. on logout) until it would have expired anyway
+
+        The revocation list is local to this process: other workers keep
+        accepting the token until it expires, so keep token lifetimes short.
+
+        Args:
+            token: Raw token string
+        """
+        self.cache.discard(token)
+        claims = self.signer.decode(token)
+        if claims is None:
+            return
+
+        with self._lock:
+            now = self._clock()
+            while self._revoked_expiry and self._revoked_expiry[0][0] <= now:
+                _, expired = heapq.heappop(self._revoked_expiry)
+                self._revoked.discard(expired)
+            if token not in self._revoked:
+                self._revoked.add(token)
+                heapq.heappush(self._revoked_expiry, (claims.expires_at, token))
+
+    def revoke_user(self, user_id: int) -> None:
+        """
+        Drop cached verifications for a user (e.g. on deletion)
+
+        Later verifications fall through to the user lookup and fail.
+
+        Args:
+            user_id: User ID
+        """
+        self.cache.discard_user(user_id)
@@ -0,0 +1,445 @@
+"""
+In-memory user storage with indexed lookups
+Keeps a primary id index and a unique, case-normalised email index
+"""
+import json
+import threading
+import uuid
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Fields never included in the public projection of a user
+PRIVATE_FIELDS = frozenset({'password'})
+
+# Default number of change log entries kept before the oldest are dropped
+MAX_CHANGES = 100000
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when an email is already registered to another user"""
+
+
+class StaleCursorError(LookupError):
+    """Raised when a change feed cursor points at entries already compacted away"""
+
+
+def normalize_email(email: str) -> str:
+    """
+    Normalise an email address for index lookups
+
+    Args:
+        email: Raw email address
+
+    Returns:
+        Stripped, lower-cased email
+    """
+    return email.strip().lower()
+
+
+class UserStore:
+    """
+    Indexed user store
+
+    Every write goes through create/update/delete so the id and email
+    indexes never drift apart. Lookups by id or email are O(1), and a
+    sorted id list supports keyset pagination in O(log n + page size).
+    Records handed out are copies; mutate them through update().
+
+    The public projection of each user (all fields except PRIVATE_FIELDS)
+    is kept pre-encoded as JSON bytes and rebuilt on every write, so read
+    endpoints can serve it without copying or encoding anything.
+
+    Every write that changes a public projection (and every create and
+    delete) bumps a store-wide version counter; each record remembers the
+    counter value of its last such write. Together with a random epoch,
+    regenerated whenever the store is created or cleared, these give
+    cheap validators for conditional GETs.
+
+    The same counter numbers an append-only change log of creates,
+    updates and deletes. The log is compacted by key (only the latest
+    change per user is kept) and capped at max_changes entries, so a
+    mirror can sync in time proportional to churn while memory stays
+    bounded.
+    """
+
+    def __init__(self, private_fields: Iterable[str] = PRIVATE_FIELDS,
+                 max_changes: int = MAX_CHANGES):
+        self._lock = threading.RLock()
+        self._private_fields = frozenset(private_fields)
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._id_by_email: Dict[str, int] = {}
+        self._ordered_ids: List[int] = []
+        # user id -> (record version, public projection bytes)
+        self._public_json: Dict[int, Tuple[int, bytes]] = {}
+        self._next_id = 1
+        self._version = 0
+        self._epoch = uuid.uuid4().hex[:12]
+        # user id -> (seq, op), ordered by seq
+        self._changes: 'OrderedDict[int, Tuple[int, str]]' = OrderedDict()
+        self._max_changes = max_changes
+        self._compacted_through = 0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._by_id
+
+    @property
+    def version(self) -> int:
+        """Version of the whole collection, bumped on every write"""
+        return self._version
+
+    @property
+    def epoch(self) -> str:
+        """Random token identifying this store's version sequence"""
+        return self._epoch
+
+    def sync_point(self) -> Tuple[str, int]:
+        """
+        Get the epoch and version in one atomic read
+
+        Read before walking the users for a snapshot: every write the
+        walk may miss or see half of comes after the returned version,
+        so replaying changes_since(version) over the snapshot brings it
+        up to date.
+
+        Returns:
+            (epoch, version)
+        """
+        with self._lock:
+            return self._epoch, self._version
+
+    def record_version(self, user_id: int) -> Optional[int]:
+        """
+        Get the version of a single user record
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Collection version at the record's last write, or None if the
+            user does not exist
+        """
+        entry = self._public_json.get(user_id)
+        return entry[0] if entry is not None else None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over copies of all user records in id order"""
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    def ids_after(self, after: int = 0, limit: Optional[int] = None) -> List[int]:
+        """
+        Get user ids greater than a keyset cursor, in ascending order
+
+        Args:
+            after: Return only ids strictly greater than this
+            limit: Maximum number of ids to return (None for all)
+
+        Returns:
+            List of user ids
+        """
+        with self._lock:
+            start = bisect_right(self._ordered_ids, after)
+            end = None if limit is None else start + limit
+            return self._ordered_ids[start:end]
+
+    def page(self, after: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get one page of users by keyset pagination
+
+        Args:
+            after: Return only users with an id strictly greater than this
+            limit: Maximum number of users to return
+
+        Returns:
+            List of user record copies in id order
+        """
+        users = []
+        for user_id in self.ids_after(after, limit):
+            user = self.get(user_id)
+            if user is not None:
+                users.append(user)
+        return users
+
+    def iter_chunks(self, chunk_size: int = 500) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Walk every user in id order, one page at a time
+
+        Each chunk is fetched with a fresh keyset query, so memory stays
+        bounded by chunk_size and concurrent writes never break the walk.
+
+        Args:
+            chunk_size: Number of users per chunk
+
+        Yields:
+            Lists of user record copies
+        """
+        for ids in self._id_chunks(chunk_size):
+            chunk = [user for user in map(self.get, ids) if user is not None]
+            if chunk:
+                yield chunk
+
+    def public_json(self, user_id: int) -> Optional[bytes]:
+        """
+        Get the cached JSON encoding of a user's public projection
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            JSON object bytes, or None if the user does not exist
+        """
+        entry = self._public_json.get(user_id)
+        return entry[1] if entry is not None else None
+
+    def versioned_public_json(self, user_id: int) -> Optional[Tuple[int, bytes]]:
+        """
+        Get a user's record version and cached projection in one atomic read
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            (record version, JSON object bytes), or None if the user does
+            not exist
+        """
+        return self._public_json.get(user_id)
+
+    def public_json_page(self, after: int = 0, limit: int = 100) -> List[Tuple[int, bytes]]:
+        """
+        Get one keyset page of cached public projections
+
+        Args:
+            after: Return only users with an id strictly greater than this
+            limit: Maximum number of users to return
+
+        Returns:
+            List of (user id, JSON object bytes) pairs in id order
+        """
+        page = []
+        for user_id in self.ids_after(after, limit):
+            entry = self._public_json.get(user_id)
+            if entry is not None:
+                page.append((user_id, entry[1]))
+        return page
+
+    def iter_public_json_chunks(self, chunk_size: int = 500) -> Iterator[List[bytes]]:
+        """
+        Walk every cached public projection in id order, one page at a time
+
+        Args:
+            chunk_size: Number of users per chunk
+
+        Yields:
+            Lists of JSON object bytes
+        """
+        for ids in self._id_chunks(chunk_size):
+            chunk = [entry[1] for entry in map(self._public_json.get, ids) if entry is not None]
+            if chunk:
+                yield chunk
+
+    def _id_chunks(self, chunk_size: int) -> Iterator[List[int]]:
+        """Yield successive keyset pages of ids until the index is exhausted"""
+        after = 0
+        while True:
+            ids = self.ids_after(after, chunk_size)
+            if not ids:
+                return
+            after = ids[-1]
+            yield ids
+
+    def changes_since(self, since: int,
+                      limit: int = 100) -> Tuple[List[Tuple[int, str, int, Optional[bytes]]], int]:
+        """
+        Get the changes made after a sequence number
+
+        Only the latest change per user is kept, so creates and updates
+        should be applied as upserts. Cost is proportional to the number
+        of changes after since, not to the number of users.
+
+        Args:
+            since: Sequence number the caller has already applied
+            limit: Maximum number of changes to return
+
+        Returns:
+            ([(seq, op, user id, public JSON bytes or None), ...], next_since)
+            with changes in ascending seq order; next_since is the cursor
+            to pass on the following call
+
+        Raises:
+            StaleCursorError: If changes after since were compacted away or
+                since is ahead of the store (the caller must resync)
+        """
+        with self._lock:
+            if since < self._compacted_through or since > self._version:
+                raise StaleCursorError(since)
+
+            pending = []
+            for user_id, (seq, op) in reversed(self._changes.items()):
+                if seq <= since:
+                    break
+                pending.append((seq, op, user_id))
+            pending.reverse()
+
+            truncated = len(pending) > limit
+            pending = pending[:limit]
+            next_since = pending[-1][0] if truncated else self._version
+
+            return [
+                (seq, op, user_id, None if op == 'delete' else self.public_json(user_id))
+                for seq, op, user_id in pending
+            ], next_since
+
+    def _record_change(self, user_id: int, op: str) -> int:
+        """
+        Advance the collection version and log the change (caller holds the lock)
+
+        Returns:
+            The new version, which is also the change's sequence number
+        """
+        self._version += 1
+        self._changes.pop(user_id, None)
+        self._changes[user_id] = (self._version, op)
+        while len(self._changes) > self._max_changes:
+            _, (seq, _) = self._changes.popitem(last=False)
+            self._compacted_through = seq
+        return self._version
+
+    def _encode_public(self, user: Dict[str, Any]) -> bytes:
+        """Encode the public projection of a user record"""
+        public = {k: v for k, v in user.items() if k not in self._private_fields}
+        return json.dumps(public, separators=(',', ':')).encode()
+
+    def create(self, email: str, password: str, name: str, **fields) -> Dict[str, Any]:
+        """
+        Insert a new user and assign it the next id
+
+        Args:
+            email: User email (unique, case-insensitive)
+            password: User password
+            name: User full name
+            **fields: Any extra attributes to store on the record
+
+        Returns:
+            Copy of the stored user record
+
+        Raises:
+            DuplicateEmailError: If the email is already registered
+        """
+        key = normalize_email(email)
+        with self._lock:
+            if key in self._id_by_email:
+                raise DuplicateEmailError(email)
+
+            user_id = self._next_id
+            self._next_id += 1
+
+            user = dict(fields, id=user_id, email=email, password=password, name=name)
+            self._by_id[user_id] = user
+            self._id_by_email[key] = user_id
+            self._public_json[user_id] = (self._record_change(user_id, 'create'),
+                                          self._encode_public(user))
+            # Ids only grow, so appending keeps the list sorted
+            self._ordered_ids.append(user_id)
+            return dict(user)
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Get user by id
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Copy of the user record or None
+        """
+        user = self._by_id.get(user_id)
+        return dict(user) if user is not None else None
+
+    def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """
+        Get user by email (case-insensitive)
+
+        Args:
+            email: User email
+
+        Returns:
+            Copy of the user record or None
+        """
+        user_id = self._id_by_email.get(normalize_email(email))
+        if user_id is None:
+            return None
+        return self.get(user_id)
+
+    def update(self, user_id: int, **changes) -> Optional[Dict[str, Any]]:
+        """
+        Update fields of an existing user
+
+        Args:
+            user_id: User ID
+            **changes: Fields to overwrite (the id cannot be changed)
+
+        Returns:
+            Copy of the updated record, or None if the user does not exist
+
+        Raises:
+            DuplicateEmailError: If the new email belongs to another user
+        """
+        changes.pop('id', None)
+        with self._lock:
+            user = self._by_id.get(user_id)
+            if user is None:
+                return None
+
+            if 'email' in changes:
+                old_key = normalize_email(user['email'])
+                new_key = normalize_email(changes['email'])
+                if new_key != old_key:
+                    if new_key in self._id_by_email:
+                        raise DuplicateEmailError(changes['email'])
+                    del self._id_by_email[old_key]
+                    self._id_by_email[new_key] = user_id
+
+            user.update(changes)
+            # Private-only changes (e.g. a password rehash) are invisible to
+            # readers, so they keep the record's version, ETag and feed position
+            encoded = self._encode_public(user)
+            if encoded != self._public_json[user_id][1]:
+                self._public_json[user_id] = (self._record_change(user_id, 'update'), encoded)
+            return dict(user)
+
+    def delete(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Delete a user
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            The removed record, or None if the user does not exist
+        """
+        with self._lock:
+            user = self._by_id.pop(user_id, None)
+            if user is None:
+                return None
+            del self._id_by_email[normalize_email(user['email'])]
+            del self._public_json[user_id]
+            del self._ordered_ids[bisect_right(self._ordered_ids, user_id) - 1]
+            self._record_change(user_id, 'delete')
+            return user
+
+    def clear(self) -> None:
+        """Remove all users and reset the id counter"""
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_email.clear()
+            self._ordered_ids.clear()
+            self._public_json.clear()
+            self._next_id = 1
+            self._version = 0
+            self._epoch = uuid.uuid4().hex[:12]
+            self._changes.clear()
+            self._compacted_through = 0